@@ -3,6 +3,7 @@
 Fixed version of autosave timer module for the Memento text editor.
 Provides idle detection and automatic saving when user stops typing.
 Fixes the deadlock issue in the original implementation.
+Snapshots are persisted by a background writer thread so saves never block typing.
 """
 
 import threading
@@ -170,25 +171,255 @@ class IdleSaver:
                 print(f"Error during forced save: {e}")
 
 
+class SnapshotWriter:
+    """Writes snapshots on a dedicated background thread.
+    
+    The queue holds at most one pending snapshot: submitting while a save is
+    still waiting replaces it, so only the latest text is ever written.
+    Incremental edits submitted back to back are batched into one write.
+    """
+    
+    QUEUED = "queued"
+    WRITING = "writing"
+    DURABLE = "durable"
+    FAILED = "failed"
+    
+    MAX_PENDING_EDITS = 64
+    
+    def __init__(self, write_func: Callable[[str, Optional[int]], None],
+                 on_state: Optional[Callable[[str, Optional[Exception]], None]] = None,
+                 edit_func: Optional[Callable[[list, int, int], None]] = None,
+                 sync_func: Optional[Callable[[], None]] = None,
+                 idle_func: Optional[Callable[[], None]] = None):
+        """
+        Initialize the writer.
+        
+        Args:
+            write_func: Function that persists a full snapshot as (text, version)
+                (e.g. FileManager.write_snapshot)
+            on_state: Called from the writer thread with (state, error) on each transition
+            edit_func: Function that persists incremental edits as (edits, base_version, version)
+                (e.g. FileManager.write_snapshot_edits)
+            sync_func: Called once the queue drains, before reporting durable
+                (e.g. FileManager.sync)
+            idle_func: Background maintenance run after reporting durable, while
+                nothing is pending (e.g. FileManager.idle_maintenance)
+        """
+        self.write_func = write_func
+        self.on_state = on_state
+        self.edit_func = edit_func
+        self.sync_func = sync_func
+        self.idle_func = idle_func
+        
+        self._condition = threading.Condition()
+        self._pending: Optional[str] = None
+        self._pending_edits: list = []
+        self._pending_base_version: Optional[int] = None
+        self._pending_version: Optional[int] = None
+        self._has_pending = False
+        self._writing = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start the writer thread."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        
+        self._thread = threading.Thread(target=self._run, name="SnapshotWriter", daemon=True)
+        self._thread.start()
+    
+    def submit(self, text: str, version: Optional[int] = None):
+        """Queue a snapshot, replacing any snapshot that has not started writing yet."""
+        with self._condition:
+            self._pending = text
+            self._pending_edits = []
+            self._pending_base_version = None
+            self._pending_version = version
+            self._has_pending = True
+            self._condition.notify_all()
+        
+        self._notify(self.QUEUED)
+    
+    def submit_edit(self, edit: tuple, base_version: int, version: int) -> bool:
+        """Queue an incremental edit made against base_version.
+        
+        Returns:
+            False if the edit cannot be queued (a full snapshot is pending, the
+            versions do not line up or too many edits are waiting) - the caller
+            should submit the full text instead
+        """
+        if self.edit_func is None:
+            return False
+        
+        with self._condition:
+            if self._has_pending:
+                if (self._pending is not None or
+                        self._pending_version != base_version or
+                        len(self._pending_edits) >= self.MAX_PENDING_EDITS):
+                    return False
+                self._pending_edits.append(edit)
+            else:
+                self._pending_edits = [edit]
+                self._pending_base_version = base_version
+            self._pending_version = version
+            self._has_pending = True
+            self._condition.notify_all()
+        
+        self._notify(self.QUEUED)
+        return True
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted snapshot has been written.
+        
+        Returns:
+            True if the queue drained, False on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        
+        with self._condition:
+            while self._has_pending or self._writing:
+                if not self._running and not self._writing:
+                    # Nothing will drain the queue - write inline
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        
+        if self._has_pending:
+            self._write_pending()
+        return True
+    
+    def stop(self, flush: bool = True):
+        """Stop the writer thread, optionally writing any pending snapshot first."""
+        if flush:
+            self.flush()
+        
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        self._thread = None
+    
+    def _run(self):
+        """Writer thread main loop."""
+        while True:
+            with self._condition:
+                while self._running and not self._has_pending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+            
+            self._write_pending()
+    
+    def _write_pending(self):
+        """Take the latest pending snapshot and write it."""
+        with self._condition:
+            if not self._has_pending:
+                return
+            text = self._pending
+            edits = self._pending_edits
+            base_version = self._pending_base_version
+            version = self._pending_version
+            self._pending = None
+            self._pending_edits = []
+            self._has_pending = False
+            self._writing = True
+        
+        self._notify(self.WRITING)
+        error = None
+        try:
+            if text is not None:
+                self.write_func(text, version)
+            else:
+                self.edit_func(edits, base_version, version)
+            
+            # Batch fsyncs: only sync when nothing newer is waiting to be written
+            if self.sync_func and not self._has_pending:
+                self.sync_func()
+        except Exception as e:
+            error = e
+        
+        # _writing stays set until the idle pass is done too, so flush() never returns between them
+        try:
+            if error is not None:
+                print(f"Error writing snapshot: {error}")
+                self._notify(self.FAILED, error)
+            elif not self._has_pending:
+                # Only report durable once the latest submitted text is on disk
+                self._notify(self.DURABLE)
+                self._run_idle()
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+    
+    def _run_idle(self):
+        """Run background maintenance, unless a new snapshot has arrived meanwhile.
+        
+        Only the writer thread does this, so inline flushes (e.g. on close) stay fast.
+        It runs while _writing is still set, so flush() also waits for it to finish.
+        """
+        if not self.idle_func or threading.current_thread() is not self._thread:
+            return
+        with self._condition:
+            if self._has_pending:
+                return
+        try:
+            self.idle_func()
+        except Exception as e:
+            print(f"Error in snapshot writer maintenance: {e}")
+    
+    def _notify(self, state: str, error: Optional[Exception] = None):
+        """Report a state transition to the listener."""
+        if self.on_state:
+            try:
+                self.on_state(state, error)
+            except Exception as e:
+                print(f"Error in snapshot writer callback: {e}")
+
+
 class SaveStatus:
     """Tracks and formats save status for display."""
     
     def __init__(self):
         self.is_saving = False
+        self.is_queued = False
         self.last_saved_time = None
         self.has_unsaved_changes = False
     
+    def mark_queued(self):
+        """Mark that a save has been queued for the background writer."""
+        self.is_queued = True
+    
     def mark_saving(self):
         """Mark that a save operation is in progress."""
+        self.is_queued = False
         self.is_saving = True
     
     def mark_saved(self):
         """Mark that save operation completed successfully."""
         import time
+        self.is_queued = False
         self.is_saving = False
         self.last_saved_time = time.time()
         self.has_unsaved_changes = False
     
+    def mark_unchanged(self):
+        """Mark that a pending change turned out not to modify the text."""
+        if not self.is_saving and not self.is_queued:
+            self.has_unsaved_changes = False
+    
+    def mark_failed(self):
+        """Mark that the last save operation failed."""
+        self.is_queued = False
+        self.is_saving = False
+    
     def mark_changed(self):
         """Mark that there are unsaved changes."""
         self.has_unsaved_changes = True
@@ -198,6 +429,9 @@ class SaveStatus:
         if self.is_saving:
             return "Saving..."
         
+        if self.is_queued:
+            return "Save queued"
+        
         if not self.has_unsaved_changes and self.last_saved_time:
             import time
             from datetime import datetime
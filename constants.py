@@ -16,6 +16,11 @@ MEMENTO_ROOT = HOME / ".Memento"
 
 # File names
 CONTROL_FILE = "control.json"
+INDEX_FILE = "index.db"
+JOURNAL_FILE = "journal.log"
+REKEY_MARKER_FILE = "rekey.ready"
+REKEY_LOCK_FILE = "rekey.lock"
+MONGODB_CONFIG_FILE = "mongodb.json"  # Optional MongoDB client settings (see mongodb_connection_manager.py)
 LOG_FILE = "memento.log"
 
 # Autosave settings
@@ -28,6 +33,24 @@ MIN_BUFFER_SIZE = 3
 MAX_BUFFER_SIZE = 50
 BASE_FILE_SIZE_KB = 1024  # 1MB base for buffer size calculation
 
+# Delta snapshot settings
+KEYFRAME_INTERVAL = 10  # Write a full keyframe at least every N snapshots
+
+# Large document loading
+LAZY_LOAD_THRESHOLD_BYTES = 1024 * 1024  # Plaintext keyframes above this are memory-mapped
+LOAD_CHUNK_CHARS = 256 * 1024            # Characters inserted into the editor per chunk
+
+# Adaptive compression of encrypted snapshots
+HOT_SAVE_INTERVAL_SEC = 10      # Saves closer together than this use a fast codec level
+RECOMPRESS_ACTIVE_WINDOW = 2    # Newest N snapshots keep their original compression
+
+# Re-encryption of all slots when the passphrase changes
+REKEY_WORKERS = min(8, os.cpu_count() or 2)
+
+# Commit journal settings
+JOURNAL_FSYNC_BATCH = 8             # fsync the journal after this many commits (or when idle)
+JOURNAL_CHECKPOINT_INTERVAL = 64    # Fold the journal into control.json after this many commits
+
 def make_dirs_if_missing(path):
     """Create directory structure if it doesn't exist."""
     path = pathlib.Path(path)
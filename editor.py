@@ -12,7 +12,7 @@ import pathlib
 
 from constants import APP_NAME, MEMENTO_ROOT
 from storage import FileManager
-from autosave import IdleSaver, SaveStatus
+from autosave import IdleSaver, SaveStatus, SnapshotWriter
 
 # Optional encryption support
 try:
@@ -23,6 +23,100 @@ except ImportError:
     HAS_ENCRYPTION = False
 
 
+class DirtyRegionTracker:
+    """Tracks which lines of a Tk Text widget changed since the last save.
+    
+    The widget's Tcl command is wrapped so every insert, delete and replace -
+    typing, paste or programmatic edits - reports its line range before it
+    runs. The dirty region is kept as the first changed line plus the number
+    of untouched lines at the end, which stays valid across any sequence of
+    edits. Undo/redo and anything else the wrapper cannot see mark the whole
+    document dirty. Like the widget itself, it is only used from the Tk thread.
+    """
+    
+    def __init__(self, text_widget: tk.Text):
+        self.widget = text_widget
+        self._original = text_widget._w + "_orig"
+        text_widget.tk.call("rename", text_widget._w, self._original)
+        text_widget.tk.createcommand(text_widget._w, self._proxy)
+        self.reset()
+    
+    def reset(self):
+        """Mark the widget contents as saved."""
+        self.start_line: Optional[int] = None
+        self.tail_lines: Optional[int] = None
+        self.full = False
+        
+        # Clear Tk's modified flag too, so a late <<Modified>> event is not mistaken for a missed edit
+        try:
+            self._call('edit', 'modified', 0)
+        except tk.TclError:
+            pass
+    
+    def mark_full(self):
+        """Force the next save to use the full text."""
+        self.full = True
+    
+    def is_dirty(self) -> bool:
+        """Check whether anything changed since the last reset."""
+        return self.full or self.start_line is not None
+    
+    def collect(self):
+        """Get the changed region as (start_line, tail_lines, text), or None if a full save is needed."""
+        if self.full or self.start_line is None:
+            return None
+        
+        total_lines = self._line('end-1c')
+        start_line = min(self.start_line, total_lines)
+        end_line = total_lines - self.tail_lines
+        if end_line < start_line:
+            return None
+        
+        text = self._call('get', f'{start_line}.0', f'{end_line}.end')
+        return start_line, self.tail_lines, text
+    
+    def _call(self, *args):
+        """Invoke the original widget command."""
+        return self.widget.tk.call(self._original, *args)
+    
+    def _line(self, index) -> int:
+        """Get the line number of a text index."""
+        return int(str(self._call('index', index)).split('.')[0])
+    
+    def _proxy(self, command, *args):
+        """Widget command wrapper that records edits before forwarding them."""
+        try:
+            if command in ('insert', 'delete', 'replace') and args:
+                self._record(command, args)
+            elif command == 'edit' and args and args[0] in ('undo', 'redo'):
+                self.full = True
+        except tk.TclError:
+            # Bad index - let the real command report the error
+            pass
+        return self._call(command, *args)
+    
+    def _record(self, command, args):
+        """Widen the dirty region to cover an edit that is about to run."""
+        total_lines = self._line('end-1c')
+        
+        if command == 'insert':
+            first = last = self._line(args[0])
+        elif command == 'replace':
+            first, last = self._line(args[0]), self._line(args[1])
+        elif len(args) == 1:
+            first, last = self._line(args[0]), self._line(f'{args[0]}+1c')
+        else:
+            lines = [self._line(index) for index in args]
+            first, last = min(lines), max(lines)
+        
+        # 'end' resolves one line past the last real line
+        first = min(first, total_lines)
+        tail = max(0, total_lines - last)
+        
+        self.start_line = first if self.start_line is None else min(self.start_line, first)
+        self.tail_lines = tail if self.tail_lines is None else min(self.tail_lines, tail)
+
+
 class EditorWindow:
     """Main text editor window with autosave functionality."""
     
@@ -31,6 +125,16 @@ class EditorWindow:
         self.save_status = SaveStatus()
         self.is_closing = False
         
+        # Chunked load in progress: the widget is read-only and nothing is saved until it finishes
+        self.is_loading_content = False
+        self._load_chunks = None
+        
+        # Background (re-)encryption in progress: the widget is read-only and nothing is saved
+        self.is_reencrypting = False
+        self._reencrypt_thread = None
+        self._reencrypt_progress = None
+        self._reencrypt_error = None
+        
         # Initialize encryption manager if available
         self.encryption_manager = None;
         self.current_passphrase = None;
@@ -45,8 +149,18 @@ class EditorWindow:
         self.root.geometry("800x600")
         self.root.minsize(400, 300)
         
-        # Create autosave manager
+        # Create autosave manager and background snapshot writer
         self.idle_saver = IdleSaver(self._save_callback)
+        self.snapshot_writer = SnapshotWriter(
+            self.file_manager.write_snapshot,
+            self._on_save_state,
+            self.file_manager.write_snapshot_edits,
+            self.file_manager.sync,
+            self.file_manager.idle_maintenance
+        )
+        self.snapshot_writer.start()
+        self._text_version = self.file_manager.text_version
+        self._tk_thread = threading.current_thread()
         
         self._create_menu()
         self._create_widgets()
@@ -62,6 +176,8 @@ class EditorWindow:
     def _show_encrypted_placeholder(self):
         """Show placeholder content for encrypted memento without passphrase."""
         self.is_encrypted_content = True
+        self._cancel_chunked_load()
+        self.is_loading_content = False
         self.text_widget.configure(state=tk.NORMAL)
         self.text_widget.delete('1.0', tk.END)
         
@@ -147,6 +263,7 @@ class EditorWindow:
             file_menu.add_cascade(label="Encryption", menu=encryption_menu)
             
             encryption_menu.add_command(label="Decrypt Content...", command=self._prompt_for_passphrase)
+            encryption_menu.add_command(label="Lock Memento", command=self._lock_memento)
             encryption_menu.add_separator()
             encryption_menu.add_command(label="Enable Encryption...", command=self._enable_encryption)
             encryption_menu.add_command(label="Change Passphrase...", command=self._change_passphrase)
@@ -200,6 +317,7 @@ class EditorWindow:
                                   padx=10,
                                   pady=10)
         self.text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.dirty_tracker = DirtyRegionTracker(self.text_widget)
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self.text_widget.yview)
@@ -225,6 +343,7 @@ class EditorWindow:
         self.text_widget.bind('<Control-Key>', self._on_text_change)
         self.text_widget.bind('<BackSpace>', self._on_text_change)
         self.text_widget.bind('<Delete>', self._on_text_change)
+        self.text_widget.bind('<<Modified>>', self._on_modified)
         
         # Bind Ctrl+S for save to file (includes ring buffer save)
         self.root.bind('<Control-s>', lambda e: self._save_to_file())
@@ -254,6 +373,9 @@ class EditorWindow:
         self.is_encrypted_content = False
         logger.info(f"Loading content for memento {self.file_manager.memento_id}")
         
+        # Make sure no queued snapshot is written underneath the reload
+        self.snapshot_writer.flush()
+        
         try:
             # Check if memento is encrypted
             if self.file_manager.is_encrypted():
@@ -268,35 +390,26 @@ class EditorWindow:
                 logger.info("Preparing AES key with passphrase")
                 self.file_manager._prepare_aes_key(self.current_passphrase)
             
-            # Load content (will be decrypted automatically if encrypted)
+            # Load content in chunks (decrypted automatically if encrypted)
             logger.info("Loading current snapshot")
-            content = self.file_manager.load_current_snapshot()
-            logger.info(f"Loaded content: {len(content) if content else 0} characters")
-            
-            # Handle None content gracefully
-            if content is None:
-                logger.warning("Content is None - using empty string")
-                content = ""
+            self._cancel_chunked_load()
+            chunks = self.file_manager.iter_current_snapshot()
             
-            # Clear and update text widget
+            # Clear the widget and show the first chunk - the visible region - right away
             logger.info("Updating text widget")
             self.text_widget.configure(state=tk.NORMAL)  # Ensure it's editable first
             self.text_widget.delete('1.0', tk.END)
-            self.text_widget.insert('1.0', content)
+            self.text_widget.insert('1.0', next(chunks, ""))
             
             # Update window title to show encryption status
             self._update_window_title()
             
-            # Mark as saved since we just loaded
-            self.save_status.mark_saved()
-            self._update_status_bar()
-            
-            # Reset undo/redo stack
-            self.text_widget.edit_reset()
-            
-            # Ensure text widget can be edited
-            self.text_widget.focus_set()
-            logger.info("Content loading completed successfully")
+            # Stream the rest in from the event loop so the window stays responsive
+            self._load_chunks = chunks
+            self.is_loading_content = True
+            self.text_widget.configure(state=tk.DISABLED)
+            self.status_bar.config(text="Loading...")
+            self._load_next_chunk()
             
         except Exception as e:
             logger.error(f"Error loading content: {e}")
@@ -309,6 +422,61 @@ class EditorWindow:
             # Don't destroy the window - let user try again
             return
     
+    def _load_next_chunk(self):
+        """Append the next chunk of a chunked load, then yield to the event loop."""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        if self._load_chunks is None or self.is_closing:
+            return
+        
+        try:
+            chunk = next(self._load_chunks, None)
+        except Exception as e:
+            # Keep the partial text read-only so it is never saved over the real content
+            logger.error(f"Error loading content: {e}")
+            self._cancel_chunked_load()
+            self.status_bar.config(text="Load failed")
+            messagebox.showerror("Load Error", f"Failed to load memento content: {str(e)}")
+            return
+        
+        if chunk is None:
+            self._finish_chunked_load()
+            return
+        
+        self.text_widget.configure(state=tk.NORMAL)
+        self.text_widget.insert('end-1c', chunk)
+        self.text_widget.configure(state=tk.DISABLED)
+        self.root.after(1, self._load_next_chunk)
+    
+    def _finish_chunked_load(self):
+        """Make the fully loaded text editable and start tracking edits from it."""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        self._load_chunks = None
+        self.is_loading_content = False
+        self.text_widget.configure(state=tk.NORMAL)
+        
+        # Mark as saved since we just loaded
+        self.save_status.mark_saved()
+        self._update_status_bar()
+        
+        # Reset undo/redo stack and start tracking edits from the loaded version
+        self.text_widget.edit_reset()
+        self.dirty_tracker.reset()
+        self._text_version = self.file_manager.text_version
+        
+        # Ensure text widget can be edited
+        self.text_widget.focus_set()
+        logger.info("Content loading completed successfully")
+    
+    def _cancel_chunked_load(self):
+        """Abandon a chunked load in progress, releasing its memory map."""
+        if self._load_chunks is not None:
+            self._load_chunks.close()
+            self._load_chunks = None
+    
     def _on_key_press(self, event=None):
         """Handle key press events to detect character additions."""
         if self.is_closing:
@@ -334,32 +502,70 @@ class EditorWindow:
         self.idle_saver.update(char_added=char_added)
     
     def _save_callback(self):
-        """Callback function for autosave."""
-        if self.is_closing:
+        """Callback function for autosave (called on the Tk thread or the idle timer's thread)."""
+        if threading.current_thread() is not self._tk_thread:
+            # The dirty tracker and _text_version belong to the Tk thread: collecting the edit,
+            # resetting the tracker and bumping the version must not interleave with typing
+            try:
+                self.root.after(0, self._save_callback)
+            except (RuntimeError, tk.TclError):
+                pass  # Window already destroyed
             return
         
-        # Get current content
-        content = self.text_widget.get('1.0', tk.END + '-1c')  # Exclude final newline
+        if (self.is_closing or self.is_encrypted_content or self.is_loading_content or
+                self.is_reencrypting):
+            # Never save the locked placeholder or a partially loaded text over real content,
+            # and never write while another thread is re-encrypting the slots
+            return
         
-        try:
-            # Update status to saving
-            self.save_status.mark_saving()
+        if not self.dirty_tracker.is_dirty():
+            # Cursor moves and clicks reset the timer but leave nothing to save
+            self.save_status.mark_unchanged()
             self._update_status_bar_thread_safe()
-            
-            # Perform save
-            self.file_manager.write_snapshot(content)
-            
-            # Update status to saved
+            return
+        
+        base_version = self._text_version
+        version = base_version + 1
+        
+        # Send only the changed lines when possible; fall back to the full buffer
+        edit = self.dirty_tracker.collect()
+        self.dirty_tracker.reset()
+        
+        # Hand off to the background writer - compression, encryption and disk I/O run there
+        if edit is None or not self.snapshot_writer.submit_edit(edit, base_version, version):
+            content = self.text_widget.get('1.0', tk.END + '-1c')  # Exclude final newline
+            self.snapshot_writer.submit(content, version)
+        self._text_version = version
+    
+    def _on_modified(self, event=None):
+        """Catch modifications the dirty tracker did not see (e.g. undo) and force a full save."""
+        if not self.text_widget.edit_modified():
+            return
+        
+        if not self.dirty_tracker.is_dirty():
+            self.dirty_tracker.mark_full()
+        self.text_widget.edit_modified(False)
+    
+    def _on_save_state(self, state, error=None):
+        """Reflect background writer progress in the status bar (called from the writer thread)."""
+        if state == SnapshotWriter.QUEUED:
+            self.save_status.mark_queued()
+        elif state == SnapshotWriter.WRITING:
+            self.save_status.mark_saving()
+        elif state == SnapshotWriter.DURABLE:
             self.save_status.mark_saved()
-            self._update_status_bar_thread_safe()
-            
-        except Exception as e:
-            # Handle save error
-            self._show_error_thread_safe(f"Error saving: {str(e)}")
+        elif state == SnapshotWriter.FAILED:
+            # The stored version is now unknown - the next save must send everything
+            self.dirty_tracker.mark_full()
+            self.save_status.mark_failed()
+            self._show_error_thread_safe(f"Error saving: {str(error)}")
+        
+        self._update_status_bar_thread_safe()
     
     def _force_save(self):
-        """Force an immediate save."""
+        """Force an immediate save and wait for it to reach disk."""
         self.idle_saver.force_save()
+        self.snapshot_writer.flush()
     
     def _save_to_file(self):
         """Save current content to ring buffer and export to a user-chosen file."""
@@ -501,6 +707,9 @@ Ctrl+Y - Redo"""
     
     def _enable_encryption(self):
         """Enable encryption for this memento."""
+        if self.is_reencrypting:
+            return
+        
         if not self.encryption_manager or not self.encryption_manager.has_encryption_support:
             missing_deps = get_missing_dependencies()
             messagebox.showerror(
@@ -532,19 +741,24 @@ Ctrl+Y - Redo"""
             # Force save current content to ensure it's up to date
             self._force_save()
             
-            # Enable encryption in file manager
-            self.file_manager.enable_encryption(passphrase)
-            
-            # Store passphrase for this session
-            self.current_passphrase = passphrase
-            
-            # Update window title to show encryption status
-            self._update_window_title()
+            def enabled():
+                # Store passphrase for this session
+                self.current_passphrase = passphrase
+                
+                # Update window title to show encryption status
+                self._update_window_title()
+                
+                messagebox.showinfo(
+                    "Encryption Enabled",
+                    "Encryption has been enabled for this memento.\n"
+                    "Your content is now protected and will be compressed before storage."
+                )
             
-            messagebox.showinfo(
-                "Encryption Enabled",
-                "Encryption has been enabled for this memento.\n"
-                "Your content is now protected and will be compressed before storage."
+            # Enable encryption in file manager (key derivation runs off the GUI thread)
+            self._run_reencryption(
+                "Encrypting",
+                lambda progress: self.file_manager.enable_encryption(passphrase),
+                enabled, "Encryption Error", "Failed to enable encryption"
             )
             
         except Exception as e:
@@ -552,6 +766,9 @@ Ctrl+Y - Redo"""
     
     def _change_passphrase(self):
         """Change the encryption passphrase."""
+        if self.is_reencrypting:
+            return
+        
         if not self.encryption_manager or not self.encryption_manager.has_encryption_support:
             messagebox.showerror("Encryption Not Available", "Encryption is not available.")
             return
@@ -587,13 +804,20 @@ Ctrl+Y - Redo"""
             if not new_passphrase:
                 return
             
-            # Change passphrase in file manager
-            self.file_manager.change_passphrase(self.current_passphrase, new_passphrase)
-            self.current_passphrase = new_passphrase
+            def changed():
+                self.current_passphrase = new_passphrase
+                messagebox.showinfo(
+                    "Passphrase Changed",
+                    "The encryption passphrase has been successfully changed."
+                )
             
-            messagebox.showinfo(
-                "Passphrase Changed",
-                "The encryption passphrase has been successfully changed."
+            # Re-key every snapshot in the background once pending snapshots are written
+            self._force_save()
+            old_passphrase = self.current_passphrase
+            self._run_reencryption(
+                "Changing passphrase",
+                lambda progress: self.file_manager.change_passphrase(old_passphrase, new_passphrase, progress),
+                changed, "Passphrase Change Error", "Failed to change passphrase"
             )
             
         except Exception as e:
@@ -601,6 +825,9 @@ Ctrl+Y - Redo"""
     
     def _disable_encryption(self):
         """Disable encryption for this memento."""
+        if self.is_reencrypting:
+            return
+        
         if not self.file_manager.is_encrypted():
             messagebox.showinfo(
                 "Not Encrypted",
@@ -634,21 +861,88 @@ Ctrl+Y - Redo"""
                 
                 self.current_passphrase = current_passphrase
             
-            # Disable encryption in file manager
-            self.file_manager.disable_encryption(self.current_passphrase)
-            self.current_passphrase = None
-            
-            # Update window title
-            self._update_window_title()
+            def disabled():
+                self.current_passphrase = None
+                
+                # Update window title
+                self._update_window_title()
+                
+                messagebox.showinfo(
+                    "Encryption Disabled",
+                    "Encryption has been disabled. Your content is now stored in plain text."
+                )
             
-            messagebox.showinfo(
-                "Encryption Disabled",
-                "Encryption has been disabled. Your content is now stored in plain text."
+            # Disable encryption in file manager once pending snapshots are written
+            self._force_save()
+            passphrase = self.current_passphrase
+            self._run_reencryption(
+                "Decrypting",
+                lambda progress: self.file_manager.disable_encryption(passphrase),
+                disabled, "Disable Encryption Error", "Failed to disable encryption"
             )
             
         except Exception as e:
             messagebox.showerror("Disable Encryption Error", f"Failed to disable encryption: {str(e)}")
     
+    def _run_reencryption(self, label: str, task, on_success, error_title: str, error_prefix: str):
+        """Run an encryption change on a background thread, keeping the window responsive.
+        
+        The text is read-only and autosave is suppressed until the task finishes, since
+        the file manager must not be written from two threads at once. The task gets a
+        progress(done, total) callback; progress and completion are polled from the
+        GUI thread, so the worker never touches Tk.
+        """
+        self.is_reencrypting = True
+        self._reencrypt_progress = None
+        self._reencrypt_error = None
+        self.text_widget.configure(state=tk.DISABLED)
+        self.status_bar.config(text=f"{label}...")
+        
+        def progress(done: int, total: int):
+            self._reencrypt_progress = (done, total)
+        
+        def run():
+            try:
+                task(progress)
+            except Exception as e:
+                self._reencrypt_error = e
+        
+        def poll():
+            if self.is_closing:
+                return
+            if self._reencrypt_thread.is_alive():
+                if self._reencrypt_progress:
+                    done, total = self._reencrypt_progress
+                    self.status_bar.config(text=f"{label}... {done}/{total} snapshots")
+                self.root.after(100, poll)
+                return
+            
+            self._reencrypt_thread = None
+            self.is_reencrypting = False
+            self.text_widget.configure(state=tk.NORMAL)
+            self._update_status_bar()
+            if self._reencrypt_error is None:
+                on_success()
+            else:
+                messagebox.showerror(error_title, f"{error_prefix}: {str(self._reencrypt_error)}")
+        
+        self._reencrypt_thread = threading.Thread(target=run, name="Reencrypt", daemon=True)
+        self._reencrypt_thread.start()
+        self.root.after(100, poll)
+    
+    def _lock_memento(self):
+        """Save, forget the passphrase and cached key, and hide the content again."""
+        if self.is_reencrypting:
+            return
+        
+        if not self.file_manager.is_encrypted() or self.is_encrypted_content:
+            return
+        
+        self._force_save()
+        self.file_manager.lock()
+        self.current_passphrase = None
+        self._show_encrypted_placeholder()
+    
     def _update_window_title(self):
         """Update the window title to reflect encryption status."""
         base_title = f"{APP_NAME} - #{self.file_manager.memento_id}"
@@ -667,10 +961,19 @@ Ctrl+Y - Redo"""
         # Stop autosave
         self.idle_saver.stop()
         
-        # Force final save
+        # Let a re-encryption in progress finish before the process can exit
+        if self._reencrypt_thread is not None:
+            self._reencrypt_thread.join()
+        
+        # Force final save, then drain the writer
+        self.snapshot_writer.on_state = None
         try:
-            content = self.text_widget.get('1.0', tk.END + '-1c')
-            self.file_manager.write_snapshot(content)
+            self._cancel_chunked_load()
+            if (not self.is_encrypted_content and not self.is_loading_content and
+                    self.dirty_tracker.is_dirty()):
+                content = self.text_widget.get('1.0', tk.END + '-1c')
+                self.snapshot_writer.submit(content, self._text_version + 1)
+            self.snapshot_writer.stop()
         except Exception as e:
             messagebox.showerror("Save Error", f"Error saving before close: {str(e)}")
         
@@ -680,7 +983,12 @@ Ctrl+Y - Redo"""
     def _close_without_confirmation(self):
         """Close the window without save confirmation."""
         self.is_closing = True
+        self._cancel_chunked_load()
         self.idle_saver.stop()
+        if self._reencrypt_thread is not None:
+            self._reencrypt_thread.join()
+        self.snapshot_writer.on_state = None
+        self.snapshot_writer.stop()
         self.root.destroy()
     
     def run(self):
@@ -690,9 +998,11 @@ Ctrl+Y - Redo"""
         except Exception as e:
             messagebox.showerror("Application Error", f"Unexpected error: {str(e)}")
         finally:
-            # Ensure autosave is stopped
+            # Ensure autosave is stopped and pending snapshots are written
             if hasattr(self, 'idle_saver'):
                 self.idle_saver.stop()
+            if hasattr(self, 'snapshot_writer'):
+                self.snapshot_writer.stop()
 
 
 def create_editor(file_manager: FileManager) -> EditorWindow:
@@ -8,10 +8,18 @@ Refactored to use shared MongoDB connection via MongoDBConnectionManager singlet
 
 import os
 import json
+import time
+import io
+import struct
+import hmac
+import atexit
 import hashlib
 import logging
-from typing import Optional, Tuple, Dict, Any
+import threading
+from typing import Optional, Tuple, Dict, Any, Callable, Iterable, Iterator
 from pathlib import Path
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Optional dependencies - graceful degradation if not available
 try:
@@ -21,20 +29,46 @@ except ImportError:
     HAS_BROTLI = False
     brotli = None
 
+# Faster codecs for hot autosaves, used when installed
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+    zstandard = None
+
+try:
+    import lz4.frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
 try:
     from cryptography.hazmat.primitives.asymmetric import ec
     from cryptography.hazmat.primitives import hashes, serialization
     from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
     HAS_CRYPTO = True
 except ImportError:
     HAS_CRYPTO = False
 
+# Argon2id needs cryptography >= 44
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+    HAS_ARGON2 = True
+except ImportError:
+    HAS_ARGON2 = False
+
 # MongoDB connection via shared manager
 try:
     from bson.binary import Binary
     from bson.errors import BSONError
+    from bson.objectid import ObjectId
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
     from mongodb_connection_manager import MongoDBConnectionManager, ConnectionUnavailableError
+    from mongodb_replicator import MongoDBReplicator, OUTBOX_DIR, REPLICATION_MAX_DOCUMENT_BYTES, write_content_chunks
     HAS_PYMONGO = True
 except ImportError:
     HAS_PYMONGO = False
@@ -43,7 +77,12 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 # Compression settings
-BROTLI_COMPRESSION_LEVEL = 6
+BROTLI_COMPRESSION_LEVEL = 6   # Default for ordinary saves
+BROTLI_HOT_LEVEL = 1           # Rapid autosaves and very large texts
+BROTLI_ARCHIVE_LEVEL = 11      # Background recompression of versions that left the active window
+ZSTD_HOT_LEVEL = 1
+LZ4_HOT_LEVEL = 0
+LARGE_TEXT_CHARS = 8 * 1024 * 1024  # Above this even ordinary saves use the hot level
 
 # Estimate: English text with Brotli compression level 6 typically achieves 70-80% compression
 # With 16MB MongoDB limit and ~25% overhead for encryption/metadata, conservative estimate:
@@ -51,6 +90,268 @@ BROTLI_COMPRESSION_LEVEL = 6
 # Being conservative for safety:
 ESTIMATED_MAX_UNCOMPRESSED_SIZE_MB = 40
 
+# Streaming AEAD format written by encrypt_data()/encrypt_stream():
+#   header = magic, version, codec, codec level, chunk size in characters, 16-byte random stream id
+#   (version 1 headers have no level byte)
+#   then one frame per chunk = uint32 length + 12-byte nonce + AES-GCM ciphertext
+# Every chunk is compressed and sealed on its own with AAD = header + chunk index + final
+# flag, so chunks can be processed in parallel, decrypted individually and never reordered,
+# swapped between streams or truncated unnoticed. Data without the magic is the legacy
+# single-message format (12-byte nonce + ciphertext of the whole Brotli stream).
+AEAD_MAGIC = b'MEMAEAD';
+AEAD_VERSION = 2;
+AEAD_HEADER = struct.Struct( '>7sBBBI16s' );
+AEAD_HEADER_V1 = struct.Struct( '>7sBBI16s' );
+AEAD_PREFIX_SIZE = len( AEAD_MAGIC ) + 1;  # Magic + version, enough to know the header size
+AEAD_FRAME_LENGTH = struct.Struct( '>I' );
+AEAD_CHUNK_AAD = struct.Struct( '>I?' );
+AEAD_CHUNK_CHARS = 1024 * 1024;
+CODEC_NONE = 0;
+CODEC_BROTLI = 1;
+CODEC_ZSTD = 2;
+CODEC_LZ4 = 3;
+ARCHIVE_COMPRESSION = ( CODEC_BROTLI, BROTLI_ARCHIVE_LEVEL );
+CHUNK_WORKERS = os.cpu_count() or 1;
+
+# Chunked MongoDB storage: texts above the threshold store each sealed chunk as its own
+# document, so no single BSON document has to hold the whole memento
+CHUNKED_CONTENT_THRESHOLD_CHARS = 2 * 1024 * 1024;
+
+# Local -> MongoDB migration pipeline
+MIGRATION_BATCH_SIZE = 200;                             # Documents per insert_many call
+MIGRATION_WORKERS = min( 8, ( os.cpu_count() or 2 ) );  # Key derivation/encryption threads
+
+# Content history retention in MongoDB (MEMENTO_CONTENT_RETENTION overrides; 0 keeps everything)
+CONTENT_RETENTION_COUNT = int( os.getenv( 'MEMENTO_CONTENT_RETENTION', '50' ) );
+CONTENT_PRUNE_INTERVAL_SEC = 6 * 60 * 60;
+
+# Derived AES keys are cached for this long after their last use
+KEY_CACHE_TTL_SECONDS = 15 * 60;
+# The expiry timer fires this long after the oldest entry's TTL, so the entry is past it
+KEY_CACHE_SWEEP_SLACK_SECONDS = 0.1;
+
+# Envelope encryption: each memento's content is encrypted with a random data key, stored
+# wrapped (AES-GCM) under the passphrase-derived key as version byte + nonce + ciphertext
+KEY_WRAP_VERSION = 1;
+DATA_KEY_SIZE = 32;
+
+# Mementos without a wrapped key store this many bytes of HMAC(key) to check passphrases
+KEY_CHECK_SIZE = 16;
+
+# Passphrase key derivation. New mementos record their KDF parameters (and a random salt);
+# mementos without a record use LEGACY_KDF_PARAMS with a salt built from the memento id.
+KDF_PBKDF2 = 'pbkdf2-sha256';
+KDF_SCRYPT = 'scrypt';
+KDF_ARGON2 = 'argon2id';
+LEGACY_KDF_PARAMS = { 'name': KDF_PBKDF2, 'iterations': 100000 };
+KDF_SALT_SIZE = 16;
+
+# Calibration starts from (and never goes below) these parameters, raising one cost
+# parameter until a derivation takes KDF_TARGET_SECONDS on this machine
+KDF_MIN_PARAMS = {
+    KDF_PBKDF2: { 'name': KDF_PBKDF2, 'iterations': 100000 },
+    KDF_SCRYPT: { 'name': KDF_SCRYPT, 'n': 2 ** 14, 'r': 8, 'p': 1 },
+    KDF_ARGON2: { 'name': KDF_ARGON2, 'iterations': 1, 'lanes': 4, 'memory_cost': 64 * 1024 },
+};
+KDF_COST_PARAM = { KDF_PBKDF2: 'iterations', KDF_SCRYPT: 'n', KDF_ARGON2: 'iterations' };
+KDF_MAX_COST = { KDF_PBKDF2: 10_000_000, KDF_SCRYPT: 2 ** 18, KDF_ARGON2: 64 };
+
+
+
+def available_kdfs() -> list:
+    """Names of the key derivation functions usable on this machine."""
+    return [ KDF_PBKDF2, KDF_SCRYPT ] + ( [ KDF_ARGON2 ] if HAS_ARGON2 else [] );
+
+
+def _configured_kdf() -> str:
+    """The KDF named by MEMENTO_KDF if it is available, otherwise the strongest available one."""
+    fallback = KDF_ARGON2 if HAS_ARGON2 else KDF_SCRYPT;
+    name = os.getenv( 'MEMENTO_KDF', fallback );
+    if name not in available_kdfs():
+        logger.warning( f"MEMENTO_KDF={name!r} is not an available key derivation function "
+                        f"({', '.join( available_kdfs() )}); using {fallback}" );
+        return fallback;
+    return name;
+
+
+# MEMENTO_KDF / MEMENTO_KDF_TARGET_MS override the KDF for new passphrases and the unlock latency
+DEFAULT_KDF = _configured_kdf();
+KDF_TARGET_SECONDS = float( os.getenv( 'MEMENTO_KDF_TARGET_MS', '250' ) ) / 1000;
+KDF_CALIBRATION_FILE = '.kdf_calibration.json';
+_kdf_calibration_lock = threading.Lock();  # Calibrate once even when several threads set passphrases
+
+# AES-GCM cipher contexts kept per key (a few open mementos plus a re-key in progress)
+CIPHER_CACHE_SIZE = 8;
+
+
+class DerivedKeyCache:
+    """Process-wide cache of derived AES keys.
+    
+    Entries are keyed by (memento_id, salt, passphrase digest) so switching between
+    encrypted mementos skips the KDF. The passphrase itself is never stored - only an
+    HMAC of it under a per-process random secret. Cached keys are held in bytearrays
+    and zeroed when evicted, on lock and at interpreter exit. Every expired entry is
+    swept on each get() and put(), and a timer sweeps entries nobody looks up again.
+    """
+    
+    def __init__( self, ttl_seconds: float = KEY_CACHE_TTL_SECONDS ):
+        self.ttl_seconds = ttl_seconds;
+        self._secret = os.urandom( 32 );
+        self._entries: Dict[ tuple, Tuple[ bytearray, float ] ] = {};
+        self._lock = threading.Lock();
+        self._timer: Optional[ threading.Timer ] = None;
+    
+    def _make_key( self, memento_id: int, salt: bytes, passphrase: str,
+                   kdf_params: Optional[ Dict[ str, Any ] ] = None ) -> tuple:
+        """Build the cache key without keeping the passphrase in memory.
+        
+        The KDF parameters are part of the key, so a re-calibrated KDF never hits
+        a key derived with the old parameters.
+        """
+        digest = hmac.new( self._secret, passphrase.encode( 'utf-8' ), hashlib.sha256 ).digest();
+        params = json.dumps( kdf_params, sort_keys=True ) if kdf_params else '';
+        return ( memento_id, bytes( salt ), digest, params );
+    
+    def get( self, memento_id: int, salt: bytes, passphrase: str,
+             kdf_params: Optional[ Dict[ str, Any ] ] = None ) -> Optional[ bytes ]:
+        """Return a cached key, or None if missing or expired."""
+        cache_key = self._make_key( memento_id, salt, passphrase, kdf_params );
+        now = time.time();
+        
+        with self._lock:
+            self._sweep( now );
+            entry = self._entries.get( cache_key );
+            if entry is None:
+                return None;
+            
+            key = entry[ 0 ];
+            self._entries[ cache_key ] = ( key, now );
+            return bytes( key );
+    
+    def put( self, memento_id: int, salt: bytes, passphrase: str, key: bytes,
+             kdf_params: Optional[ Dict[ str, Any ] ] = None ):
+        """Store a derived key."""
+        cache_key = self._make_key( memento_id, salt, passphrase, kdf_params );
+        
+        now = time.time();
+        with self._lock:
+            self._sweep( now );
+            old = self._entries.pop( cache_key, None );
+            if old is not None:
+                self._zero( old[ 0 ] );
+            self._entries[ cache_key ] = ( bytearray( key ), now );
+            self._arm_timer( now );
+    
+    def clear( self, memento_id: Optional[ int ] = None ):
+        """Zero and drop cached keys, for one memento or all of them."""
+        with self._lock:
+            for cache_key in list( self._entries ):
+                if memento_id is None or cache_key[ 0 ] == memento_id:
+                    self._zero( self._entries.pop( cache_key )[ 0 ] );
+            if not self._entries and self._timer is not None:
+                self._timer.cancel();
+                self._timer = None;
+    
+    def _sweep( self, now: float ):
+        """Zero and drop every entry unused for longer than the TTL. Callers hold _lock."""
+        for cache_key, ( key, last_used ) in list( self._entries.items() ):
+            if now - last_used > self.ttl_seconds:
+                self._zero( key );
+                del self._entries[ cache_key ];
+    
+    def _arm_timer( self, now: float ):
+        """Schedule a sweep just after the least recently used entry expires. Callers hold _lock."""
+        if self._timer is not None or not self._entries:
+            return;
+        oldest = min( last_used for _, last_used in self._entries.values() );
+        delay = max( 0.0, oldest + self.ttl_seconds - now ) + KEY_CACHE_SWEEP_SLACK_SECONDS;
+        self._timer = threading.Timer( delay, self._expire );
+        self._timer.daemon = True;
+        self._timer.start();
+    
+    def _expire( self ):
+        """Timer callback: sweep, then re-arm while entries remain."""
+        with self._lock:
+            self._timer = None;
+            now = time.time();
+            self._sweep( now );
+            self._arm_timer( now );
+    
+    @staticmethod
+    def _zero( key: bytearray ):
+        """Overwrite key material in place."""
+        for i in range( len( key ) ):
+            key[ i ] = 0;
+
+
+_key_cache = DerivedKeyCache();
+atexit.register( _key_cache.clear );
+
+
+def get_key_cache() -> DerivedKeyCache:
+    """Get the process-wide derived key cache."""
+    return _key_cache;
+
+
+# Shared worker pool for chunk compression/encryption (Brotli and AES-GCM release the GIL)
+_chunk_executor = None;
+_chunk_executor_lock = threading.Lock();
+
+
+def _compress( data: bytes, codec: int, level: int ) -> bytes:
+    """Compress one chunk with the codec recorded in its stream header."""
+    if codec == CODEC_BROTLI:
+        return brotli.compress( data, quality=level );
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor( level=level ).compress( data );
+    if codec == CODEC_LZ4:
+        return lz4.frame.compress( data, compression_level=level );
+    return data;
+
+
+def _decompress( data: bytes, codec: int ) -> bytes:
+    """Decompress one chunk with the codec recorded in its stream header."""
+    if codec == CODEC_BROTLI:
+        return brotli.decompress( data );
+    if codec == CODEC_ZSTD:
+        if not HAS_ZSTD:
+            raise RuntimeError( "Data was compressed with zstd, but zstandard is not installed" );
+        return zstandard.ZstdDecompressor().decompress( data );
+    if codec == CODEC_LZ4:
+        if not HAS_LZ4:
+            raise RuntimeError( "Data was compressed with lz4, but lz4 is not installed" );
+        return lz4.frame.decompress( data );
+    return data;
+
+
+def _get_chunk_executor() -> ThreadPoolExecutor:
+    """Get the process-wide chunk worker pool, creating it on first use."""
+    global _chunk_executor;
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            _chunk_executor = ThreadPoolExecutor( max_workers=CHUNK_WORKERS, thread_name_prefix="ChunkWorker" );
+        return _chunk_executor;
+
+
+def _map_ordered( func: Callable, items: Iterable, parallel: bool = True ) -> Iterator:
+    """Map func over items on the chunk pool, yielding results in order.
+    
+    At most two results per worker are in flight, so streams stay bounded in memory.
+    """
+    if not parallel or CHUNK_WORKERS <= 1:
+        for item in items:
+            yield func( item );
+        return;
+    
+    executor = _get_chunk_executor();
+    pending = deque();
+    for item in items:
+        pending.append( executor.submit( func, item ) );
+        if len( pending ) >= CHUNK_WORKERS * 2:
+            yield pending.popleft().result();
+    while pending:
+        yield pending.popleft().result();
+
 
 class EncryptionManager:
     """Manages encryption, compression, and storage for Memento.
@@ -72,6 +373,17 @@ class EncryptionManager:
         # Track warning state
         self._warning_file = self.memento_root / '.mongo_warning_shown';
         self._warning_count = self._load_warning_count();
+        
+        # Background content retention job
+        self._retention_thread = None;
+        self._retention_stop = threading.Event();
+        
+        # Background push of locally committed content to MongoDB (see start_replication)
+        self._replicator = None;
+        
+        # AES-GCM contexts by key, most recently used last
+        self._ciphers: 'OrderedDict[ bytes, AESGCM ]' = OrderedDict();
+        self._cipher_lock = threading.Lock();
     
     @classmethod
     def get_instance( cls, memento_root: Path = None ) -> 'EncryptionManager':
@@ -179,57 +491,435 @@ class EncryptionManager:
         
         return private_pem, public_pem
     
-    def derive_aes_key(self, passphrase: str, salt: bytes) -> bytes:
-        """Derive AES key from passphrase using PBKDF2."""
+    def derive_aes_key(self, passphrase: str, salt: bytes, kdf_params: Optional[Dict[str, Any]] = None) -> bytes:
+        """Derive AES key from passphrase with the given KDF parameters (default: LEGACY_KDF_PARAMS)."""
         if not HAS_CRYPTO:
             raise RuntimeError("Cryptography library not available")
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
+        params = kdf_params or LEGACY_KDF_PARAMS
+        name = params['name']
+        if name == KDF_PBKDF2:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=params['iterations'],
+            )
+        elif name == KDF_SCRYPT:
+            kdf = Scrypt(salt=salt, length=32, n=params['n'], r=params['r'], p=params['p'])
+        elif name == KDF_ARGON2 and HAS_ARGON2:
+            kdf = Argon2id(
+                salt=salt,
+                length=32,
+                iterations=params['iterations'],
+                lanes=params['lanes'],
+                memory_cost=params['memory_cost'],
+            )
+        else:
+            raise RuntimeError(f"Key derivation function {name} is not available")
         return kdf.derive(passphrase.encode())
     
-    def encrypt_data(self, data: str, aes_key: bytes) -> bytes:
-        """Encrypt and compress data."""
+    def get_aes_key( self, memento_id: int, passphrase: str, salt: bytes,
+                     kdf_params: Optional[ Dict[ str, Any ] ] = None ) -> bytes:
+        """Get the AES key for a memento, running the KDF only on a cache miss."""
+        key = _key_cache.get( memento_id, salt, passphrase, kdf_params );
+        if key is None:
+            key = self.derive_aes_key( passphrase, salt, kdf_params );
+            _key_cache.put( memento_id, salt, passphrase, key, kdf_params );
+        return key;
+    
+    def available_kdfs( self ) -> list:
+        """Names of the key derivation functions usable on this machine."""
+        return available_kdfs();
+    
+    def time_kdf( self, kdf_params: Dict[ str, Any ] ) -> float:
+        """Seconds taken by one derivation with the given parameters."""
+        started = time.perf_counter();
+        self.derive_aes_key( "calibration", os.urandom( KDF_SALT_SIZE ), kdf_params );
+        return time.perf_counter() - started;
+    
+    def calibrate_kdf( self, name: str = None, target_seconds: float = None ) -> Dict[ str, Any ]:
+        """Pick parameters for a KDF so one derivation takes about target_seconds here.
+        
+        Starts from KDF_MIN_PARAMS (the floor for brute-force cost on slow machines)
+        and raises the KDF's cost parameter: proportionally for PBKDF2 and Argon2id,
+        by doubling for scrypt, whose n must be a power of two. Memory-hard
+        parameters (scrypt r/p, Argon2id memory) stay fixed.
+        """
+        name = name or DEFAULT_KDF;
+        target_seconds = KDF_TARGET_SECONDS if target_seconds is None else target_seconds;
+        if name not in self.available_kdfs():
+            raise RuntimeError( f"Key derivation function {name} is not available" );
+        
+        params = dict( KDF_MIN_PARAMS[ name ] );
+        cost = KDF_COST_PARAM[ name ];
+        elapsed = self.time_kdf( params );
+        if name == KDF_SCRYPT:
+            while elapsed * 2 <= target_seconds and params[ cost ] < KDF_MAX_COST[ name ]:
+                params[ cost ] *= 2;
+                elapsed = self.time_kdf( params );
+        elif elapsed < target_seconds:
+            scaled = int( params[ cost ] * target_seconds / max( elapsed, 1e-6 ) );
+            params[ cost ] = min( KDF_MAX_COST[ name ], max( params[ cost ], scaled ) );
+        return params;
+    
+    def default_kdf_params( self ) -> Dict[ str, Any ]:
+        """Calibrated parameters for DEFAULT_KDF at KDF_TARGET_SECONDS, measured once per machine.
+        
+        The result is cached in KDF_CALIBRATION_FILE under the memento root, so only
+        the first passphrase set on a machine pays for calibration. Concurrent callers
+        wait for one calibration, and the file is replaced atomically.
+        """
+        cache_key = f"{DEFAULT_KDF}@{int( KDF_TARGET_SECONDS * 1000 )}ms";
+        calibration_file = self.memento_root / KDF_CALIBRATION_FILE;
+        with _kdf_calibration_lock:
+            try:
+                with open( calibration_file, 'r' ) as f:
+                    calibrations = json.load( f );
+            except ( OSError, ValueError ):
+                calibrations = {};
+            if not isinstance( calibrations, dict ):
+                calibrations = {};
+            
+            params = calibrations.get( cache_key );
+            if not isinstance( params, dict ) or params.get( 'name' ) != DEFAULT_KDF:
+                params = self.calibrate_kdf( DEFAULT_KDF, KDF_TARGET_SECONDS );
+                calibrations[ cache_key ] = params;
+                tmp_path = calibration_file.with_name( f"{KDF_CALIBRATION_FILE}.{os.getpid()}.tmp" );
+                try:
+                    self.memento_root.mkdir( parents=True, exist_ok=True );
+                    with open( tmp_path, 'w' ) as f:
+                        json.dump( calibrations, f, indent=2 );
+                    os.replace( tmp_path, calibration_file );
+                except OSError as e:
+                    logger.warning( f"Failed to save KDF calibration: {e}" );
+        return dict( params );
+    
+    def new_kdf_params( self ) -> Dict[ str, Any ]:
+        """KDF parameters for a new passphrase: the calibrated defaults plus a random salt."""
+        return dict( self.default_kdf_params(), salt=os.urandom( KDF_SALT_SIZE ).hex() );
+    
+    def key_check_value( self, aes_key: bytes ) -> bytes:
+        """Short authenticated fingerprint of a key, for checking a passphrase without any content."""
+        return hmac.new( aes_key, b'memento-key-check', hashlib.sha256 ).digest()[ :KEY_CHECK_SIZE ];
+    
+    def generate_data_key( self ) -> bytes:
+        """Create a random per-memento data key."""
+        return os.urandom( DATA_KEY_SIZE );
+    
+    def wrap_key( self, data_key: bytes, wrapping_key: bytes, memento_id: int ) -> bytes:
+        """Encrypt a data key under a passphrase-derived key, bound to the memento id."""
+        nonce = os.urandom( 12 );
+        aad = f"memento-key:{memento_id}".encode( 'utf-8' );
+        return bytes( [ KEY_WRAP_VERSION ] ) + nonce + AESGCM( wrapping_key ).encrypt( nonce, data_key, aad );
+    
+    def unwrap_key( self, wrapped_key: bytes, wrapping_key: bytes, memento_id: int ) -> bytes:
+        """Recover a data key wrapped by wrap_key().
+        
+        Raises:
+            InvalidTag: If the wrapping key (i.e. the passphrase) is wrong
+            ValueError: If the wrapped key is in an unknown format
+        """
+        if len( wrapped_key ) < 13 or wrapped_key[ 0 ] != KEY_WRAP_VERSION:
+            raise ValueError( "Unsupported wrapped key format" );
+        aad = f"memento-key:{memento_id}".encode( 'utf-8' );
+        return AESGCM( wrapping_key ).decrypt( wrapped_key[ 1:13 ], wrapped_key[ 13: ], aad );
+    
+    def _cipher( self, aes_key: bytes ) -> 'AESGCM':
+        """Get the cached AES-GCM context for a key, creating it on first use."""
+        aes_key = bytes( aes_key );
+        with self._cipher_lock:
+            cipher = self._ciphers.get( aes_key );
+            if cipher is None:
+                cipher = AESGCM( aes_key );
+                self._ciphers[ aes_key ] = cipher;
+                while len( self._ciphers ) > CIPHER_CACHE_SIZE:
+                    self._ciphers.popitem( last=False );
+            else:
+                self._ciphers.move_to_end( aes_key );
+            return cipher;
+    
+    def release_cipher( self, aes_key: Optional[ bytes ] = None ):
+        """Drop the cached context for a key (or all of them), e.g. when a memento is locked."""
+        with self._cipher_lock:
+            if aes_key is None:
+                self._ciphers.clear();
+            else:
+                self._ciphers.pop( bytes( aes_key ), None );
+    
+    def encrypt_data( self, data: str, aes_key: bytes, codec: int = None, level: int = None ) -> bytes:
+        """Compress and encrypt text into the streaming chunked format.
+        
+        Args:
+            codec, level: Compression to use (default: choose_compression() for an ordinary save)
+        """
+        return b''.join( self.encrypt_stream( data, aes_key, codec, level ) );
+    
+    def choose_compression( self, size_chars: int, hot: bool = False ) -> Tuple[ int, int ]:
+        """Pick (codec, level) for a save.
+        
+        Hot saves (rapid autosaves) and very large texts favour speed: zstd or lz4 when
+        installed, otherwise a fast Brotli level. Other saves use the default Brotli level;
+        versions that leave the active window are later rewritten with ARCHIVE_COMPRESSION.
+        """
+        if hot or size_chars > LARGE_TEXT_CHARS:
+            if HAS_ZSTD:
+                return CODEC_ZSTD, ZSTD_HOT_LEVEL;
+            if HAS_LZ4:
+                return CODEC_LZ4, LZ4_HOT_LEVEL;
+            return CODEC_BROTLI, BROTLI_HOT_LEVEL;
+        return CODEC_BROTLI, BROTLI_COMPRESSION_LEVEL;
+    
+    def stream_compression( self, data: bytes ) -> Optional[ Tuple[ int, int ] ]:
+        """Get the (codec, level) recorded in the header of chunked-format data.
+        
+        Returns:
+            None for legacy data or version 1 headers, which record no level
+        """
+        try:
+            header = bytes( data[ :AEAD_HEADER.size ] );
+            if len( header ) < AEAD_PREFIX_SIZE or header[ AEAD_PREFIX_SIZE - 1 ] != AEAD_VERSION:
+                return None;
+            codec, level, _ = self._parse_stream_header( header );
+            return codec, level;
+        except ValueError:
+            return None;
+    
+    def decrypt_data( self, encrypted_data: bytes, aes_key: bytes ) -> str:
+        """Decrypt and decompress data in the chunked format or the legacy single-message format."""
+        if not self.has_encryption_support:
+            raise RuntimeError( "Encryption/compression libraries not available" );
+        
+        if bytes( encrypted_data[ :len( AEAD_MAGIC ) ] ) == AEAD_MAGIC:
+            view = memoryview( encrypted_data );
+            header, offset = self._split_header( view );
+            return ''.join( self.open_chunks( header, self._iter_frames( view, offset ), aes_key ) );
+        
+        # Legacy format: nonce + ciphertext of the whole compressed text
+        nonce = encrypted_data[ :12 ];
+        ciphertext = encrypted_data[ 12: ];
+        compressed = self._cipher( aes_key ).decrypt( nonce, ciphertext, None );
+        return brotli.decompress( compressed ).decode( 'utf-8' );
+    
+    def check_key( self, encrypted_data: bytes, aes_key: bytes ) -> bool:
+        """Check that aes_key opens the data, authenticating as little of it as possible.
+        
+        For the chunked format only the first chunk is decrypted (no decompression),
+        which is enough to prove the key; legacy data has to be decrypted whole.
+        """
+        try:
+            if bytes( encrypted_data[ :len( AEAD_MAGIC ) ] ) != AEAD_MAGIC:
+                self.decrypt_data( encrypted_data, aes_key );
+                return True;
+            view = memoryview( encrypted_data );
+            header, offset = self._split_header( view );
+            index, blob, final = next( self._number_frames( self._iter_frames( view, offset ) ) );
+            self._cipher( aes_key ).decrypt( blob[ :12 ], blob[ 12: ], header + AEAD_CHUNK_AAD.pack( index, final ) );
+            return True;
+        except Exception:
+            return False;
+    
+    def reencrypt_data( self, encrypted_data: bytes, old_key: bytes, new_key: bytes ) -> bytes:
+        """Re-encrypt data under a new key without decompressing or decoding it.
+        
+        Each chunk is decrypted and sealed again under a fresh stream header that
+        keeps the codec, level and chunk size, so changing a passphrase costs one
+        AES-GCM pass per chunk. Legacy data is converted to the chunked format.
+        
+        Raises:
+            InvalidTag: If old_key does not open the data or it was tampered with
+        """
+        if not self.has_encryption_support:
+            raise RuntimeError( "Encryption/compression libraries not available" );
+        
+        if bytes( encrypted_data[ :len( AEAD_MAGIC ) ] ) != AEAD_MAGIC:
+            return self.encrypt_data( self.decrypt_data( encrypted_data, old_key ), new_key );
+        
+        view = memoryview( encrypted_data );
+        old_header, offset = self._split_header( view );
+        codec, level, chunk_chars = self._parse_stream_header( old_header );
+        new_header = self.make_stream_header( codec, level, chunk_chars );
+        old_cipher = self._cipher( old_key );
+        new_cipher = self._cipher( new_key );
+        
+        def reseal( item ) -> bytes:
+            index, blob, final = item;
+            aad = AEAD_CHUNK_AAD.pack( index, final );
+            piece = old_cipher.decrypt( blob[ :12 ], blob[ 12: ], old_header + aad );
+            nonce = os.urandom( 12 );
+            blob = nonce + new_cipher.encrypt( nonce, piece, new_header + aad );
+            return AEAD_FRAME_LENGTH.pack( len( blob ) ) + blob;
+        
+        frames = self._number_frames( self._iter_frames( view, offset ) );
+        return new_header + b''.join( _map_ordered( reseal, frames ) );
+    
+    def make_stream_header( self, codec: int = None, level: int = None, chunk_chars: int = None ) -> bytes:
+        """Create the header for a new chunked stream (with a fresh random stream id)."""
+        if codec is None:
+            codec, level = CODEC_BROTLI, BROTLI_COMPRESSION_LEVEL;
+        chunk_chars = AEAD_CHUNK_CHARS if chunk_chars is None else chunk_chars;
+        return AEAD_HEADER.pack( AEAD_MAGIC, AEAD_VERSION, codec, level or 0, chunk_chars, os.urandom( 16 ) );
+    
+    @staticmethod
+    def _header_size( prefix: bytes ) -> int:
+        """Size of the stream header that starts with prefix (magic + version)."""
+        if len( prefix ) < AEAD_PREFIX_SIZE or prefix[ :len( AEAD_MAGIC ) ] != AEAD_MAGIC:
+            raise ValueError( "Not a chunked encrypted stream" );
+        version = prefix[ AEAD_PREFIX_SIZE - 1 ];
+        if version == AEAD_VERSION:
+            return AEAD_HEADER.size;
+        if version == 1:
+            return AEAD_HEADER_V1.size;
+        raise ValueError( f"Unsupported encrypted stream version {version}" );
+    
+    @classmethod
+    def _parse_stream_header( cls, header: bytes ) -> Tuple[ int, int, int ]:
+        """Validate a stream header and return (codec, level, chunk_chars)."""
+        if len( header ) != cls._header_size( header ):
+            raise ValueError( "Truncated encrypted stream header" );
+        if len( header ) == AEAD_HEADER.size:
+            _, _, codec, level, chunk_chars, _ = AEAD_HEADER.unpack( header );
+        else:
+            _, _, codec, chunk_chars, _ = AEAD_HEADER_V1.unpack( header );
+            level = BROTLI_COMPRESSION_LEVEL;
+        if codec not in ( CODEC_NONE, CODEC_BROTLI, CODEC_ZSTD, CODEC_LZ4 ) or chunk_chars <= 0:
+            raise ValueError( "Corrupt encrypted stream header" );
+        return codec, level, chunk_chars;
+    
+    def seal_chunks( self, text: str, aes_key: bytes, header: bytes ) -> Iterator[ bytes ]:
+        """Compress and encrypt text chunk by chunk (nonce + ciphertext each), in parallel.
+        
+        Chunk i holds characters [i * chunk_chars, (i + 1) * chunk_chars) of the text;
+        empty text still produces one (final) chunk.
+        """
         if not self.has_encryption_support:
-            raise RuntimeError("Encryption/compression libraries not available")
+            raise RuntimeError( "Encryption/compression libraries not available" );
         
-        # Compress first
-        compressed = brotli.compress(data.encode('utf-8'), quality=BROTLI_COMPRESSION_LEVEL)
+        codec, level, chunk_chars = self._parse_stream_header( header );
+        aesgcm = self._cipher( aes_key );
+        count = max( 1, -( -len( text ) // chunk_chars ) );
         
-        # Then encrypt
-        aesgcm = AESGCM(aes_key)
-        nonce = os.urandom(12)  # 96-bit nonce for GCM
-        ciphertext = aesgcm.encrypt(nonce, compressed, None)
+        def seal( index: int ) -> bytes:
+            piece = _compress( text[ index * chunk_chars:( index + 1 ) * chunk_chars ].encode( 'utf-8' ), codec, level );
+            nonce = os.urandom( 12 );
+            return nonce + aesgcm.encrypt( nonce, piece, header + AEAD_CHUNK_AAD.pack( index, index == count - 1 ) );
         
-        # Combine nonce + ciphertext
-        return nonce + ciphertext
+        return _map_ordered( seal, range( count ), parallel=count > 1 );
     
-    def decrypt_data(self, encrypted_data: bytes, aes_key: bytes) -> str:
-        """Decrypt and decompress data."""
+    def open_chunks( self, header: bytes, sealed: Iterable[ bytes ], aes_key: bytes ) -> Iterator[ str ]:
+        """Decrypt and decompress sealed chunks in order, in parallel.
+        
+        Raises:
+            ValueError: If the stream has no chunks
+            InvalidTag: If any chunk was modified, reordered, swapped or the stream truncated
+        """
         if not self.has_encryption_support:
-            raise RuntimeError("Encryption/compression libraries not available")
+            raise RuntimeError( "Encryption/compression libraries not available" );
         
-        # Extract nonce and ciphertext
-        nonce = encrypted_data[:12]
-        ciphertext = encrypted_data[12:]
+        codec, _, _ = self._parse_stream_header( header );
+        aesgcm = self._cipher( aes_key );
         
-        # Decrypt
-        aesgcm = AESGCM(aes_key)
-        compressed = aesgcm.decrypt(nonce, ciphertext, None)
+        def open_one( item ) -> str:
+            index, blob, final = item;
+            piece = aesgcm.decrypt( blob[ :12 ], blob[ 12: ], header + AEAD_CHUNK_AAD.pack( index, final ) );
+            return _decompress( piece, codec ).decode( 'utf-8' );
         
-        # Decompress
-        return brotli.decompress(compressed).decode('utf-8')
+        return _map_ordered( open_one, self._number_frames( sealed ) );
+    
+    @staticmethod
+    def _number_frames( sealed: Iterable[ bytes ] ) -> Iterator[ Tuple[ int, bytes, bool ] ]:
+        """Yield (index, sealed chunk, is_final), looking one chunk ahead to find the final one."""
+        iterator = iter( sealed );
+        current = next( iterator, None );
+        if current is None:
+            raise ValueError( "Encrypted stream has no chunks" );
+        index = 0;
+        while current is not None:
+            following = next( iterator, None );
+            yield index, current, following is None;
+            current = following;
+            index += 1;
+    
+    def encrypt_stream( self, data: str, aes_key: bytes, codec: int = None, level: int = None,
+                        chunk_chars: int = None ) -> Iterator[ bytes ]:
+        """Yield the chunked format piece by piece: the header, then one frame per chunk."""
+        header = self.make_stream_header( codec, level, chunk_chars );
+        yield header;
+        for blob in self.seal_chunks( data, aes_key, header ):
+            yield AEAD_FRAME_LENGTH.pack( len( blob ) ) + blob;
+    
+    def decrypt_stream( self, f, aes_key: bytes ) -> Iterator[ str ]:
+        """Yield decrypted text chunk by chunk from a binary file object in the chunked format."""
+        header = f.read( AEAD_PREFIX_SIZE );
+        header += f.read( self._header_size( header ) - len( header ) );
+        return self.open_chunks( header, self._read_frames( f ), aes_key );
+    
+    def decrypt_chunk( self, encrypted_data: bytes, aes_key: bytes, index: int ) -> str:
+        """Decrypt a single chunk of chunked-format data, skipping the frames before it.
+        
+        Returns characters [index * chunk_chars, (index + 1) * chunk_chars) of the text.
+        """
+        view = memoryview( encrypted_data );
+        header, offset = self._split_header( view );
+        codec, _, _ = self._parse_stream_header( header );
+        
+        for _ in range( index ):
+            length, = AEAD_FRAME_LENGTH.unpack_from( view, offset );
+            offset += AEAD_FRAME_LENGTH.size + length;
+        if offset + AEAD_FRAME_LENGTH.size > len( view ):
+            raise IndexError( f"Chunk {index} is out of range" );
+        length, = AEAD_FRAME_LENGTH.unpack_from( view, offset );
+        start = offset + AEAD_FRAME_LENGTH.size;
+        blob = bytes( view[ start:start + length ] );
+        final = start + length >= len( view );
+        
+        piece = self._cipher( aes_key ).decrypt( blob[ :12 ], blob[ 12: ], header + AEAD_CHUNK_AAD.pack( index, final ) );
+        return _decompress( piece, codec ).decode( 'utf-8' );
+    
+    def _split_header( self, view: memoryview ) -> Tuple[ bytes, int ]:
+        """Get the stream header of chunked-format data and the offset of its first frame."""
+        size = self._header_size( bytes( view[ :AEAD_PREFIX_SIZE ] ) );
+        if len( view ) < size:
+            raise ValueError( "Truncated encrypted stream header" );
+        return bytes( view[ :size ] ), size;
+    
+    @staticmethod
+    def _iter_frames( view: memoryview, offset: int ) -> Iterator[ memoryview ]:
+        """Yield length-prefixed frames of in-memory data as memoryview slices (no copies)."""
+        while offset < len( view ):
+            if offset + AEAD_FRAME_LENGTH.size > len( view ):
+                raise ValueError( "Truncated encrypted stream" );
+            length, = AEAD_FRAME_LENGTH.unpack_from( view, offset );
+            offset += AEAD_FRAME_LENGTH.size;
+            if offset + length > len( view ):
+                raise ValueError( "Truncated encrypted stream" );
+            yield view[ offset:offset + length ];
+            offset += length;
+    
+    @staticmethod
+    def _read_frames( f ) -> Iterator[ bytes ]:
+        """Read length-prefixed frames from a binary file object."""
+        while True:
+            prefix = f.read( AEAD_FRAME_LENGTH.size );
+            if not prefix:
+                return;
+            if len( prefix ) < AEAD_FRAME_LENGTH.size:
+                raise ValueError( "Truncated encrypted stream" );
+            length, = AEAD_FRAME_LENGTH.unpack( prefix );
+            frame = f.read( length );
+            if len( frame ) < length:
+                raise ValueError( "Truncated encrypted stream" );
+            yield frame;
     
     def is_encrypted_data(self, data: bytes) -> bool:
         """Test if data appears to be encrypted/compressed binary data."""
+        if data[:len(AEAD_MAGIC)] == AEAD_MAGIC:
+            return True
+        
         if len(data) < 16:  # Too small to be our encrypted format
             return False
         
-        # Check if it looks like our format (12-byte nonce + encrypted data)
+        # Check if it looks like our legacy format (12-byte nonce + encrypted data)
         # Encrypted data should have high entropy
         if len(set(data[:16])) < 8:  # Low entropy in first 16 bytes
             return False
@@ -307,49 +997,134 @@ class EncryptionManager:
         
         return None;
     
-    def save_encrypted_content( self, memento_id: int, content: str, aes_key: bytes ):
-        """Save encrypted content to storage."""
-        encrypted_data = self.encrypt_data( content, aes_key );
+    def save_encrypted_content( self, memento_id: int, content: str, aes_key: bytes,
+                                wrapped_key: Optional[ bytes ] = None, kdf_params: Optional[ Dict[ str, Any ] ] = None ):
+        """Save encrypted content to storage.
         
-        content_doc = {
-            'memento_id': memento_id,
-            'type': 'content',
-            'timestamp': self._get_timestamp(),
-            'data': encrypted_data
-        };
+        The version is committed to the local `{memento_id}.enc` (tmp + fsync + rename)
+        before this returns; when replication is running (see start_replication()) it is
+        also queued in the outbox and pushed by the replication worker, so the caller never
+        waits on the network. wrapped_key and kdf_params go on the MongoDB head with it.
+        """
+        content_file = self.memento_root / f"{memento_id}.enc";
+        tmp_file = content_file.with_name( content_file.name + '.tmp' );
+        with open( tmp_file, 'wb' ) as f:
+            for piece in self.encrypt_stream( content, aes_key ):
+                f.write( piece );
+            f.flush();
+            os.fsync( f.fileno() );
+        os.replace( tmp_file, content_file );
+        
+        replicator = self._replicator;
+        if replicator is not None:
+            replicator.enqueue(
+                memento_id, content_file, chunked=len( content ) > CHUNKED_CONTENT_THRESHOLD_CHARS,
+                wrapped_key=wrapped_key, kdf=kdf_params
+            );
+    
+    @property
+    def is_replicating( self ) -> bool:
+        """Whether saved content versions are queued for MongoDB (start_replication() was called)."""
+        return self._replicator is not None;
+    
+    def start_replication( self ) -> Optional[ 'MongoDBReplicator' ]:
+        """Start the worker that pushes queued content versions to MongoDB.
         
+        Versions queued by earlier runs are pushed first. Returns None without pymongo.
+        """
+        if not HAS_PYMONGO:
+            return None;
+        if self._replicator is None:
+            self._replicator = MongoDBReplicator(
+                self.memento_root / OUTBOX_DIR, self._get_mongo_collection, self._split_stream
+            );
+            # Push as soon as MongoDB comes back rather than when the backoff expires
+            MongoDBConnectionManager.add_state_listener( self._on_mongodb_state );
+        self._replicator.start();
+        return self._replicator;
+    
+    def _on_mongodb_state( self, connected: bool ):
+        """MongoDBConnectionManager state listener."""
+        if connected:
+            self.wake_replication();
+    
+    def wake_replication( self ):
+        """Push queued versions now instead of waiting out the retry backoff (e.g. after connecting)."""
+        if self._replicator is not None:
+            self._replicator.wake();
+    
+    def stop_replication( self, timeout: float = 5.0 ):
+        """Stop the replication worker; unpushed versions stay queued for the next run."""
+        if self._replicator is not None:
+            self._replicator.stop( timeout );
+    
+    def _split_stream( self, view: memoryview ) -> Tuple[ bytes, Iterator[ memoryview ] ]:
+        """Split chunked-format data into its header and sealed frames."""
+        header, offset = self._split_header( view );
+        return header, self._iter_frames( view, offset );
+    
+    def update_wrapped_key( self, memento_id: int, wrapped_key: bytes, kdf_params: Dict[ str, Any ] ):
+        """Record a memento's re-wrapped data key (and the KDF that wraps it) on its MongoDB head, if it has one."""
+        if self._replicator is not None:
+            # Versions still queued must not put the old key back on the head
+            self._replicator.set_head_fields( memento_id, wrapped_key, kdf_params );
         collection = self._get_mongo_collection();
-        if collection is not None:
-            # Check size limit for MongoDB
-            if len( encrypted_data ) > 15 * 1024 * 1024:  # 15MB safety margin
-                raise ValueError( f"Encrypted data too large for MongoDB ({len(encrypted_data) / 1024 / 1024:.1f}MB)" );
-            
-            try:
-                content_doc[ 'data' ] = Binary( encrypted_data );
-                collection.insert_one( content_doc );
-            except Exception as e:
-                logger.error( f"Failed to save encrypted content to MongoDB: {e}" );
-                # Fall back to local storage
-                self._save_content_to_local_file( memento_id, encrypted_data );
-        else:
-            # Save to local file (fallback or no MongoDB)
-            self._save_content_to_local_file( memento_id, encrypted_data );
+        if collection is None:
+            return;
+        try:
+            collection.update_one(
+                { 'memento_id': memento_id, 'type': 'head' },
+                { '$set': { 'wrapped_key': Binary( wrapped_key ), 'kdf': kdf_params } }
+            );
+        except Exception as e:
+            logger.error( f"Failed to update wrapped key in MongoDB: {e}" );
     
-    def _save_content_to_local_file( self, memento_id: int, encrypted_data: bytes ):
-        """Helper method to save encrypted content to local file."""
-        content_file = self.memento_root / f"{memento_id}.enc";
-        content_file.write_bytes( encrypted_data );
+    def _load_chunked_content( self, collection, doc: Dict[ str, Any ], aes_key: bytes ) -> str:
+        """Stream the chunk documents of a chunked content document through decryption."""
+        content_id = doc[ '_id' ];
+        expected = doc.get( 'chunk_count', 0 );
+        seen = [ 0 ];
+        
+        def chunks():
+            cursor = collection.find(
+                { 'type': 'content_chunk', 'content_id': content_id }, { 'n': 1, 'data': 1 }
+            ).sort( 'n', 1 );
+            for chunk_doc in cursor:
+                if chunk_doc[ 'n' ] != seen[ 0 ]:
+                    raise ValueError( f"Missing chunk {seen[ 0 ]} of memento {doc[ 'memento_id' ]}" );
+                seen[ 0 ] += 1;
+                yield bytes( chunk_doc[ 'data' ] );
+        
+        text = ''.join( self.open_chunks( bytes( doc[ 'header' ] ), chunks(), aes_key ) );
+        if seen[ 0 ] != expected:
+            raise ValueError( f"Expected {expected} chunks for memento {doc[ 'memento_id' ]}, found {seen[ 0 ]}" );
+        return text;
     
     def load_encrypted_content( self, memento_id: int, aes_key: bytes ) -> Optional[ str ]:
-        """Load and decrypt content from storage."""
+        """Load and decrypt content from storage.
+        
+        While a version of the memento is still queued for MongoDB the local file is newer.
+        """
         collection = self._get_mongo_collection();
+        replicator = self._replicator;
+        if collection is not None and replicator is not None and replicator.has_pending( memento_id ):
+            collection = None;
         if collection is not None:
             # Load from MongoDB via shared connection (get latest)
             try:
-                doc = collection.find_one(
-                    { 'memento_id': memento_id, 'type': 'content' },
-                    sort=[ ( 'timestamp', -1 ) ]
-                );
+                # Two point lookups through the head document, independent of history length
+                doc = None;
+                head = collection.find_one( { 'memento_id': memento_id, 'type': 'head' } );
+                if head:
+                    doc = collection.find_one( { '_id': head[ 'content_id' ] } );
+                if doc is None:
+                    # Mementos saved before head documents existed
+                    doc = collection.find_one(
+                        { 'memento_id': memento_id, 'type': 'content' },
+                        sort=[ ( 'timestamp', -1 ) ]
+                    );
+                if doc and doc.get( 'chunked' ):
+                    return self._load_chunked_content( collection, doc, aes_key );
                 if doc:
                     encrypted_data = bytes( doc[ 'data' ] );
                     return self.decrypt_data( encrypted_data, aes_key );
@@ -360,21 +1135,123 @@ class EncryptionManager:
         # Load from local file (fallback or no MongoDB)
         content_file = self.memento_root / f"{memento_id}.enc";
         if content_file.exists():
-            encrypted_data = content_file.read_bytes();
+            with open( content_file, 'rb' ) as f:
+                if f.read( len( AEAD_MAGIC ) ) == AEAD_MAGIC:
+                    # Chunked format - decrypt frame by frame without reading the whole file
+                    f.seek( 0 );
+                    return ''.join( self.decrypt_stream( f, aes_key ) );
+                f.seek( 0 );
+                encrypted_data = f.read();
             return self.decrypt_data( encrypted_data, aes_key );
         
         return None;
     
+    def latest_content_timestamps( self ) -> Optional[ Dict[ int, float ] ]:
+        """Newest content timestamp of every memento in MongoDB, in one aggregate query.
+        
+        Sorting on the type/memento_id/timestamp index and taking each group's first
+        timestamp (the $max) lets the server read one index key per memento.
+        
+        Returns:
+            { memento_id: timestamp }, or None if MongoDB is unavailable
+        """
+        collection = self._get_mongo_collection();
+        if collection is None:
+            return None;
+        
+        cursor = collection.aggregate( [
+            { '$match': { 'type': 'content' } },
+            { '$sort': { 'type': 1, 'memento_id': 1, 'timestamp': -1 } },
+            { '$group': { '_id': '$memento_id', 'timestamp': { '$first': '$timestamp' } } },
+        ] );
+        return { doc[ '_id' ]: doc[ 'timestamp' ] or 0.0 for doc in cursor };
+    
+    def prune_content_history( self, keep: int = None, memento_id: int = None ) -> int:
+        """Delete old content documents, keeping the newest `keep` per memento.
+        
+        The document a head points at is never deleted.
+        
+        Args:
+            keep: Versions to keep per memento (default CONTENT_RETENTION_COUNT; 0 or less keeps all)
+            memento_id: Only prune this memento (default: all)
+            
+        Returns:
+            Number of content documents deleted
+        """
+        keep = CONTENT_RETENTION_COUNT if keep is None else keep;
+        if keep <= 0:
+            return 0;
+        
+        collection = self._get_mongo_collection();
+        if collection is None:
+            return 0;
+        
+        if memento_id is None:
+            memento_ids = collection.distinct( 'memento_id', { 'type': 'content' } );
+        else:
+            memento_ids = [ memento_id ];
+        
+        deleted = 0;
+        for current_id in memento_ids:
+            head = collection.find_one( { 'memento_id': current_id, 'type': 'head' }, { 'content_id': 1 } );
+            head_content_id = head.get( 'content_id' ) if head else None;
+            
+            stale_ids = [
+                doc[ '_id' ]
+                for doc in collection.find(
+                    { 'memento_id': current_id, 'type': 'content' }, { '_id': 1 }
+                ).sort( 'timestamp', -1 ).skip( keep )
+                if doc[ '_id' ] != head_content_id
+            ];
+            if stale_ids:
+                deleted += collection.delete_many( { '_id': { '$in': stale_ids } } ).deleted_count;
+                collection.delete_many( { 'type': 'content_chunk', 'content_id': { '$in': stale_ids } } );
+        
+        if deleted:
+            logger.info( f"Pruned {deleted} old content documents (keeping {keep} per memento)" );
+        return deleted;
+    
+    def start_retention_job( self, interval_seconds: float = CONTENT_PRUNE_INTERVAL_SEC ):
+        """Run prune_content_history() on a background thread every interval_seconds."""
+        if CONTENT_RETENTION_COUNT <= 0:
+            return;
+        if self._retention_thread and self._retention_thread.is_alive():
+            return;  # Already running
+        
+        def retention_loop():
+            """Background thread function for content retention."""
+            while not self._retention_stop.wait( interval_seconds ):
+                try:
+                    if self.has_mongodb_support:
+                        self.prune_content_history();
+                except Exception as e:
+                    logger.error( f"Error in content retention job: {e}" );
+        
+        self._retention_stop.clear();
+        self._retention_thread = threading.Thread( target=retention_loop, name="ContentRetention", daemon=True );
+        self._retention_thread.start();
+    
+    def stop_retention_job( self ):
+        """Stop the background retention job."""
+        self._retention_stop.set();
+        self._retention_thread = None;
+    
     def _get_timestamp( self ) -> float:
         """Get current timestamp."""
         import time;
         return time.time();
     
-    def migrate_local_mementos_to_mongodb( self, passphrase: str = None ) -> int:
+    def migrate_local_mementos_to_mongodb( self, passphrase: str = None,
+                                           progress_callback: Optional[ Callable[ [ int, int, float ], None ] ] = None ) -> int:
         """Migrate local unencrypted mementos to MongoDB with encryption.
         
+        Runs as a batched pipeline: one query for the ids already in MongoDB,
+        encryption on a worker pool, unordered insert_many batches and a single
+        aggregate to verify what landed.
+        
         Args:
-            passphrase: Passphrase for encryption. If None, prompts user.
+            passphrase: Passphrase for encryption. If None, prompts user once.
+            progress_callback: Called with (processed, total, mementos_per_second) after each memento
             
         Returns:
             Number of mementos migrated
@@ -388,8 +1265,7 @@ class EncryptionManager:
             return 0;
         
         # Import here to avoid circular imports
-        from storage import FileManager, MEMENTO_ROOT;
-        from constants import make_dirs_if_missing;
+        from storage import MEMENTO_ROOT;
         
         if not MEMENTO_ROOT.exists():
             logger.info( "No local memento directory found" );
@@ -400,102 +1276,190 @@ class EncryptionManager:
             logger.error( "Could not get MongoDB collection for migration" );
             return 0;
         
-        migrated_count = 0;
         logger.info( "Starting migration of local mementos to MongoDB" );
         
-        # Find all local mementos
-        for item in MEMENTO_ROOT.iterdir():
-            if item.is_dir() and item.name.isdigit():
-                memento_id = int( item.name );
-                
+        local_dirs = {
+            int( item.name ): item
+            for item in MEMENTO_ROOT.iterdir()
+            if item.is_dir() and item.name.isdigit()
+        };
+        if not local_dirs:
+            return 0;
+        
+        # One query for everything that is already migrated
+        try:
+            existing = set( collection.distinct( 'memento_id', {
+                'type': 'content',
+                'memento_id': { '$in': list( local_dirs ) }
+            } ) );
+        except Exception as e:
+            logger.error( f"Could not list existing mementos in MongoDB: {e}" );
+            return 0;
+        
+        candidates = sorted( memento_id for memento_id in local_dirs if memento_id not in existing );
+        if not candidates:
+            logger.info( "All local mementos already exist in MongoDB" );
+            return 0;
+        
+        # Get passphrase once for the whole run
+        if passphrase is None:
+            passphrase = self._prompt_for_passphrase( candidates[ 0 ] );
+            if not passphrase:
+                logger.info( "No passphrase provided - skipping migration" );
+                return 0;
+        
+        total = len( candidates );
+        processed = 0;
+        started = time.time();
+        inserted_ids = [];
+        
+        def report_progress():
+            if progress_callback:
+                elapsed = max( time.time() - started, 1e-6 );
                 try:
-                    # Check if already exists in MongoDB
-                    existing_content = collection.find_one( {
-                        'memento_id': memento_id,
-                        'type': 'content'
-                    } );
-                    
-                    if existing_content:
-                        logger.info( f"Memento {memento_id} already exists in MongoDB - skipping" );
-                        continue;
-                    
-                    # Load the local memento
-                    file_manager = FileManager( memento_id );
-                    
-                    # Skip if already encrypted (shouldn't happen but safety check)
-                    if file_manager.is_encrypted():
-                        logger.info( f"Memento {memento_id} is already encrypted - skipping" );
-                        continue;
-                    
-                    # Get the current content
-                    content = file_manager.load_current_snapshot();
-                    
-                    if not content or content.strip() == "":
-                        logger.info( f"Memento {memento_id} is empty - skipping" );
-                        continue;
-                    
-                    # Get passphrase if not provided
-                    if passphrase is None:
-                        passphrase = self._prompt_for_passphrase( memento_id );
-                        if not passphrase:
-                            logger.info( f"No passphrase provided for memento {memento_id} - skipping" );
-                            continue;
-                    
-                    # Enable encryption on the memento (this will trigger MongoDB storage)
-                    file_manager.enable_encryption( passphrase );
-                    
-                    # Force re-save to ensure MongoDB storage  
-                    current_content = file_manager.load_current_snapshot();
-                    file_manager.write_snapshot( current_content );
-                    
-                    # Verify it was saved to MongoDB (check with small delay)
-                    import time;
-                    time.sleep( 0.1 );  # Small delay for async operations
-                    
-                    mongodb_content = collection.find_one( {
-                        'memento_id': memento_id,
-                        'type': 'content'
-                    } );
-                    
-                    if mongodb_content:
-                        logger.info( f"✅ Successfully migrated memento {memento_id} to MongoDB" );
-                        migrated_count += 1;
-                        
-                        # Create a backup of original local files before cleanup
-                        self._backup_local_memento( memento_id, item );
-                    else:
-                        # Try to save directly using the encryption manager
-                        logger.warning( f"Could not verify memento {memento_id} in MongoDB collection - attempting direct save" );
-                        
-                        try:
-                            # Use the EncryptionManager to save directly to MongoDB
-                            aes_key = file_manager._aes_key;
-                            if aes_key:
-                                self.save_encrypted_content( memento_id, current_content, aes_key );
-                                
-                                # Verify again
-                                mongodb_content = collection.find_one( {
-                                    'memento_id': memento_id,
-                                    'type': 'content'
-                                } );
-                                
-                                if mongodb_content:
-                                    logger.info( f"✅ Successfully migrated memento {memento_id} to MongoDB (direct save)" );
-                                    migrated_count += 1;
-                                    self._backup_local_memento( memento_id, item );
-                                else:
-                                    logger.error( f"Failed to verify memento {memento_id} even after direct save" );
-                            else:
-                                logger.error( f"No AES key available for memento {memento_id}" );
-                        except Exception as direct_save_error:
-                            logger.error( f"Direct save failed for memento {memento_id}: {direct_save_error}" );
-                        
+                    progress_callback( processed, total, processed / elapsed );
                 except Exception as e:
-                    logger.error( f"Error migrating memento {memento_id}: {e}" );
-                    continue;
+                    logger.warning( f"Migration progress callback failed: {e}" );
         
-        logger.info( f"Migration completed: {migrated_count} mementos migrated to MongoDB" );
-        return migrated_count;
+        # Work through the candidates one batch at a time to bound memory use
+        with ThreadPoolExecutor( max_workers=MIGRATION_WORKERS ) as pool:
+            for offset in range( 0, total, MIGRATION_BATCH_SIZE ):
+                futures = [ pool.submit( self._encrypt_memento_for_migration, collection, memento_id, passphrase )
+                            for memento_id in candidates[ offset:offset + MIGRATION_BATCH_SIZE ] ];
+                batch = [];
+                for future in as_completed( futures ):
+                    processed += 1;
+                    try:
+                        document = future.result();
+                    except Exception as e:
+                        logger.error( f"Error migrating memento: {e}" );
+                        document = None;
+                    
+                    if document is not None:
+                        batch.append( document );
+                    report_progress();
+                
+                if batch:
+                    inserted_ids.extend( self._insert_migration_batch( collection, batch ) );
+        
+        # Verify with a single aggregate instead of one find_one per memento
+        verified = set();
+        if inserted_ids:
+            try:
+                verified = { row[ '_id' ] for row in collection.aggregate( [
+                    { '$match': { 'type': 'content', 'memento_id': { '$in': inserted_ids } } },
+                    { '$group': { '_id': '$memento_id' } }
+                ] ) };
+            except Exception as e:
+                logger.error( f"Could not verify migrated mementos: {e}" );
+        
+        for memento_id in sorted( set( inserted_ids ) - verified ):
+            logger.error( f"Failed to verify memento {memento_id} in MongoDB" );
+        for memento_id in sorted( verified ):
+            # Create a backup of original local files before cleanup
+            self._backup_local_memento( memento_id, local_dirs[ memento_id ] );
+        
+        elapsed = max( time.time() - started, 1e-6 );
+        logger.info(
+            f"Migration completed: {len( verified )} of {total} mementos migrated to MongoDB "
+            f"in {elapsed:.1f}s ({total / elapsed:.1f} mementos/s)"
+        );
+        return len( verified );
+    
+    def _encrypt_memento_for_migration( self, collection, memento_id: int, passphrase: str ) -> Optional[ Dict[ str, Any ] ]:
+        """Encrypt one local memento and build its MongoDB content document (runs on the worker pool).
+        
+        Large mementos are stored chunked like replicated saves: their content_chunk
+        documents are written here, and the returned content document (written with
+        the batch) makes them visible.
+        
+        Returns:
+            Content document ready for insert_many, or None if the memento is skipped
+        """
+        from storage import FileManager;
+        
+        file_manager = FileManager( memento_id );
+        
+        # Skip if already encrypted (shouldn't happen but safety check)
+        if file_manager.is_encrypted():
+            logger.info( f"Memento {memento_id} is already encrypted - skipping" );
+            return None;
+        
+        content = file_manager.load_current_snapshot();
+        if not content or content.strip() == "":
+            logger.info( f"Memento {memento_id} is empty - skipping" );
+            return None;
+        
+        # Encrypt the local copy, then reuse its data key for the MongoDB document
+        file_manager.enable_encryption( passphrase );
+        encrypted_data = self.encrypt_data( content, file_manager._aes_key );
+        document = {
+            'memento_id': memento_id,
+            'type': 'content',
+            'timestamp': self._get_timestamp(),
+            'wrapped_key': Binary( file_manager.wrapped_key ),
+            'kdf': file_manager.kdf
+        };
+        if len( content ) > CHUNKED_CONTENT_THRESHOLD_CHARS or len( encrypted_data ) > REPLICATION_MAX_DOCUMENT_BYTES:
+            header, frames = self._split_stream( memoryview( encrypted_data ) );
+            document[ '_id' ] = ObjectId();
+            document[ 'chunked' ] = True;
+            document[ 'chunk_count' ] = write_content_chunks( collection, document[ '_id' ], memento_id, frames );
+            document[ 'header' ] = Binary( header );
+        else:
+            document[ 'data' ] = Binary( encrypted_data );
+        return document;
+    
+    def _insert_migration_batch( self, collection, documents: list ) -> list:
+        """Insert a batch of content documents without stopping at the first failure.
+        
+        Returns:
+            Memento ids whose documents were written
+        """
+        try:
+            collection.insert_many( documents, ordered=False );
+            written = documents;
+        except BulkWriteError as e:
+            failed = { error[ 'index' ] for error in e.details.get( 'writeErrors', [] ) };
+            for index in sorted( failed ):
+                logger.error( f"Failed to write memento {documents[ index ][ 'memento_id' ]} to MongoDB" );
+            written = [ document for index, document in enumerate( documents ) if index not in failed ];
+            self._discard_migration_chunks( collection, [ documents[ index ] for index in failed ] );
+        except Exception as e:
+            logger.error( f"Failed to write migration batch to MongoDB: {e}" );
+            self._discard_migration_chunks( collection, documents );
+            return [];
+        
+        # Head documents for the new versions (insert_many filled in each _id)
+        if written:
+            try:
+                collection.bulk_write( [
+                    UpdateOne(
+                        { 'memento_id': document[ 'memento_id' ], 'type': 'head' },
+                        { '$set': {
+                            'content_id': document[ '_id' ],
+                            'timestamp': document[ 'timestamp' ],
+                            'wrapped_key': document[ 'wrapped_key' ],
+                            'kdf': document[ 'kdf' ]
+                        } },
+                        upsert=True
+                    )
+                    for document in written
+                ], ordered=False );
+            except Exception as e:
+                # Loads fall back to the newest content document without a head
+                logger.warning( f"Failed to write head documents for migration batch: {e}" );
+        return [ document[ 'memento_id' ] for document in written ];
+    
+    def _discard_migration_chunks( self, collection, documents: list ):
+        """Delete the chunks written for chunked documents whose content document did not land."""
+        content_ids = [ document[ '_id' ] for document in documents if document.get( 'chunked' ) ];
+        if not content_ids:
+            return;
+        try:
+            collection.delete_many( { 'type': 'content_chunk', 'content_id': { '$in': content_ids } } );
+        except Exception as e:
+            logger.warning( f"Failed to remove chunks of unwritten migration documents: {e}" );
     
     def _prompt_for_passphrase(self, memento_id: int) -> str:
         """Prompt user for encryption passphrase."""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the passphrase key derivation functions on this machine.
+
+For each available KDF this calibrates parameters for the target unlock latency,
+then reports derivations per second at those parameters and at the minimum
+(floor) parameters - the rate an attacker with this machine could guess at.
+
+Usage: python kdf_benchmark.py [--target-ms 250] [--seconds 2]
+"""
+
+import sys;
+import time;
+import argparse;
+from pathlib import Path;
+
+from constants import MEMENTO_ROOT;
+from encryption import EncryptionManager, KDF_MIN_PARAMS, KDF_TARGET_SECONDS, DEFAULT_KDF, HAS_CRYPTO;
+
+
+def derivations_per_second( manager: EncryptionManager, params: dict, seconds: float ) -> float:
+    """Run derivations for about the given number of seconds (at least one) and return the rate."""
+    count = 0;
+    started = time.perf_counter();
+    while True:
+        manager.derive_aes_key( "benchmark", b'memento-benchmark', params );
+        count += 1;
+        elapsed = time.perf_counter() - started;
+        if elapsed >= seconds:
+            return count / elapsed;
+
+
+def describe( params: dict ) -> str:
+    """Format KDF parameters without the name."""
+    return ", ".join( f"{key}={value}" for key, value in params.items() if key not in ( 'name', 'salt' ) );
+
+
+def main():
+    parser = argparse.ArgumentParser( description="Benchmark passphrase key derivation functions." );
+    parser.add_argument( '--target-ms', type=float, default=KDF_TARGET_SECONDS * 1000,
+                         help="Target unlock latency for calibration (default: %(default).0f)" );
+    parser.add_argument( '--seconds', type=float, default=2.0,
+                         help="Time spent measuring each configuration (default: %(default).1f)" );
+    args = parser.parse_args();
+
+    if not HAS_CRYPTO:
+        print( "The cryptography package is required: pip install cryptography" );
+        return 1;
+
+    manager = EncryptionManager( Path( MEMENTO_ROOT ) );
+    target_seconds = args.target_ms / 1000;
+    print( f"Target unlock latency: {args.target_ms:.0f} ms (default KDF: {DEFAULT_KDF})\n" );
+    print( f"{'KDF':<15} {'configuration':<11} {'derivations/s':>14}  parameters" );
+
+    for name in manager.available_kdfs():
+        calibrated = manager.calibrate_kdf( name, target_seconds );
+        for label, params in ( ( "floor", KDF_MIN_PARAMS[ name ] ), ( "calibrated", calibrated ) ):
+            rate = derivations_per_second( manager, params, args.seconds );
+            print( f"{name:<15} {label:<11} {rate:>14.2f}  {describe( params )}" );
+
+    return 0;
+
+
+if __name__ == "__main__":
+    sys.exit( main() );
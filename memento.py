@@ -37,33 +37,52 @@ def setup_logging():
 
 
 def initialize_shared_services():
-    """Initialize shared MongoDB connection and EncryptionManager singletons."""
+    """Initialize the EncryptionManager and start connecting to MongoDB in the background.
+    
+    The selector shows local mementos straight away; MongoDB features switch on
+    (and MongoDB-only mementos appear) once the connection is ready.
+    """
     logger = logging.getLogger( __name__ );
     
-    # Initialize MongoDB connection manager
-    try:
-        from mongodb_connection_manager import init_mongodb_connection;
-        mongodb_uri = os.getenv( 'MONGODB_URI' ) or os.getenv( 'mongodb_uri' );
-        
-        if mongodb_uri:
-            if init_mongodb_connection( mongodb_uri, "memento_storage" ):
-                logger.info( "MongoDB connection manager initialized successfully" );
-            else:
-                logger.warning( "MongoDB connection initialization failed - using local storage only" );
-        else:
-            logger.info( "No MongoDB URI configured - using local storage only" );
-    except Exception as e:
-        logger.error( f"Error initializing MongoDB connection manager: {e}" );
+    mongodb_uri = os.getenv( 'MONGODB_URI' ) or os.getenv( 'mongodb_uri' );
     
     # Initialize shared EncryptionManager
     try:
-        from encryption import init_encryption_manager;
+        from encryption import init_encryption_manager, get_encryption_manager;
         if init_encryption_manager( MEMENTO_ROOT ):
             logger.info( "EncryptionManager initialized successfully" );
+            encryption_manager = get_encryption_manager( MEMENTO_ROOT );
+            
+            if mongodb_uri:
+                # Keep MongoDB content history bounded (each run checks MongoDB is up)
+                encryption_manager.start_retention_job();
+                
+                # Push content versions queued locally (now or by earlier runs) to MongoDB;
+                # the worker waits for the connection below
+                encryption_manager.start_replication();
         else:
             logger.warning( "EncryptionManager initialization failed - encryption features may be limited" );
     except Exception as e:
         logger.error( f"Error initializing EncryptionManager: {e}" );
+    
+    def on_mongodb_ready( connected: bool ):
+        """Runs on the connection thread once the initial attempt has finished."""
+        if connected:
+            logger.info( "MongoDB connection manager initialized successfully" );
+        else:
+            logger.warning( "MongoDB connection initialization failed - using local storage until it connects" );
+    
+    # Initialize MongoDB connection manager without blocking startup
+    try:
+        from mongodb_connection_manager import init_mongodb_connection_async;
+        
+        if mongodb_uri:
+            if not init_mongodb_connection_async( mongodb_uri, "memento_storage", on_mongodb_ready ):
+                logger.warning( "MongoDB unavailable - using local storage only" );
+        else:
+            logger.info( "No MongoDB URI configured - using local storage only" );
+    except Exception as e:
+        logger.error( f"Error initializing MongoDB connection manager: {e}" );
 
 
 def start_memento_selector():
@@ -115,7 +134,7 @@ def start_existing_memento(memento_id: int):
     
     try:
         # Load existing memento
-        file_manager = FileManager.load_memento(memento_id)
+        file_manager = FileManager.load_memento(memento_id, for_edit=True)
         
         if file_manager is None:
             raise Exception(f"Could not load memento {memento_id}")
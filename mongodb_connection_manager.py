@@ -5,22 +5,34 @@ MongoDB Connection Manager for Memento Editor.
 Provides a singleton connection manager that:
 - Opens one connection per process and reuses it for all document operations
 - Sets 1-hour session timeout with automatic reconnection
-- Gracefully handles connection drops and network issues
+- Tracks server availability from pymongo's topology monitoring, so getting a
+  collection never pings or waits on a lock
+- Reconnects on a background supervisor thread and reports state changes to listeners
 - Falls back to local storage on persistent connection failures
+- Takes pool, timeout, wire compression and read preference settings from
+  ~/.Memento/mongodb.json and MEMENTO_MONGO_* environment variables
+- Reports pool, latency and reconnect metrics (get_metrics())
+- Creates and verifies the indexes the memento queries rely on
 
 Design follows user preferences: spaces in brackets/braces and semicolons on statements.
 """
 
 import os;
+import json;
 import time;
 import logging;
 import threading;
-from typing import Optional, Callable, Any;
+import importlib.util;
+from typing import Optional, Callable, Any, Dict;
 from datetime import datetime, timedelta;
 
+from constants import MEMENTO_ROOT, MONGODB_CONFIG_FILE;
+from mongodb_metrics import MongoDBMetrics, metrics_listeners;
+
 # Optional dependencies - graceful degradation if not available
 try:
     import pymongo;
+    from pymongo import monitoring;
     from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure;
     HAS_PYMONGO = True;
 except ImportError:
@@ -29,6 +41,66 @@ except ImportError:
 
 logger = logging.getLogger( __name__ );
 
+# Tunable client options: pymongo option -> ( environment variable, type, default ).
+# Defaults < ~/.Memento/mongodb.json (same option names) < environment.
+CLIENT_OPTIONS = {
+    'maxPoolSize': ( 'MEMENTO_MONGO_MAX_POOL_SIZE', int, 20 ),
+    'minPoolSize': ( 'MEMENTO_MONGO_MIN_POOL_SIZE', int, 0 ),
+    'socketTimeoutMS': ( 'MEMENTO_MONGO_SOCKET_TIMEOUT_MS', int, 60000 ),  # 0 waits forever
+    'waitQueueTimeoutMS': ( 'MEMENTO_MONGO_WAIT_QUEUE_TIMEOUT_MS', int, 10000 ),
+    'compressors': ( 'MEMENTO_MONGO_COMPRESSORS', str, None ),  # None: every installed codec
+    'readPreference': ( 'MEMENTO_MONGO_READ_PREFERENCE', str, 'primary' ),
+};
+
+# Wire compressors in order of preference, with the module each one needs
+WIRE_COMPRESSORS = ( ( 'zstd', 'zstandard' ), ( 'snappy', 'snappy' ), ( 'zlib', 'zlib' ) );
+
+
+def available_compressors() -> str:
+    """Wire compressors whose libraries are installed, best first (server picks the first it supports)."""
+    return ','.join( name for name, module in WIRE_COMPRESSORS if importlib.util.find_spec( module ) );
+
+
+def load_client_options( config_file: Optional[ os.PathLike ] = None ) -> Dict[ str, Any ]:
+    """
+    Resolve the tunable MongoClient options.
+    
+    Args:
+        config_file: JSON file of option overrides (default: ~/.Memento/mongodb.json)
+        
+    Returns:
+        Options to pass to pymongo.MongoClient
+    """
+    options = { name: default for name, ( _, _, default ) in CLIENT_OPTIONS.items() };
+    
+    path = config_file if config_file is not None else MEMENTO_ROOT / MONGODB_CONFIG_FILE;
+    try:
+        with open( path, 'r' ) as f:
+            overrides = json.load( f );
+    except FileNotFoundError:
+        overrides = {};
+    except ( OSError, ValueError ) as e:
+        logger.warning( f"Ignoring MongoDB config file {path}: {e}" );
+        overrides = {};
+    
+    for name, ( env_var, kind, _ ) in CLIENT_OPTIONS.items():
+        sources = [ ( str( path ), overrides.get( name ) ), ( env_var, os.getenv( env_var ) ) ];
+        for source, value in sources:
+            if value is None:
+                continue;
+            try:
+                options[ name ] = kind( value );
+            except ( TypeError, ValueError ):
+                logger.warning( f"Ignoring invalid MongoDB option {name}={value!r} from {source}" );
+    
+    unknown = set( overrides ) - set( CLIENT_OPTIONS );
+    if unknown:
+        logger.warning( f"Unknown options in {path}: {', '.join( sorted( unknown ) )}" );
+    
+    if options[ 'compressors' ] is None:
+        options[ 'compressors' ] = available_compressors();
+    return options;
+
 
 class ConnectionUnavailableError( Exception ):
     """Raised when MongoDB connection cannot be established after retries."""
@@ -44,18 +116,38 @@ class MongoDBConnectionManager:
     _db = None;
     _uri = None;
     _db_name = None;
-    _last_ping_time = None;
-    _heartbeat_thread = None;
+    _supervisor_thread = None;
+    _ready_event = None;  # Set once a background init_async() attempt has finished
     _is_shutting_down = False;
-    _connection_lock = threading.RLock();
+    _connection_lock = threading.RLock();  # Only held while a client is created or swapped
+    
+    # Connection state: set while the topology has a writable server (maintained by
+    # _TopologyStateListener on pymongo's monitor threads). Readers never take a lock.
+    _connected_event = threading.Event();
+    _supervisor_wake = threading.Event();
+    _shutdown_event = threading.Event();
+    _state_listeners = [];
+    _generation = 0;  # Bumped for every new client; events from older clients are ignored
+    _metrics = MongoDBMetrics();
     
     # Connection configuration (1 hour timeout as requested)
     IDLE_TIMEOUT_MS = 60 * 60 * 1000;  # 1 hour in milliseconds
     HEARTBEAT_INTERVAL_SEC = 5 * 60;   # 5 minutes
     CONNECTION_TIMEOUT_MS = 10000;     # 10 seconds
     SERVER_SELECTION_TIMEOUT_MS = 5000; # 5 seconds
-    MAX_RECONNECT_ATTEMPTS = 3;
     BACKOFF_BASE_DELAY_SEC = 1.0;      # Exponential backoff starting delay
+    BACKOFF_MAX_DELAY_SEC = 60.0;      # ...doubling up to this between reconnect attempts
+    
+    # Indexes on the mementos collection: name -> key spec (1 ascending, -1 descending)
+    # - every query filters on type (and memento_id): listing by type, and the latest
+    #   document per memento/type via find_one( { memento_id, type }, sort=timestamp desc )
+    # - chunked content: chunk documents of one version in order
+    MEMENTO_INDEXES = {
+        'type_memento_timestamp': [ ( 'type', 1 ), ( 'memento_id', 1 ), ( 'timestamp', -1 ) ],
+        'content_chunks': [ ( 'content_id', 1 ), ( 'n', 1 ) ],
+    };
+    # Indexes created by earlier versions that no query needs any more (dropped so writes skip them)
+    RETIRED_INDEXES = ( 'memento_type_timestamp', );
     
     def __init__( self ):
         """Private constructor - use init() class method instead."""
@@ -92,49 +184,113 @@ class MongoDBConnectionManager:
             cls._uri = mongodb_uri;
             cls._db_name = database_name;
             
-            # Attempt initial connection
-            success = cls._establish_connection();
+            cls._is_shutting_down = False;
+            cls._shutdown_event.clear();
+        
+        # Attempt initial connection
+        success = cls._establish_connection();
+        
+        if success:
+            cls._ensure_indexes();
+            logger.info( f"MongoDB connection established to database '{database_name}'" );
+        else:
+            logger.error( "Failed to establish initial MongoDB connection - retrying in the background" );
+        
+        # The supervisor keeps retrying a failed connection
+        cls._start_supervisor();
+        return success;
+    
+    @classmethod
+    def init_async( cls, mongodb_uri: str, database_name: str = "memento_storage",
+                    on_ready: Optional[ Callable[ [ bool ], None ] ] = None ) -> bool:
+        """
+        Run init() on a background thread so startup never waits for server selection.
+        
+        Until the attempt finishes, get_client()/get_database()/get_collection() return
+        None and is_connected() returns False immediately, so callers fall back to
+        local storage instead of blocking.
+        
+        Args:
+            mongodb_uri: MongoDB connection URI
+            database_name: Database name (default: memento_storage)
+            on_ready: Called on the background thread with init()'s result
+            
+        Returns:
+            True if a connection attempt was started, False if there is nothing to connect to
+        """
+        if not HAS_PYMONGO:
+            logger.warning( "PyMongo not available - MongoDB features disabled" );
+            return False;
+        
+        if not mongodb_uri:
+            logger.info( "No MongoDB URI provided - using local storage only" );
+            return False;
+        
+        ready = threading.Event();
+        cls._ready_event = ready;
+        
+        def connect():
+            """Background thread function for the initial connection."""
+            success = False;
+            try:
+                success = cls.init( mongodb_uri, database_name );
+            except Exception as e:
+                logger.error( f"Error initializing MongoDB connection: {e}" );
+            finally:
+                ready.set();
             
-            if success:
-                # Start heartbeat monitoring thread
-                cls._start_heartbeat_monitor();
-                logger.info( f"MongoDB connection established to database '{database_name}'" );
-            else:
-                logger.error( "Failed to establish initial MongoDB connection" );
-                
-            return success;
+            if on_ready:
+                try:
+                    on_ready( success );
+                except Exception as e:
+                    logger.error( f"Error in MongoDB ready callback: {e}" );
+        
+        threading.Thread( target=connect, name="MongoDBInit", daemon=True ).start();
+        return True;
+    
+    @classmethod
+    def is_initializing( cls ) -> bool:
+        """Check if a background init_async() attempt is still running."""
+        ready = cls._ready_event;
+        return ready is not None and not ready.is_set();
+    
+    @classmethod
+    def wait_until_ready( cls, timeout: Optional[ float ] = None ) -> bool:
+        """
+        Wait for a background init_async() attempt to finish.
+        
+        Returns:
+            True if no attempt is running any more, False on timeout
+        """
+        ready = cls._ready_event;
+        return ready is None or ready.wait( timeout );
     
     @classmethod
     def get_client( cls ) -> Optional[ "pymongo.MongoClient" ]:
         """
-        Get the shared MongoDB client, ensuring connection is alive.
+        Get the shared MongoDB client if a server is currently available.
+        
+        Never blocks: while MongoDB is unreachable this returns None (and the
+        supervisor reconnects in the background).
         
         Returns:
             MongoClient instance if available, None otherwise
         """
-        if not cls._instance or not HAS_PYMONGO:
+        if not cls.is_connected():
             return None;
-        
-        with cls._connection_lock:
-            if not cls._ensure_connection_alive():
-                return None;
-            return cls._client;
+        return cls._client;
     
     @classmethod  
     def get_database( cls ) -> Optional[ Any ]:
         """
-        Get the shared MongoDB database, ensuring connection is alive.
+        Get the shared MongoDB database if a server is currently available.
         
         Returns:
             Database instance if available, None otherwise
         """
-        if not cls._instance or not HAS_PYMONGO:
+        if not cls.is_connected():
             return None;
-            
-        with cls._connection_lock:
-            if not cls._ensure_connection_alive():
-                return None;
-            return cls._db;
+        return cls._db;
     
     @classmethod
     def get_collection( cls, collection_name: str = "mementos" ) -> Optional[ Any ]:
@@ -154,28 +310,105 @@ class MongoDBConnectionManager:
     
     @classmethod
     def is_connected( cls ) -> bool:
-        """Check if MongoDB connection is currently active."""
-        if not cls._instance or not HAS_PYMONGO:
+        """Check if MongoDB connection is currently active (lock-free)."""
+        if not cls._instance or not HAS_PYMONGO or cls.is_initializing():
             return False;
         
-        with cls._connection_lock:
-            return cls._client is not None and cls._db is not None;
+        if cls._client is None:
+            cls._supervisor_wake.set();  # Reconnect in the background; never wait here
+            return False;
+        return cls._connected_event.is_set();
+    
+    @classmethod
+    def wait_for_connection( cls, timeout: Optional[ float ] = None ) -> bool:
+        """
+        Wait until a MongoDB server is available.
+        
+        Returns:
+            True if connected, False on timeout
+        """
+        return cls._connected_event.wait( timeout );
+    
+    @classmethod
+    def add_state_listener( cls, callback: Callable[ [ bool ], None ] ):
+        """
+        Call callback( connected ) whenever MongoDB becomes available or unavailable.
+        
+        Callbacks run on pymongo's monitor or the supervisor thread and must not block.
+        """
+        cls._state_listeners.append( callback );
+    
+    @classmethod
+    def remove_state_listener( cls, callback: Callable[ [ bool ], None ] ):
+        """Stop calling a callback registered with add_state_listener()."""
+        try:
+            cls._state_listeners.remove( callback );
+        except ValueError:
+            pass;
+    
+    @classmethod
+    def get_metrics( cls ) -> Dict[ str, Any ]:
+        """
+        Pool, latency and reconnect metrics since startup (or reset_metrics()).
+        
+        Returns:
+            { 'pool': { 'checkouts': {...}, 'connections_open': n, ... },
+              'commands': { name: { 'count', 'failures', 'avg_ms', 'max_ms' } },
+              'connects': n, 'reconnects': n, 'disconnects': n, 'since': timestamp }
+        """
+        return cls._metrics.snapshot();
+    
+    @classmethod
+    def reset_metrics( cls ):
+        """Start the metrics from zero."""
+        cls._metrics.reset();
+    
+    @classmethod
+    def _set_available( cls, available: bool, generation: Optional[ int ] = None ):
+        """Record whether the current client has a writable server and notify listeners."""
+        if generation is not None and generation != cls._generation:
+            return;  # Event from a client that has been replaced
+        
+        was_available = cls._connected_event.is_set();
+        if available:
+            cls._connected_event.set();
+        else:
+            cls._connected_event.clear();
+        if available == was_available:
+            return;
+        
+        cls._metrics.availability_changed( available );
+        if available:
+            logger.info( "MongoDB is available" );
+        else:
+            logger.warning( "MongoDB is unavailable - using local storage until it is back" );
+        for callback in list( cls._state_listeners ):
+            try:
+                callback( available );
+            except Exception as e:
+                logger.error( f"Error in MongoDB state listener: {e}" );
     
     @classmethod
     def shutdown( cls ):
         """Clean shutdown of the connection manager."""
+        cls._is_shutting_down = True;
+        cls._shutdown_event.set();
+        cls._supervisor_wake.set();
+        
+        # Stop the supervisor (outside the lock - it takes it to swap clients)
+        if cls._supervisor_thread and cls._supervisor_thread.is_alive():
+            cls._supervisor_thread.join( timeout=2.0 );
+        cls._supervisor_thread = None;
+        
         with cls._connection_lock:
-            cls._is_shutting_down = True;
-            
-            # Stop heartbeat monitor
-            if cls._heartbeat_thread and cls._heartbeat_thread.is_alive():
-                cls._heartbeat_thread.join( timeout=2.0 );
+            cls._generation += 1;
+            cls._set_available( False );
             
             # Close MongoDB connection
             if cls._client:
                 try:
                     cls._client.close();
-                    logger.info( "MongoDB connection closed" );
+                    logger.info( f"MongoDB connection closed ({cls._metrics.summary()})" );
                 except Exception as e:
                     logger.warning( f"Error closing MongoDB connection: {e}" );
                 finally:
@@ -187,15 +420,23 @@ class MongoDBConnectionManager:
         """
         Establish MongoDB connection with configured timeout settings.
         
+        The new client is built and tested without holding the lock; only the swap
+        that publishes it is locked.
+        
         Returns:
             True if connection successful, False otherwise
         """
         if not HAS_PYMONGO or not cls._uri:
             return False;
         
+        with cls._connection_lock:
+            cls._generation += 1;
+            generation = cls._generation;
+        
+        client = None;
         try:
-            # Create client with 1-hour idle timeout and other settings
-            cls._client = pymongo.MongoClient(
+            # Create client with 1-hour idle timeout, configured pool settings and metrics
+            client = pymongo.MongoClient(
                 cls._uri,
                 serverSelectionTimeoutMS=cls.SERVER_SELECTION_TIMEOUT_MS,
                 connectTimeoutMS=cls.CONNECTION_TIMEOUT_MS,
@@ -204,129 +445,135 @@ class MongoDBConnectionManager:
                 retryWrites=True,
                 retryReads=True,
                 heartbeatFrequencyMS=30000,  # 30 seconds
-                socketTimeoutMS=None,        # No socket timeout
-                waitQueueTimeoutMS=10000     # 10 seconds queue timeout
+                event_listeners=[ _TopologyStateListener( generation ) ] + metrics_listeners( cls._metrics ),
+                **load_client_options()
             );
             
             # Test connection and get database
-            cls._client.server_info();  # This will raise exception if connection fails
-            cls._db = cls._client[ cls._db_name ];
+            client.server_info();  # This will raise exception if connection fails
+            db = client[ cls._db_name ];
             
             # Perform test read/write to verify database access
             test_doc = { "_test": True, "timestamp": time.time() };
-            collection = cls._db.mementos;
+            collection = db.mementos;
             result = collection.insert_one( test_doc );
             collection.delete_one( { "_id": result.inserted_id } );
-            
-            cls._last_ping_time = time.time();
-            return True;
-            
         except Exception as e:
             logger.error( f"Failed to establish MongoDB connection: {e}" );
-            cls._client = None;
-            cls._db = None;
-            return False;
-    
-    @classmethod
-    def _ensure_connection_alive( cls ) -> bool:
-        """
-        Ensure the connection is alive, reconnect if necessary.
-        
-        Returns:
-            True if connection is alive or successfully reconnected, False otherwise
-        """
-        if cls._is_shutting_down:
+            if client is not None:
+                try:
+                    client.close();
+                except Exception:
+                    pass;  # Ignore cleanup errors
             return False;
         
-        # Quick check if we have a client
-        if cls._client is None or cls._db is None:
-            logger.info( "No active connection - attempting to reconnect" );
-            return cls._reconnect_with_backoff();
+        with cls._connection_lock:
+            if generation != cls._generation or cls._is_shutting_down:
+                client.close();  # Superseded while connecting
+                return False;
+            old_client = cls._client;
+            cls._client = client;
+            cls._db = db;
+            cls._set_available( True, generation );
         
-        # Check if we need to ping (every 30 seconds max)
-        current_time = time.time();
-        if ( cls._last_ping_time is None or 
-             current_time - cls._last_ping_time > 30 ):
-            
+        if old_client is not None:
             try:
-                # Quick ping to check connection
-                cls._client.admin.command( 'ping' );
-                cls._last_ping_time = current_time;
-                return True;
-            except Exception as e:
-                logger.warning( f"Connection ping failed: {e} - reconnecting" );
-                return cls._reconnect_with_backoff();
-        
-        return True;  # Recent successful ping, assume connection is good
+                old_client.close();
+            except Exception:
+                pass;  # Ignore cleanup errors
+        return True;
     
     @classmethod
-    def _reconnect_with_backoff( cls ) -> bool:
+    def _ensure_indexes( cls ) -> bool:
         """
-        Attempt to reconnect with exponential backoff.
+        Create the mementos collection indexes (idempotent) and verify they exist.
         
         Returns:
-            True if reconnection successful, False if all attempts failed
+            True if every index is present with the expected keys, False otherwise
         """
-        for attempt in range( cls.MAX_RECONNECT_ATTEMPTS ):
-            if cls._is_shutting_down:
-                return False;
-            
-            if attempt > 0:
-                # Exponential backoff delay
-                delay = cls.BACKOFF_BASE_DELAY_SEC * ( 2 ** ( attempt - 1 ) );
-                logger.info( f"Reconnect attempt {attempt + 1}/{cls.MAX_RECONNECT_ATTEMPTS} after {delay}s delay" );
-                time.sleep( delay );
-            else:
-                logger.info( f"Reconnect attempt {attempt + 1}/{cls.MAX_RECONNECT_ATTEMPTS}" );
-            
-            # Clean up old connection
-            if cls._client:
-                try:
-                    cls._client.close();
-                except Exception:
-                    pass;  # Ignore cleanup errors
-                cls._client = None;
-                cls._db = None;
+        try:
+            collection = cls._db.mementos;
+            for name, keys in cls.MEMENTO_INDEXES.items():
+                collection.create_index( keys, name=name );
             
-            # Attempt new connection
-            if cls._establish_connection():
-                logger.info( f"Reconnection successful on attempt {attempt + 1}" );
-                return True;
+            existing = collection.index_information();
+            for name in cls.RETIRED_INDEXES:
+                if name in existing:
+                    collection.drop_index( name );
+                    logger.info( f"Dropped unused MongoDB index '{name}'" );
+        except Exception as e:
+            # Queries still work without indexes, just slower
+            logger.warning( f"Could not create MongoDB indexes: {e}" );
+            return False;
         
-        logger.error( f"Reconnection failed after {cls.MAX_RECONNECT_ATTEMPTS} attempts" );
-        return False;
+        verified = True;
+        for name, keys in cls.MEMENTO_INDEXES.items():
+            actual = [ ( field, int( direction ) ) for field, direction in existing.get( name, {} ).get( 'key', [] ) ];
+            if actual != keys:
+                logger.warning( f"MongoDB index '{name}' is missing or has keys {actual}, expected {keys}" );
+                verified = False;
+        return verified;
     
     @classmethod
-    def _start_heartbeat_monitor( cls ):
-        """Start background thread to monitor connection health."""
-        if cls._heartbeat_thread and cls._heartbeat_thread.is_alive():
+    def _reconnect_delay( cls, failures: int ) -> float:
+        """Exponential backoff before the next reconnect attempt."""
+        return min( cls.BACKOFF_MAX_DELAY_SEC, cls.BACKOFF_BASE_DELAY_SEC * ( 2 ** ( failures - 1 ) ) );
+    
+    @classmethod
+    def _start_supervisor( cls ):
+        """Start the background thread that (re)creates the client when there is none.
+        
+        An existing client reconnects by itself (pymongo's monitor keeps probing the
+        servers and _TopologyStateListener reports when they are back), so the
+        supervisor only acts when the initial connection failed.
+        """
+        if cls._supervisor_thread and cls._supervisor_thread.is_alive():
             return;  # Already running
         
-        def heartbeat_loop():
-            """Background thread function for connection monitoring."""
+        def supervisor_loop():
+            """Background thread function for connection supervision."""
+            failures = 0;
             while not cls._is_shutting_down:
                 try:
-                    time.sleep( cls.HEARTBEAT_INTERVAL_SEC );
-                    
-                    if cls._is_shutting_down:
-                        break;
+                    if cls._client is None:
+                        if cls._establish_connection():
+                            failures = 0;
+                            cls._ensure_indexes();
+                            logger.info( "MongoDB connection re-established" );
+                        else:
+                            failures += 1;
+                            delay = cls._reconnect_delay( failures );
+                            logger.info( f"MongoDB reconnect attempt {failures} failed; next attempt in {delay:.0f}s" );
+                            # Callers cannot shorten the backoff, only shutdown can
+                            cls._shutdown_event.wait( delay );
+                            continue;
                     
-                    with cls._connection_lock:
-                        if cls._client and cls._db:
-                            try:
-                                # Ping the database
-                                cls._client.admin.command( 'ping' );
-                                cls._last_ping_time = time.time();
-                            except Exception as e:
-                                logger.warning( f"Heartbeat ping failed: {e}" );
-                                # Connection will be re-established on next use
-                                
+                    cls._supervisor_wake.wait( cls.HEARTBEAT_INTERVAL_SEC );
+                    cls._supervisor_wake.clear();
                 except Exception as e:
-                    logger.error( f"Error in heartbeat monitor: {e}" );
+                    logger.error( f"Error in MongoDB supervisor: {e}" );
+                    cls._shutdown_event.wait( cls.BACKOFF_BASE_DELAY_SEC );
         
-        cls._heartbeat_thread = threading.Thread( target=heartbeat_loop, daemon=True );
-        cls._heartbeat_thread.start();
-        logger.debug( "Heartbeat monitor started" );
+        cls._supervisor_thread = threading.Thread( target=supervisor_loop, name="MongoDBSupervisor", daemon=True );
+        cls._supervisor_thread.start();
+        logger.debug( "MongoDB supervisor started" );
+
+
+if HAS_PYMONGO:
+    class _TopologyStateListener( monitoring.TopologyListener ):
+        """Feeds pymongo's topology monitoring into MongoDBConnectionManager's connection state."""
+        
+        def __init__( self, generation: int ):
+            self.generation = generation;
+        
+        def opened( self, event ):
+            pass;
+        
+        def description_changed( self, event ):
+            MongoDBConnectionManager._set_available( event.new_description.has_writable_server(), self.generation );
+        
+        def closed( self, event ):
+            MongoDBConnectionManager._set_available( False, self.generation );
 
 
 # Utility functions for backward compatibility and convenience
@@ -351,6 +598,25 @@ def is_mongodb_available() -> bool:
     return MongoDBConnectionManager.is_connected();
 
 
+def init_mongodb_connection_async( mongodb_uri: str = None, database_name: str = "memento_storage",
+                                  on_ready: Optional[ Callable[ [ bool ], None ] ] = None ) -> bool:
+    """
+    Start connecting to MongoDB in the background (convenience function).
+    
+    Args:
+        mongodb_uri: MongoDB URI (if None, uses MONGODB_URI env var)
+        database_name: Database name
+        on_ready: Called on the background thread with True once connected, False on failure
+        
+    Returns:
+        True if a connection attempt was started, False otherwise
+    """
+    if mongodb_uri is None:
+        mongodb_uri = os.getenv( 'MONGODB_URI' ) or os.getenv( 'mongodb_uri' );
+    
+    return MongoDBConnectionManager.init_async( mongodb_uri, database_name, on_ready );
+
+
 def init_mongodb_connection( mongodb_uri: str = None, database_name: str = "memento_storage" ) -> bool:
     """
     Initialize MongoDB connection (convenience function).
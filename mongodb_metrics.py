@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+MongoDB client metrics for Memento Editor.
+
+Collects connection pool checkouts and wait times, command latencies and
+reconnects from pymongo's monitoring listeners. MongoDBConnectionManager
+registers the listeners on its client; read the numbers with
+MongoDBConnectionManager.get_metrics().
+"""
+
+import time;
+import threading;
+from typing import Dict, Any;
+
+# Optional dependencies - graceful degradation if not available
+try:
+    from pymongo import monitoring;
+    HAS_PYMONGO = True;
+except ImportError:
+    HAS_PYMONGO = False;
+
+
+class LatencyStat:
+    """Count, total and maximum of a series of durations (seconds)."""
+
+    __slots__ = ( 'count', 'failures', 'total', 'max' );
+
+    def __init__( self ):
+        self.count = 0;
+        self.failures = 0;
+        self.total = 0.0;
+        self.max = 0.0;
+
+    def add( self, seconds: float, failed: bool = False ):
+        self.count += 1;
+        self.failures += failed;
+        self.total += seconds;
+        self.max = max( self.max, seconds );
+
+    def as_dict( self ) -> Dict[ str, Any ]:
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'avg_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000,
+        };
+
+
+class MongoDBMetrics:
+    """Thread-safe counters fed by the monitoring listeners."""
+
+    def __init__( self ):
+        self._lock = threading.Lock();
+        self._checkout_started = threading.local();
+        self.reset();
+
+    def reset( self ):
+        """Start counting from zero."""
+        with self._lock:
+            self.started_at = time.time();
+            self.checkouts = LatencyStat();    # Wait for a pooled connection
+            self.commands: Dict[ str, LatencyStat ] = {};
+            self.connections_created = 0;
+            self.connections_open = 0;
+            self.pool_clears = 0;
+            self.connects = 0;
+            self.disconnects = 0;
+
+    # ----- recording -----
+
+    def checkout_started( self ):
+        self._checkout_started.value = time.perf_counter();
+
+    def checkout_finished( self, failed: bool = False ):
+        started = getattr( self._checkout_started, 'value', None );
+        waited = time.perf_counter() - started if started is not None else 0.0;
+        self._checkout_started.value = None;
+        with self._lock:
+            self.checkouts.add( waited, failed );
+
+    def command_finished( self, name: str, duration_micros: int, failed: bool = False ):
+        with self._lock:
+            stat = self.commands.get( name );
+            if stat is None:
+                stat = self.commands[ name ] = LatencyStat();
+            stat.add( duration_micros / 1e6, failed );
+
+    def connection_opened( self ):
+        with self._lock:
+            self.connections_created += 1;
+            self.connections_open += 1;
+
+    def connection_closed( self ):
+        with self._lock:
+            self.connections_open = max( 0, self.connections_open - 1 );
+
+    def pool_cleared( self ):
+        with self._lock:
+            self.pool_clears += 1;
+
+    def availability_changed( self, available: bool ):
+        with self._lock:
+            if available:
+                self.connects += 1;
+            else:
+                self.disconnects += 1;
+
+    # ----- reporting -----
+
+    def snapshot( self ) -> Dict[ str, Any ]:
+        """Current values as plain data (latencies in milliseconds)."""
+        with self._lock:
+            return {
+                'since': self.started_at,
+                'pool': {
+                    'checkouts': self.checkouts.as_dict(),
+                    'connections_created': self.connections_created,
+                    'connections_open': self.connections_open,
+                    'clears': self.pool_clears,
+                },
+                'commands': { name: stat.as_dict() for name, stat in sorted( self.commands.items() ) },
+                'connects': self.connects,
+                'reconnects': max( 0, self.connects - 1 ),
+                'disconnects': self.disconnects,
+            };
+
+    def summary( self ) -> str:
+        """One line for the log."""
+        data = self.snapshot();
+        checkouts = data[ 'pool' ][ 'checkouts' ];
+        commands = data[ 'commands' ].values();
+        count = sum( stat[ 'count' ] for stat in commands );
+        ops = {
+            'count': count,
+            'failures': sum( stat[ 'failures' ] for stat in commands ),
+            'avg_ms': sum( stat[ 'avg_ms' ] * stat[ 'count' ] for stat in commands ) / count if count else 0.0,
+            'max_ms': max( ( stat[ 'max_ms' ] for stat in commands ), default=0.0 ),
+        };
+        return (
+            f"{ops[ 'count' ]} operations ({ops[ 'failures' ]} failed, avg {ops[ 'avg_ms' ]:.1f} ms, "
+            f"max {ops[ 'max_ms' ]:.1f} ms); {checkouts[ 'count' ]} pool checkouts "
+            f"(avg wait {checkouts[ 'avg_ms' ]:.1f} ms, max {checkouts[ 'max_ms' ]:.1f} ms); "
+            f"{data[ 'reconnects' ]} reconnects"
+        );
+
+
+if HAS_PYMONGO:
+    class _PoolMetricsListener( monitoring.ConnectionPoolListener ):
+        """Pool checkouts (wait time) and connection churn."""
+
+        def __init__( self, metrics: MongoDBMetrics ):
+            self.metrics = metrics;
+
+        def pool_created( self, event ):
+            pass;
+
+        def pool_ready( self, event ):
+            pass;
+
+        def pool_cleared( self, event ):
+            self.metrics.pool_cleared();
+
+        def pool_closed( self, event ):
+            pass;
+
+        def connection_created( self, event ):
+            self.metrics.connection_opened();
+
+        def connection_ready( self, event ):
+            pass;
+
+        def connection_closed( self, event ):
+            self.metrics.connection_closed();
+
+        def connection_check_out_started( self, event ):
+            self.metrics.checkout_started();
+
+        def connection_check_out_failed( self, event ):
+            self.metrics.checkout_finished( failed=True );
+
+        def connection_checked_out( self, event ):
+            self.metrics.checkout_finished();
+
+        def connection_checked_in( self, event ):
+            pass;
+
+    class _CommandMetricsListener( monitoring.CommandListener ):
+        """Latency of every database command."""
+
+        def __init__( self, metrics: MongoDBMetrics ):
+            self.metrics = metrics;
+
+        def started( self, event ):
+            pass;
+
+        def succeeded( self, event ):
+            self.metrics.command_finished( event.command_name, event.duration_micros );
+
+        def failed( self, event ):
+            self.metrics.command_finished( event.command_name, event.duration_micros, failed=True );
+
+
+def metrics_listeners( metrics: MongoDBMetrics ) -> list:
+    """pymongo event listeners that feed `metrics` (empty without pymongo)."""
+    if not HAS_PYMONGO:
+        return [];
+    return [ _PoolMetricsListener( metrics ), _CommandMetricsListener( metrics ) ];
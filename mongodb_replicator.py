@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Background replication of encrypted content to MongoDB for Memento Editor.
+
+Content saves commit to local disk first and return; each version is also queued in an
+on-disk outbox (`~/.Memento/outbox/`). A single worker thread pushes the outbox to
+MongoDB in batches, retrying with exponential backoff while MongoDB is unreachable.
+Outbox entries are only deleted once MongoDB has the version, so queued versions
+survive crashes and restarts and are pushed when the next process starts.
+"""
+
+import os;
+import json;
+import time;
+import base64;
+import random;
+import struct;
+import logging;
+import threading;
+from pathlib import Path;
+from typing import Optional, Callable, Any, Dict, List;
+
+# Optional dependencies - graceful degradation if not available
+try:
+    from bson.binary import Binary;
+    from bson.objectid import ObjectId;
+    from pymongo import UpdateOne;
+    from pymongo.errors import BulkWriteError, DuplicateKeyError;
+    HAS_PYMONGO = True;
+except ImportError:
+    HAS_PYMONGO = False;
+
+logger = logging.getLogger( __name__ );
+
+OUTBOX_DIR = "outbox";
+OUTBOX_SUFFIX = ".enc";
+HEAD_FIELDS_SUFFIX = ".head.json";   # Per memento: wrapped_key and kdf to record on its head
+ENTRY_SINGLE = "s";    # One content document holding the whole stream
+ENTRY_CHUNKED = "c";   # One content_chunk document per sealed chunk plus a content document
+
+REPLICATION_BATCH_SIZE = 50;                      # Entries per push
+REPLICATION_BATCH_BYTES = 32 * 1024 * 1024;       # ...or fewer, to bound memory per push
+REPLICATION_MAX_DOCUMENT_BYTES = 15 * 1024 * 1024;  # Larger single entries are pushed chunked
+REPLICATION_BACKOFF_BASE_SEC = 1.0;
+REPLICATION_BACKOFF_MAX_SEC = 5 * 60;
+
+DUPLICATE_KEY_ERROR = 11000;
+
+
+def write_content_chunks( collection, content_id, memento_id: int, frames ) -> int:
+    """Insert one version's sealed frames as content_chunk documents numbered from 0.
+
+    Chunks left by an interrupted earlier attempt at the same content_id are replaced.
+    The caller writes the content document (chunked, chunk_count, header) afterwards,
+    so a version is only visible once all of its chunks are in place.
+
+    Returns:
+        Number of chunk documents written
+    """
+    collection.delete_many( { 'type': 'content_chunk', 'content_id': content_id } );
+    chunk_docs = [];
+    chunk_count = 0;
+    for index, frame in enumerate( frames ):
+        chunk_docs.append( {
+            'memento_id': memento_id,
+            'type': 'content_chunk',
+            'content_id': content_id,
+            'n': index,
+            'data': Binary( bytes( frame ) )
+        } );
+        chunk_count += 1;
+        if len( chunk_docs ) >= REPLICATION_BATCH_SIZE:
+            collection.insert_many( chunk_docs );
+            chunk_docs = [];
+    if chunk_docs:
+        collection.insert_many( chunk_docs );
+    return chunk_count;
+
+
+class OutboxEntry:
+    """One queued content version, parsed from its outbox file name."""
+
+    __slots__ = ( 'path', 'sequence', 'memento_id', 'content_id', 'kind' );
+
+    def __init__( self, path: Path, sequence: int, memento_id: int, content_id: str, kind: str ):
+        self.path = path;
+        self.sequence = sequence;
+        self.memento_id = memento_id;
+        self.content_id = content_id;
+        self.kind = kind;
+
+    @property
+    def timestamp( self ) -> float:
+        """Save time of the version, in seconds since the epoch."""
+        return self.sequence / 1e9;
+
+    @classmethod
+    def parse( cls, path: Path ) -> Optional[ 'OutboxEntry' ]:
+        """Parse `{time_ns}-{memento_id}-{content_id}-{kind}.enc`; returns None for other files."""
+        if path.suffix != OUTBOX_SUFFIX:
+            return None;
+        parts = path.stem.split( '-' );
+        if len( parts ) != 4 or parts[ 3 ] not in ( ENTRY_SINGLE, ENTRY_CHUNKED ):
+            return None;
+        try:
+            return cls( path, int( parts[ 0 ] ), int( parts[ 1 ] ), parts[ 2 ], parts[ 3 ] );
+        except ValueError:
+            return None;
+
+
+class MongoDBReplicator:
+    """Pushes outbox entries to MongoDB on a background thread.
+
+    Args:
+        outbox_dir: Directory holding the outbox entries
+        get_collection: Returns the MongoDB collection, or None while it is unavailable
+        split_stream: Splits chunked-format data into (header, iterable of sealed frames)
+    """
+
+    def __init__( self, outbox_dir: Path, get_collection: Callable[ [], Any ],
+                  split_stream: Callable[ [ memoryview ], Any ] ):
+        self.outbox_dir = Path( outbox_dir );
+        self._get_collection = get_collection;
+        self._split_stream = split_stream;
+        self._lock = threading.Lock();
+        self._wake = threading.Event();
+        self._stop = threading.Event();
+        self._idle = threading.Event();
+        self._idle.set();
+        self._thread = None;
+        self._failures = 0;
+        self._last_sequence = 0;
+        # Queued entries per memento, kept in memory so has_pending() never lists the outbox
+        self._pending_counts = self._count_pending();
+        if self._pending_counts:
+            self._idle.clear();
+
+    # ----- outbox -----
+
+    @staticmethod
+    def new_content_id() -> str:
+        """A new ObjectId as hex: 4-byte seconds timestamp + 8 random bytes."""
+        return ( struct.pack( '>I', int( time.time() ) ) + os.urandom( 8 ) ).hex();
+
+    def enqueue( self, memento_id: int, source: Path, chunked: bool = False,
+                 wrapped_key: Optional[ bytes ] = None, kdf: Optional[ Dict[ str, Any ] ] = None ) -> OutboxEntry:
+        """Queue the encrypted stream in `source` as a new content version of memento_id.
+
+        The entry is a hard link to `source` when possible (callers replace `source` by
+        rename, so the link keeps this version), otherwise a durable copy. wrapped_key
+        and kdf (from the memento's control data) are recorded on its head when pushed.
+        """
+        self.outbox_dir.mkdir( parents=True, exist_ok=True );
+        if wrapped_key is not None:
+            self.set_head_fields( memento_id, wrapped_key, kdf );
+        kind = ENTRY_CHUNKED if chunked else ENTRY_SINGLE;
+        with self._lock:
+            # Cleared before the entry exists, so flush() never sees an idle worker with work queued
+            self._idle.clear();
+            # Strictly increasing, so entry order is save order even within one clock tick
+            sequence = max( time.time_ns(), self._last_sequence + 1 );
+            self._last_sequence = sequence;
+            name = f"{sequence:020d}-{memento_id}-{self.new_content_id()}-{kind}{OUTBOX_SUFFIX}";
+            path = self.outbox_dir / name;
+            try:
+                try:
+                    os.link( source, path );
+                except OSError:
+                    tmp_path = path.with_name( path.name + '.tmp' );
+                    with open( source, 'rb' ) as src, open( tmp_path, 'wb' ) as dst:
+                        while True:
+                            block = src.read( 1024 * 1024 );
+                            if not block:
+                                break;
+                            dst.write( block );
+                        dst.flush();
+                        os.fsync( dst.fileno() );
+                    os.replace( tmp_path, path );
+            except BaseException:
+                if not self._pending_counts:
+                    self._idle.set();
+                raise;
+            self._pending_counts[ memento_id ] = self._pending_counts.get( memento_id, 0 ) + 1;
+            self._fsync_dir();
+        self._wake.set();
+        return OutboxEntry.parse( path );
+
+    def set_head_fields( self, memento_id: int, wrapped_key: bytes, kdf: Optional[ Dict[ str, Any ] ] ):
+        """Record the wrapped data key and KDF to write on memento_id's head with its next push."""
+        path = self.outbox_dir / f"{memento_id}{HEAD_FIELDS_SUFFIX}";
+        tmp_path = path.with_name( path.name + '.tmp' );
+        self.outbox_dir.mkdir( parents=True, exist_ok=True );
+        with open( tmp_path, 'w' ) as f:
+            json.dump( { 'wrapped_key': base64.b64encode( wrapped_key ).decode( 'ascii' ), 'kdf': kdf }, f );
+            f.flush();
+            os.fsync( f.fileno() );
+        os.replace( tmp_path, path );
+
+    def _head_fields( self, memento_id: int ) -> Dict[ str, Any ]:
+        """Fields recorded by set_head_fields() as they are stored on the head (empty if none)."""
+        try:
+            with open( self.outbox_dir / f"{memento_id}{HEAD_FIELDS_SUFFIX}", 'r' ) as f:
+                fields = json.load( f );
+            return { 'wrapped_key': Binary( base64.b64decode( fields[ 'wrapped_key' ] ) ), 'kdf': fields.get( 'kdf' ) };
+        except ( OSError, ValueError, KeyError, TypeError ):
+            return {};
+
+    def _fsync_dir( self ):
+        """Make new and removed entry names durable."""
+        try:
+            fd = os.open( self.outbox_dir, os.O_RDONLY );
+        except OSError:
+            return;  # Not supported (Windows)
+        try:
+            os.fsync( fd );
+        except OSError:
+            pass;
+        finally:
+            os.close( fd );
+
+    def pending( self, memento_id: Optional[ int ] = None ) -> List[ OutboxEntry ]:
+        """Queued entries, oldest first (optionally only those of one memento)."""
+        try:
+            names = os.listdir( self.outbox_dir );
+        except FileNotFoundError:
+            return [];
+        entries = [];
+        for name in names:
+            entry = OutboxEntry.parse( self.outbox_dir / name );
+            if entry and ( memento_id is None or entry.memento_id == memento_id ):
+                entries.append( entry );
+        entries.sort( key=lambda entry: entry.sequence );
+        return entries;
+
+    def _count_pending( self ) -> Dict[ int, int ]:
+        """Queued entries per memento, counted from the outbox directory."""
+        counts: Dict[ int, int ] = {};
+        for entry in self.pending():
+            counts[ entry.memento_id ] = counts.get( entry.memento_id, 0 ) + 1;
+        return counts;
+
+    def has_pending( self, memento_id: int ) -> bool:
+        """Whether a version of memento_id is still waiting to reach MongoDB (no disk access)."""
+        return memento_id in self._pending_counts;
+
+    # ----- pushing -----
+
+    def replicate_once( self ) -> int:
+        """Push one batch of the outbox to MongoDB.
+
+        Returns:
+            Number of entries pushed and removed from the outbox
+
+        Raises:
+            ConnectionError: If MongoDB is unavailable
+            RuntimeError: If MongoDB rejected some entries (they stay queued)
+        """
+        entries = self._next_batch();
+        if not entries:
+            return 0;
+        collection = self._get_collection();
+        if collection is None:
+            raise ConnectionError( "MongoDB is not available" );
+
+        documents = [];
+        pushed = [];
+        failed = set();
+        for entry in entries:
+            data = entry.path.read_bytes();
+            if entry.kind == ENTRY_CHUNKED or len( data ) > REPLICATION_MAX_DOCUMENT_BYTES:
+                self._push_chunked( collection, entry, data );
+                pushed.append( entry );
+            else:
+                documents.append( ( entry, {
+                    '_id': ObjectId( entry.content_id ),
+                    'memento_id': entry.memento_id,
+                    'type': 'content',
+                    'timestamp': entry.timestamp,
+                    'data': Binary( data )
+                } ) );
+
+        if documents:
+            try:
+                collection.insert_many( [ doc for _, doc in documents ], ordered=False );
+            except BulkWriteError as e:
+                # Versions pushed before a crash (or by an earlier attempt) are already there
+                for error in e.details.get( 'writeErrors', [] ):
+                    if error.get( 'code' ) != DUPLICATE_KEY_ERROR:
+                        failed.add( error[ 'index' ] );
+            pushed.extend( entry for index, ( entry, _ ) in enumerate( documents ) if index not in failed );
+
+        if pushed:
+            self._update_heads( collection, pushed );
+            for entry in pushed:
+                try:
+                    entry.path.unlink();
+                except FileNotFoundError:
+                    pass;
+            self._fsync_dir();
+            with self._lock:
+                for entry in pushed:
+                    remaining = self._pending_counts.get( entry.memento_id, 0 ) - 1;
+                    if remaining > 0:
+                        self._pending_counts[ entry.memento_id ] = remaining;
+                    else:
+                        self._pending_counts.pop( entry.memento_id, None );
+        if failed:
+            raise RuntimeError( f"MongoDB rejected {len( failed )} queued content versions" );
+        return len( pushed );
+
+    def _next_batch( self ) -> List[ OutboxEntry ]:
+        """Oldest entries up to REPLICATION_BATCH_SIZE / REPLICATION_BATCH_BYTES (at least one)."""
+        batch = [];
+        total = 0;
+        for entry in self.pending()[ :REPLICATION_BATCH_SIZE ]:
+            try:
+                size = entry.path.stat().st_size;
+            except FileNotFoundError:
+                continue;
+            if batch and total + size > REPLICATION_BATCH_BYTES:
+                break;
+            batch.append( entry );
+            total += size;
+        return batch;
+
+    def _push_chunked( self, collection, entry: OutboxEntry, data: bytes ):
+        """Insert one entry as chunk documents plus a content document written last."""
+        content_id = ObjectId( entry.content_id );
+        if collection.find_one( { '_id': content_id }, { '_id': 1 } ) is not None:
+            return;  # Pushed completely before
+
+        header, frames = self._split_stream( memoryview( data ) );
+        chunk_count = write_content_chunks( collection, content_id, entry.memento_id, frames );
+
+        try:
+            collection.insert_one( {
+                '_id': content_id,
+                'memento_id': entry.memento_id,
+                'type': 'content',
+                'timestamp': entry.timestamp,
+                'chunked': True,
+                'chunk_count': chunk_count,
+                'header': Binary( header )
+            } );
+        except DuplicateKeyError:
+            pass;
+
+    def _update_heads( self, collection, pushed: List[ OutboxEntry ] ):
+        """Point each memento's head at its newest pushed version.
+
+        The update only moves a head forward in time, so a version that reaches MongoDB
+        late (after a retry) never replaces a newer one. The memento's wrapped data key
+        and KDF are recorded too, so a MongoDB-only copy can be unlocked from its head.
+        """
+        newest: Dict[ int, OutboxEntry ] = {};
+        for entry in pushed:
+            if entry.memento_id not in newest or entry.sequence > newest[ entry.memento_id ].sequence:
+                newest[ entry.memento_id ] = entry;
+
+        operations = [];
+        for memento_id, entry in newest.items():
+            is_newer = { '$gt': [ entry.timestamp, { '$ifNull': [ '$timestamp', 0 ] } ] };
+            operations.append( UpdateOne(
+                { 'memento_id': memento_id, 'type': 'head' },
+                [ { '$set': dict(
+                    self._head_fields( memento_id ),
+                    content_id={ '$cond': [ is_newer, ObjectId( entry.content_id ), '$content_id' ] },
+                    timestamp={ '$cond': [ is_newer, entry.timestamp, '$timestamp' ] },
+                ) } ],
+                upsert=True
+            ) );
+        collection.bulk_write( operations, ordered=False );
+
+    # ----- worker -----
+
+    def start( self ):
+        """Start the worker thread; it first pushes whatever earlier runs left in the outbox."""
+        if self._thread and self._thread.is_alive():
+            return;
+        self._stop.clear();
+        self._wake.set();
+        self._thread = threading.Thread( target=self._run, name="MongoDBReplicator", daemon=True );
+        self._thread.start();
+
+    def stop( self, timeout: float = 5.0 ):
+        """Stop the worker thread. Entries not yet pushed stay in the outbox for the next run."""
+        self._stop.set();
+        self._wake.set();
+        if self._thread:
+            self._thread.join( timeout );
+        self._thread = None;
+
+    def wake( self ):
+        """Retry now instead of waiting out the backoff (e.g. after a reconnect)."""
+        self._wake.set();
+
+    def flush( self, timeout: Optional[ float ] = None ) -> bool:
+        """Wait until the outbox is empty. Returns False on timeout."""
+        return self._idle.wait( timeout );
+
+    def _backoff_delay( self ) -> float:
+        """Exponential backoff with jitter for the current run of failures."""
+        delay = min( REPLICATION_BACKOFF_MAX_SEC, REPLICATION_BACKOFF_BASE_SEC * 2 ** ( self._failures - 1 ) );
+        return delay * random.uniform( 0.5, 1.0 );
+
+    def _run( self ):
+        """Worker loop: drain the outbox, back off on failure, sleep until woken."""
+        delay = None;
+        while not self._stop.is_set():
+            self._wake.wait( delay );
+            self._wake.clear();
+            if self._stop.is_set():
+                break;
+            delay = None;
+            try:
+                while not self._stop.is_set() and self.replicate_once():
+                    self._failures = 0;
+                self._failures = 0;
+                with self._lock:
+                    # enqueue() links and clears _idle under the same lock, so no entry can slip in
+                    # between the check and set(); re-counting also drops entries removed by hand
+                    self._pending_counts = self._count_pending();
+                    if not self._pending_counts:
+                        self._idle.set();
+            except Exception as e:
+                self._failures += 1;
+                delay = self._backoff_delay();
+                logger.warning( f"MongoDB replication failed ({e}); retrying in {delay:.1f}s" );
@@ -4,10 +4,23 @@ Startup selector window for the Memento text editor.
 Allows users to choose existing mementos or create new ones.
 """
 
+import sqlite3
+import logging
+import threading
 import tkinter as tk
 from tkinter import ttk
 from typing import Optional
-from storage import FileManager, MementoInfo
+from storage import FileManager, MementoInfo, MementoIndex
+from mongodb_connection_manager import MongoDBConnectionManager
+
+logger = logging.getLogger(__name__)
+
+MONGODB_POLL_MS = 200   # How often the selector checks for the background MongoDB listing
+INDEX_POLL_MS = 100     # How often the selector checks for the background index sync
+PAGE_SIZE = 200         # Rows fetched from the listing index per page
+MAX_ROWS = 5 * PAGE_SIZE  # Rows kept in the tree; pages scrolled far out of view are dropped
+LOAD_MORE_AT = 0.9      # Fetch the next page once the view shows rows past this fraction
+FILTER_DELAY_MS = 250   # Wait for typing to pause before re-querying
 
 
 class StartupSelector:
@@ -24,9 +37,26 @@ class StartupSelector:
         self.root.transient(parent)
         self.root.grab_set()
         
+        # Rows come from the listing index a page at a time; sorting and filtering are SQL
+        self.index = MementoIndex()
+        self.sort_key = 'modified'
+        self.sort_descending = True
+        self._total = 0
+        self._first = 0  # Listing position of the first row in the tree
+        self._loaded = 0  # Listing position just past the last row in the tree
+        self._page_pending = False
+        self._filter_job = None
+        self._include_remote = False  # MongoDB-only rows, once this session has listed them
+        self._local_synced = threading.Event()
+        self._remote_synced = threading.Event()
+        self._remote_failed = threading.Event()
+        
         self._create_widgets()
         self._load_mementos()
         
+        # MongoDB connects in the background; its mementos are merged in when it is ready
+        self._watch_mongodb()
+        
         # Bind events
         self.root.protocol("WM_DELETE_WINDOW", self._on_cancel)
     
@@ -39,16 +69,23 @@ class StartupSelector:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(1, weight=1)
+        main_frame.rowconfigure(2, weight=1)
         
         # Title
         title_label = ttk.Label(main_frame, text="Choose a memento to open or create a new one:", 
                                font=('TkDefaultFont', 12, 'bold'))
         title_label.grid(row=0, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
         
+        # Filter box - matches the content preview or the id
+        ttk.Label(main_frame, text="Filter:").grid(row=1, column=0, sticky=tk.W, padx=(0, 5), pady=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self._on_filter_changed())
+        filter_entry = ttk.Entry(main_frame, textvariable=self.filter_var)
+        filter_entry.grid(row=1, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        
         # Listbox with scrollbar for mementos
         list_frame = ttk.Frame(main_frame)
-        list_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        list_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         list_frame.columnconfigure(0, weight=1)
         list_frame.rowconfigure(0, weight=1)
         
@@ -61,18 +98,19 @@ class StartupSelector:
         self.memento_tree.column('first_line', width=300, minwidth=200)
         self.memento_tree.column('modified', width=150, minwidth=100)
         
-        self.memento_tree.heading('#0', text='ID', anchor=tk.W)
+        self.memento_tree.heading('#0', command=lambda: self._sort_by('id'), anchor=tk.W)
         self.memento_tree.heading('first_line', text='Content Preview', anchor=tk.W)
-        self.memento_tree.heading('modified', text='Last Modified', anchor=tk.W)
+        self.memento_tree.heading('modified', command=lambda: self._sort_by('modified'), anchor=tk.W)
+        self._update_headings()
         
-        # Scrollbar for treeview
-        tree_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.memento_tree.yview)
-        tree_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.memento_tree.configure(yscrollcommand=tree_scrollbar.set)
+        # Scrollbar for treeview; scrolling near the end fetches the next page
+        self.tree_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.memento_tree.yview)
+        self.tree_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.memento_tree.configure(yscrollcommand=self._on_tree_scroll)
         
         # Buttons frame
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        button_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E))
         
         # Buttons
         self.open_button = ttk.Button(button_frame, text="Open Selected", command=self._on_open)
@@ -95,32 +133,221 @@ class StartupSelector:
         self.memento_tree.bind('<<TreeviewSelect>>', self._on_selection_changed)
     
     def _load_mementos(self):
-        """Load and display existing mementos."""
-        mementos = FileManager.list_mementos()
+        """Show the first page from the index as it stands, then bring it up to date in the background."""
+        self._reload()
         
-        # Clear existing items
-        for item in self.memento_tree.get_children():
-            self.memento_tree.delete(item)
+        def sync_index():
+            try:
+                self.index.sync()
+            except sqlite3.Error as e:
+                logger.warning(f"Memento index unavailable: {e}")
+            self._local_synced.set()
         
-        if not mementos:
+        threading.Thread(target=sync_index, name="MementoIndexSync", daemon=True).start()
+        self.root.after(INDEX_POLL_MS, self._merge_synced_index)
+    
+    def _merge_synced_index(self):
+        """Re-query once the sync thread has brought the index up to date."""
+        if not self._local_synced.is_set():
+            self.root.after(INDEX_POLL_MS, self._merge_synced_index)
+            return
+        self._reload_keeping_selection()
+    
+    def _reload(self):
+        """Show the first page for the current sort order and filter."""
+        self.memento_tree.delete(*self.memento_tree.get_children())
+        self._first = 0
+        self._loaded = 0
+        
+        search = self.filter_var.get().strip() or None
+        try:
+            self._total = self.index.count(search, self._include_remote)
+        except sqlite3.Error as e:
+            logger.warning(f"Memento index unavailable: {e}")
+            self._total = 0
+        
+        if not self._total:
             # Show message if no mementos exist
-            self.memento_tree.insert('', tk.END, text='No mementos found', values=('', ''))
+            message = 'No matching mementos' if search else 'No mementos found'
+            self.memento_tree.insert('', tk.END, text=message, values=('', ''))
             return
         
-        # Add mementos to tree
-        for memento in mementos:
-            # Truncate first line if too long
-            first_line = memento.first_line
-            if len(first_line) > 50:
-                first_line = first_line[:47] + "..."
-            
-            # Format date
-            date_str = memento.last_modified.strftime("%Y-%m-%d %H:%M")
-            
-            self.memento_tree.insert('', tk.END, 
-                                   text=f"#{memento.memento_id}",
-                                   values=(first_line, date_str),
-                                   tags=(str(memento.memento_id),))
+        self._load_page()
+    
+    def _fetch(self, offset: int, limit: int):
+        """Query one page of rows for the current sort order and filter, or None if the index failed."""
+        search = self.filter_var.get().strip() or None
+        try:
+            return self.index.page(offset, limit, self.sort_key, self.sort_descending,
+                                   search, self._include_remote)
+        except sqlite3.Error as e:
+            logger.warning(f"Memento index unavailable: {e}")
+            return None
+    
+    def _load_page(self):
+        """Append the next page of rows, dropping rows from the top beyond MAX_ROWS."""
+        self._page_pending = False
+        if self._loaded >= self._total:
+            return
+        
+        page = self._fetch(self._loaded, PAGE_SIZE)
+        if page is None:
+            return
+        
+        for memento in page:
+            self._insert_memento(memento, tk.END)
+        self._loaded += len(page)
+        if len(page) < PAGE_SIZE:
+            self._total = self._loaded  # Rows were deleted since the count
+        
+        excess = (self._loaded - self._first) - MAX_ROWS
+        if excess > 0:
+            top = self._top_row()
+            self.memento_tree.delete(*self.memento_tree.get_children()[:excess])
+            self._first += excess
+            self._scroll_to_row(top - excess)
+    
+    def _load_previous_page(self):
+        """Prepend the page before the first row, dropping rows from the bottom beyond MAX_ROWS."""
+        self._page_pending = False
+        if self._first <= 0:
+            return
+        
+        offset = max(0, self._first - PAGE_SIZE)
+        page = self._fetch(offset, self._first - offset)
+        if page is None:
+            return
+        
+        top = self._top_row()
+        for position, memento in enumerate(page):
+            self._insert_memento(memento, position)
+        self._first = offset
+        self._scroll_to_row(top + len(page))
+        
+        excess = (self._loaded - self._first) - MAX_ROWS
+        if excess > 0:
+            self.memento_tree.delete(*self.memento_tree.get_children()[-excess:])
+            self._loaded -= excess
+    
+    def _top_row(self) -> int:
+        """Position in the tree of the first visible row."""
+        return round(self.memento_tree.yview()[0] * len(self.memento_tree.get_children()))
+    
+    def _scroll_to_row(self, row: int):
+        """Keep the same rows in view after rows above them were added or dropped."""
+        count = len(self.memento_tree.get_children())
+        if count:
+            self.memento_tree.yview_moveto(max(0, row) / count)
+    
+    def _on_tree_scroll(self, first, last):
+        """Track the view in the scrollbar and fetch rows as either loaded end comes into view."""
+        self.tree_scrollbar.set(first, last)
+        if self._page_pending:
+            return
+        if float(last) >= LOAD_MORE_AT and self._loaded < self._total:
+            self._page_pending = True
+            self.root.after_idle(self._load_page)
+        elif float(first) <= 1 - LOAD_MORE_AT and self._first > 0:
+            self._page_pending = True
+            self.root.after_idle(self._load_previous_page)
+    
+    def _sort_by(self, key: str):
+        """Sort by a column (clicking the sorted column again reverses the order)."""
+        if key == self.sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_key = key
+            self.sort_descending = True
+        self._update_headings()
+        self._reload()
+    
+    def _update_headings(self):
+        """Mark the sorted column with an arrow."""
+        arrow = " \u25bc" if self.sort_descending else " \u25b2"
+        self.memento_tree.heading('#0', text='ID' + (arrow if self.sort_key == 'id' else ''))
+        self.memento_tree.heading('modified', text='Last Modified' + (arrow if self.sort_key == 'modified' else ''))
+    
+    def _on_filter_changed(self):
+        """Re-query once typing in the filter box pauses."""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(FILTER_DELAY_MS, self._apply_filter)
+    
+    def _apply_filter(self):
+        self._filter_job = None
+        self._reload()
+        self._select_first()
+    
+    def _insert_memento(self, memento: MementoInfo, index):
+        """Insert one memento row at the given position."""
+        # Truncate first line if too long
+        first_line = memento.first_line
+        if len(first_line) > 50:
+            first_line = first_line[:47] + "..."
+        
+        # Format date
+        date_str = memento.last_modified.strftime("%Y-%m-%d %H:%M")
+        
+        self.memento_tree.insert('', index, 
+                               text=f"#{memento.memento_id}",
+                               values=(first_line, date_str),
+                               tags=(str(memento.memento_id),))
+    
+    def _watch_mongodb(self):
+        """Wait (without blocking the window) for the MongoDB connection, then list its mementos."""
+        if MongoDBConnectionManager.is_initializing():
+            self.root.after(MONGODB_POLL_MS, self._watch_mongodb)
+            return
+        if not MongoDBConnectionManager.is_connected():
+            return
+        
+        def list_remote():
+            try:
+                if FileManager.sync_mongodb_listing():
+                    self._remote_synced.set()
+                    return
+            except Exception as e:
+                logger.warning(f"Error loading MongoDB mementos: {e}")
+            self._remote_failed.set()
+        
+        threading.Thread(target=list_remote, name="MongoDBListing", daemon=True).start()
+        self.root.after(MONGODB_POLL_MS, self._merge_mongodb_mementos)
+    
+    def _merge_mongodb_mementos(self):
+        """Re-query with MongoDB-only mementos once the listing thread has stored them."""
+        if self._remote_failed.is_set():
+            return  # Keep the local listing
+        if not self._remote_synced.is_set():
+            self.root.after(MONGODB_POLL_MS, self._merge_mongodb_mementos)
+            return
+        
+        self._include_remote = True
+        self._reload_keeping_selection()
+    
+    def _reload_keeping_selection(self):
+        """Re-query from the first page, keeping the selected memento selected if it is still there."""
+        selection = self.memento_tree.selection()
+        selected_text = self.memento_tree.item(selection[0], 'text') if selection else None
+        self._reload()
+        
+        # Keep the selection if it is still on the first page
+        for item in self.memento_tree.get_children():
+            if self.memento_tree.item(item, 'text') == selected_text:
+                self.memento_tree.selection_set(item)
+                self.memento_tree.focus(item)
+                break
+        else:
+            self._select_first()
+    
+    def _select_first(self):
+        """Select the first row if it is a real memento (has # in text)."""
+        children = self.memento_tree.get_children()
+        if children:
+            first_item = children[0]
+            if self.memento_tree.item(first_item, 'text').startswith('#'):
+                self.memento_tree.selection_set(first_item)
+                self.memento_tree.focus(first_item)
+        self._on_selection_changed()
     
     def _on_selection_changed(self, event=None):
         """Handle selection change in the treeview."""
@@ -204,14 +431,7 @@ class StartupSelector:
         self.root.focus_set()
         
         # If there are items, select the first one
-        children = self.memento_tree.get_children()
-        if children:
-            first_item = children[0]
-            # Only select if it's a real memento (has # in text)
-            if self.memento_tree.item(first_item, 'text').startswith('#'):
-                self.memento_tree.selection_set(first_item)
-                self.memento_tree.focus(first_item)
-                self._on_selection_changed()
+        self._select_first()
         
         # Start the GUI event loop
         self.root.mainloop()
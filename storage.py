@@ -5,31 +5,430 @@ Handles file persistence, version control through ring buffers, and memento meta
 """
 
 import json
+import base64
+import mmap
+import codecs
+import hmac
+import hashlib
 import pathlib
 import time
 import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Callable
 
 from constants import (
-    MEMENTO_ROOT, CONTROL_FILE, make_dirs_if_missing, 
+    MEMENTO_ROOT, CONTROL_FILE, INDEX_FILE, JOURNAL_FILE, REKEY_MARKER_FILE, REKEY_LOCK_FILE, REKEY_WORKERS, KEYFRAME_INTERVAL,
+    JOURNAL_FSYNC_BATCH, JOURNAL_CHECKPOINT_INTERVAL, LAZY_LOAD_THRESHOLD_BYTES,
+    LOAD_CHUNK_CHARS, HOT_SAVE_INTERVAL_SEC, RECOMPRESS_ACTIVE_WINDOW, make_dirs_if_missing, 
     get_memento_dir, get_next_memento_id, calculate_buffer_size
 )
 
 # Optional encryption support
 try:
-    from encryption import EncryptionManager
+    from encryption import EncryptionManager, ARCHIVE_COMPRESSION
     HAS_ENCRYPTION = True
 except ImportError:
     HAS_ENCRYPTION = False
 
+# Cross-process re-key lock (POSIX flock, Windows byte-range lock)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+try:
+    import msvcrt
+    HAS_MSVCRT = True
+except ImportError:
+    HAS_MSVCRT = False
+
+logger = logging.getLogger(__name__)
+
+ENCRYPTED_PREVIEW = "[Encrypted memento]"
+MAX_PREVIEW_LENGTH = 200
+
+# Delta slot payloads start with this marker; anything else is a full keyframe
+DELTA_MAGIC = "\x00memento-delta\x00"
+
+# Re-keyed slots are staged under this suffix until all of them are written
+REKEY_SUFFIX = '.rekey'
+
+# Only the tail of the journal is read on startup
+JOURNAL_TAIL_BYTES = 64 * 1024
+
+
+def _fsync_path(path: pathlib.Path):
+    """fsync a file or directory by path, ignoring platforms that do not support it."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# In-process half of the per-memento re-key lock, one per memento directory
+_rekey_locks: Dict[pathlib.Path, threading.Lock] = {}
+_rekey_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _rekey_lock(memento_dir: pathlib.Path):
+    """Hold the re-key lock of one memento, across threads and processes.
+    
+    Re-keying slots and recovering an interrupted re-key both run under it, so
+    recovery never touches staged files another re-key is still writing.
+    """
+    with _rekey_locks_guard:
+        lock = _rekey_locks.setdefault(memento_dir, threading.Lock())
+    with lock:
+        make_dirs_if_missing(memento_dir)
+        with open(memento_dir / REKEY_LOCK_FILE, 'a+b') as f:
+            if HAS_FCNTL:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            elif HAS_MSVCRT:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if HAS_FCNTL:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                elif HAS_MSVCRT:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def compute_delta(old: str, new: str) -> Tuple[int, int, str]:
+    """Compute a single-hunk delta that turns `old` into `new`.
+    
+    Returns:
+        (start, end, text) such that old[:start] + text + old[end:] == new
+    """
+    limit = min(len(old), len(new))
+    block = 4096
+    
+    # Common prefix - compare whole blocks first, then characters
+    prefix = 0
+    while prefix + block <= limit and old[prefix:prefix + block] == new[prefix:prefix + block]:
+        prefix += block
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    
+    # Common suffix, never overlapping the prefix
+    suffix = 0
+    max_suffix = limit - prefix
+    old_end, new_end = len(old), len(new)
+    while (suffix + block <= max_suffix and
+           old[old_end - suffix - block:old_end - suffix] == new[new_end - suffix - block:new_end - suffix]):
+        suffix += block
+    while suffix < max_suffix and old[old_end - suffix - 1] == new[new_end - suffix - 1]:
+        suffix += 1
+    
+    return prefix, old_end - suffix, new[prefix:new_end - suffix]
+
+
+def apply_delta(text: str, start: int, end: int, replacement: str) -> str:
+    """Apply a delta produced by compute_delta()."""
+    return text[:start] + replacement + text[end:]
+
+
+def line_range_offsets(text: str, start_line: int, tail_lines: int) -> Tuple[int, int]:
+    """Convert a line-based region into character offsets.
+    
+    Args:
+        text: Document the region refers to
+        start_line: First line of the region (1-based, like Tk text indices)
+        tail_lines: Number of whole lines after the region that are left untouched
+        
+    Returns:
+        (start, end) character offsets of the region
+        
+    Raises:
+        ValueError: If the document does not have enough lines for the region
+    """
+    start = 0
+    for _ in range(start_line - 1):
+        start = text.find('\n', start) + 1
+        if start == 0:
+            raise ValueError(f"Line {start_line} is past the end of the document")
+    
+    end = len(text)
+    for _ in range(tail_lines):
+        end = text.rfind('\n', 0, end)
+        if end < 0:
+            raise ValueError(f"Document has fewer than {tail_lines} trailing lines")
+    
+    if end < start:
+        raise ValueError("Region end precedes region start")
+    return start, end
+
+
+def _compose_hunk(hunk: Optional[Tuple[int, int, int]], start: int, end: int,
+                  replacement_length: int) -> Tuple[int, int, int]:
+    """Merge an edit into the single hunk covering all previous edits.
+    
+    Hunks are (start, old_end, new_end): text[start:old_end] of the original
+    document became text[start:new_end] of the edited one. The edit's offsets
+    refer to the document as edited so far.
+    """
+    if hunk is None:
+        return start, end, start + replacement_length
+    
+    hunk_start, old_end, new_end = hunk
+    if end > new_end:
+        old_end += end - new_end
+        new_end = end
+    new_end += replacement_length - (end - start)
+    return min(hunk_start, start), old_end, new_end
+
+
+def preview_line(text: str) -> str:
+    """Get the display preview (first line) of a text without splitting all of it."""
+    if not text:
+        return "[Empty memento]"
+    
+    newline = text.find('\n')
+    first_line = (text if newline < 0 else text[:newline]).strip()
+    return first_line[:MAX_PREVIEW_LENGTH] if first_line else "[Untitled]"
+
+
+def _parse_legacy_delta(payload: str) -> Optional[dict]:
+    """Parse a delta written before DELTA_MAGIC existed ({"start", "end", "text"} JSON), or None."""
+    if not payload.startswith('{'):
+        return None
+    try:
+        delta = json.loads(payload)
+    except ValueError:
+        return None
+    if (isinstance(delta, dict) and set(delta) == {'start', 'end', 'text'} and
+            isinstance(delta['start'], int) and isinstance(delta['end'], int) and
+            isinstance(delta['text'], str)):
+        return delta
+    return None
+
+
+def _control_mtime(memento_dir: pathlib.Path) -> int:
+    """Get the control file/journal modification time used to detect stale index rows."""
+    mtime = 0
+    for name in (CONTROL_FILE, JOURNAL_FILE):
+        try:
+            mtime = max(mtime, (memento_dir / name).stat().st_mtime_ns)
+        except OSError:
+            pass
+    return mtime
+
 
 class MementoInfo:
     """Information about a memento for display in the selector."""
-    def __init__(self, memento_id: int, first_line: str, last_modified: datetime):
+    def __init__(self, memento_id: int, first_line: str, last_modified: datetime,
+                 is_encrypted: bool = False):
         self.memento_id = memento_id
         self.first_line = first_line
         self.last_modified = last_modified
+        self.is_encrypted = is_encrypted
+
+
+class MementoIndex:
+    """Persistent listing metadata for all mementos, stored in a SQLite table under MEMENTO_ROOT.
+    
+    Rows are written when a memento's journal is checkpointed, and listing
+    rebuilds only the rows whose control file or journal changed since (one
+    stat() per memento), so saves do not pay for the index. The latest MongoDB
+    timestamps of MongoDB-only mementos are kept in a second table, so the
+    selector can page, sort and filter both with SQL.
+    """
+    
+    _lock = threading.Lock()
+    # One connection per database file for the whole process, used under _lock
+    _connections: Dict[str, sqlite3.Connection] = {}
+    
+    # Sort keys accepted by page()
+    SORT_COLUMNS = {'modified': 'last_modified', 'id': 'memento_id'}
+    
+    def __init__(self, root: Optional[pathlib.Path] = None):
+        self.root = pathlib.Path(root) if root is not None else MEMENTO_ROOT
+        self.path = self.root / INDEX_FILE
+    
+    @contextmanager
+    def _connection(self):
+        """Hold the index lock and yield the shared connection."""
+        with self._lock:
+            yield self._connect()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get the process-wide connection to the index, opening it and creating the schema once.
+        
+        Callers hold _lock. A connection whose database file was removed is reopened.
+        """
+        key = str(self.path)
+        conn = self._connections.get(key)
+        if conn is not None:
+            if self.path.exists():
+                return conn
+            conn.close()
+        
+        make_dirs_if_missing(self.root)
+        conn = sqlite3.connect(key, timeout=5.0, check_same_thread=False)
+        # The index is a rebuildable cache: skip the per-transaction fsync
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS mementos ("
+            " memento_id INTEGER PRIMARY KEY,"
+            " first_line TEXT NOT NULL,"
+            " last_modified REAL NOT NULL,"
+            " is_encrypted INTEGER NOT NULL,"
+            " control_mtime INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS mementos_last_modified ON mementos (last_modified)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS remote_mementos ("
+            " memento_id INTEGER PRIMARY KEY,"
+            " last_modified REAL NOT NULL)"
+        )
+        conn.commit()
+        self._connections[key] = conn
+        return conn
+    
+    def update(self, memento_id: int, first_line: str, last_modified: float,
+               is_encrypted: bool, control_mtime: int):
+        """Insert or replace the index row for one memento."""
+        self._upsert([(memento_id, first_line, last_modified, int(is_encrypted), control_mtime)])
+    
+    def _upsert(self, rows: List[Tuple]):
+        """Insert or replace several index rows in one transaction."""
+        if not rows:
+            return
+        with self._connection() as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO mementos"
+                    " (memento_id, first_line, last_modified, is_encrypted, control_mtime)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+    
+    def remove(self, memento_ids):
+        """Drop index rows for mementos that no longer exist."""
+        ids = [(memento_id,) for memento_id in memento_ids]
+        if not ids:
+            return
+        with self._connection() as conn:
+            with conn:
+                conn.executemany("DELETE FROM mementos WHERE memento_id = ?", ids)
+    
+    def load(self) -> Dict[int, Tuple]:
+        """Read all index rows keyed by memento_id."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "SELECT memento_id, first_line, last_modified, is_encrypted, control_mtime FROM mementos"
+            )
+            return {row[0]: row for row in cursor}
+    
+    def sync(self) -> Dict[int, Tuple]:
+        """Bring the local rows up to date with one directory scan.
+        
+        Only rows whose control file changed are rebuilt; rows of deleted mementos are dropped.
+        
+        Returns:
+            The current rows keyed by memento_id
+        """
+        rows = self.load()
+        current = {}
+        stale_rows = []
+        
+        for item in self.root.iterdir():
+            if not (item.is_dir() and item.name.isdigit()):
+                continue
+            
+            memento_id = int(item.name)
+            control_mtime = _control_mtime(item)
+            row = rows.get(memento_id)
+            
+            if row is None or row[4] != control_mtime:
+                manager = FileManager(memento_id)
+                first_line = ENCRYPTED_PREVIEW if manager.is_encrypted() else manager.get_first_line()
+                row = (memento_id, first_line, manager.last_modified,
+                       int(manager.is_encrypted()), control_mtime)
+                stale_rows.append(row)
+            current[memento_id] = row
+        
+        self._upsert(stale_rows)
+        self.remove(set(rows) - set(current))
+        return current
+    
+    def refresh(self) -> List[MementoInfo]:
+        """List local mementos from the index, rebuilding only rows whose control file changed."""
+        return [self._info(row) for row in self.sync().values()]
+    
+    @staticmethod
+    def _info(row: Tuple) -> MementoInfo:
+        return MementoInfo(
+            memento_id=row[0],
+            first_line=row[1],
+            last_modified=datetime.fromtimestamp(row[2]),
+            is_encrypted=bool(row[3])
+        )
+    
+    def replace_remote(self, timestamps: Dict[int, float]):
+        """Record the latest MongoDB timestamp of every memento, replacing the previous set."""
+        with self._connection() as conn:
+            with conn:
+                conn.execute("DELETE FROM remote_mementos")
+                conn.executemany(
+                    "INSERT INTO remote_mementos (memento_id, last_modified) VALUES (?, ?)",
+                    timestamps.items()
+                )
+    
+    def _query(self, select: str, include_remote: bool, search: Optional[str]) -> Tuple[str, List]:
+        """Build a query over local (and optionally MongoDB-only) rows matching `search`."""
+        sql = "SELECT memento_id, first_line, last_modified, is_encrypted FROM mementos"
+        params = []
+        if include_remote:
+            sql += (" UNION ALL SELECT memento_id, ?, last_modified, 1 FROM remote_mementos"
+                    " WHERE memento_id NOT IN (SELECT memento_id FROM mementos)")
+            params.append(ENCRYPTED_PREVIEW)
+        sql = f"SELECT {select} FROM ({sql})"
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql += " WHERE first_line LIKE ? ESCAPE '\\' OR CAST(memento_id AS TEXT) LIKE ? ESCAPE '\\'"
+            params += [pattern, pattern]
+        return sql, params
+    
+    def count(self, search: Optional[str] = None, include_remote: bool = False) -> int:
+        """Number of mementos matching `search` (a substring of the preview or id)."""
+        sql, params = self._query("COUNT(*)", include_remote, search)
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+    
+    def page(self, offset: int, limit: int, sort: str = 'modified', descending: bool = True,
+             search: Optional[str] = None, include_remote: bool = False) -> List[MementoInfo]:
+        """One page of mementos, sorted and filtered by SQLite.
+        
+        Args:
+            offset: Rows to skip
+            limit: Maximum rows to return
+            sort: Key from SORT_COLUMNS ('modified' or 'id')
+            descending: Newest / highest id first
+            search: Only mementos whose preview or id contains this text (case-insensitive)
+            include_remote: Also list MongoDB-only mementos recorded by replace_remote()
+        """
+        column = self.SORT_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        sql, params = self._query("memento_id, first_line, last_modified, is_encrypted", include_remote, search)
+        sql += f" ORDER BY {column} {direction}, memento_id {direction} LIMIT ? OFFSET ?"
+        with self._connection() as conn:
+            return [self._info(row) for row in conn.execute(sql, params + [limit, offset])]
 
 
 class FileManager:
@@ -39,6 +438,7 @@ class FileManager:
         self.memento_id = memento_id
         self.memento_dir = get_memento_dir(memento_id)
         self.control_file = self.memento_dir / CONTROL_FILE
+        self.journal_file = self.memento_dir / JOURNAL_FILE
         
         # Control file structure
         self.current_index = 0
@@ -46,11 +446,36 @@ class FileManager:
         self.created_timestamp = time.time()
         self.last_modified = time.time()
         
+        # Delta snapshot state: slot index -> base index (None for keyframes).
+        # The payloads themselves are authoritative; this map finds dependents cheaply.
+        self.slots: Dict[int, Optional[int]] = {}
+        # Content digest of each slot's full text, used to deduplicate identical saves
+        self.digests: Dict[int, str] = {}
+        self.deltas_since_keyframe = 0
+        self._last_text: Optional[str] = None
+        
+        # Caller-supplied version of the last written text, used to validate incremental saves
+        self.text_version = 0
+        # Digest of the text last queued for MongoDB by replicate_content()
+        self._replicated_digest: Optional[str] = None
+        
+        # Commit journal state
+        self.journal_seq = 0
+        self._checkpoint_seq = 0
+        self._unsynced_commits = 0
+        self._unsynced_paths = set()
+        
         # Encryption support
         self.encryption_manager = None;
         self._is_encrypted = False;
         self._current_passphrase = None;
         self._aes_key = None;
+        # Random data key wrapped by the passphrase key (None for plaintext and older mementos)
+        self.wrapped_key: Optional[bytes] = None;
+        # Key check value of older mementos without a wrapped key, recorded on first verification
+        self.key_check: Optional[bytes] = None;
+        # KDF name, parameters and salt for the passphrase key (None: legacy PBKDF2, id-based salt)
+        self.kdf: Optional[dict] = None;
         
         if HAS_ENCRYPTION:
             # Use shared singleton EncryptionManager instance
@@ -61,38 +486,194 @@ class FileManager:
         self._load_control_file()
     
     def _load_control_file(self):
-        """Load control file data if it exists."""
+        """Load control file data if it exists, then roll forward from the commit journal."""
         if self.control_file.exists():
             try:
                 with open(self.control_file, 'r') as f:
-                    data = json.load(f)
-                    self.current_index = data.get('current_index', 0)
-                    self.max_buffers = data.get('max_buffers', 10)
-                    self.created_timestamp = data.get('created_timestamp', time.time())
-                    self.last_modified = data.get('last_modified', time.time())
-                    self._is_encrypted = data.get('is_encrypted', False)
+                    self._apply_control_data(json.load(f))
             except (json.JSONDecodeError, FileNotFoundError):
                 # If control file is corrupted, start fresh
                 pass
+        self._checkpoint_seq = self.journal_seq
+        
+        # The newest complete journal record (if newer than the checkpoint) is the committed state
+        record = self._read_last_journal_record()
+        if record is not None and record.get('seq', 0) > self.journal_seq:
+            self._apply_control_data(record)
         
         # If no control file, check for encrypted data to determine encryption status
         if not self.control_file.exists() and self.encryption_manager:
             self._detect_encryption_status()
     
-    def _save_control_file(self):
-        """Save control file with current state."""
-        make_dirs_if_missing(self.memento_dir)
+    def recover_rekey(self):
+        """Finish or roll back a slot re-key interrupted by a crash.
+        
+        Only done when a memento is opened for editing (see load_memento()), under
+        the same lock the re-key holds; listing, migration and auto-capture
+        managers leave staged files alone. The control state is reloaded under the
+        lock in case another process committed a re-key meanwhile.
+        """
+        if not self.memento_dir.exists():
+            return
+        with _rekey_lock(self.memento_dir):
+            self._load_control_file()
+            self._recover_rekey()
+    
+    def _recover_rekey(self):
+        """Finish or roll back an interrupted re-key; callers hold the re-key lock.
+        
+        If the marker exists every re-keyed slot was written, so the remaining
+        staged files are renamed into place and the wrapped key it holds is
+        committed; otherwise they are discarded and the old key still opens
+        every slot.
+        """
+        staged = list(self.memento_dir.glob('*' + REKEY_SUFFIX))
+        marker = self.memento_dir / REKEY_MARKER_FILE
+        if not staged and not marker.exists():
+            return
+        
+        try:
+            with open(marker, 'r') as f:
+                record = json.load(f)
+            wrapped_key = base64.b64decode(record['wrapped_key'])
+            kdf = record['kdf']
+        except (OSError, ValueError, KeyError, TypeError):
+            # No complete marker - the re-key never reached its commit point
+            wrapped_key = None
         
-        data = {
+        for path in staged:
+            if wrapped_key is not None:
+                os.replace(path, path.with_name(path.name[:-len(REKEY_SUFFIX)]))
+            else:
+                path.unlink()
+        if wrapped_key is not None:
+            self.wrapped_key = wrapped_key
+            self.kdf = kdf
+            self.key_check = None
+            self._save_control_file()
+        else:
+            _fsync_path(self.memento_dir)
+        if marker.exists():
+            marker.unlink()
+    
+    def _apply_control_data(self, data: dict):
+        """Restore state from a control file or journal record."""
+        self.current_index = data.get('current_index', 0)
+        self.max_buffers = data.get('max_buffers', 10)
+        self.created_timestamp = data.get('created_timestamp', time.time())
+        self.last_modified = data.get('last_modified', time.time())
+        self._is_encrypted = data.get('is_encrypted', False)
+        wrapped_key = data.get('wrapped_key')
+        self.wrapped_key = base64.b64decode(wrapped_key) if wrapped_key else None
+        key_check = data.get('key_check')
+        self.key_check = bytes.fromhex(key_check) if key_check else None
+        self.kdf = data.get('kdf')
+        slots = data.get('slots', {})
+        self.slots = {int(index): slot.get('base') for index, slot in slots.items()}
+        self.digests = {
+            int(index): slot['digest'] for index, slot in slots.items() if slot.get('digest')
+        }
+        self.deltas_since_keyframe = data.get('deltas_since_keyframe', 0)
+        self.journal_seq = data.get('seq', 0)
+    
+    def _control_data(self) -> dict:
+        """Current state as stored in control.json and journal records."""
+        return {
+            'seq': self.journal_seq,
             'current_index': self.current_index,
             'max_buffers': self.max_buffers,
             'created_timestamp': self.created_timestamp,
             'last_modified': self.last_modified,
-            'is_encrypted': self._is_encrypted
+            'is_encrypted': self._is_encrypted,
+            'wrapped_key': base64.b64encode(self.wrapped_key).decode('ascii') if self.wrapped_key else None,
+            'key_check': self.key_check.hex() if self.key_check else None,
+            'kdf': self.kdf,
+            'slots': {
+                str(index): {'base': base, 'digest': self.digests.get(index)}
+                for index, base in self.slots.items()
+            },
+            'deltas_since_keyframe': self.deltas_since_keyframe
         }
+    
+    def _save_control_file(self):
+        """Checkpoint the current state into control.json atomically and reset the journal."""
+        make_dirs_if_missing(self.memento_dir)
+        
+        # Slot data must be durable before a checkpoint points at it
+        self._sync_slot_files()
+        
+        self.journal_seq += 1
+        tmp_path = self.control_file.with_name(CONTROL_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._control_data(), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.control_file)
+        _fsync_path(self.memento_dir)
+        
+        # Everything in the journal is now folded into the checkpoint
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        self._checkpoint_seq = self.journal_seq
+        self._unsynced_commits = 0
+        self._update_index()
+    
+    def _append_journal(self):
+        """Commit the current state by appending one record to the journal.
+        
+        The record is written after the slot file it references has been atomically
+        replaced, so the newest complete record always describes a consistent state.
+        fsync is batched: every JOURNAL_FSYNC_BATCH commits or on sync().
+        """
+        if not self.control_file.exists():
+            # First commit of a new memento - create the checkpoint directly
+            self._save_control_file()
+            return
+        
+        self.journal_seq += 1
+        line = json.dumps(self._control_data(), separators=(',', ':')) + '\n'
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+        self._unsynced_commits += 1
         
-        with open(self.control_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        if self.journal_seq - self._checkpoint_seq >= JOURNAL_CHECKPOINT_INTERVAL:
+            self._save_control_file()
+        elif self._unsynced_commits >= JOURNAL_FSYNC_BATCH:
+            self.sync()
+    
+    def _read_last_journal_record(self) -> Optional[dict]:
+        """Read the newest complete journal record without scanning the whole file."""
+        try:
+            size = self.journal_file.stat().st_size
+            with open(self.journal_file, 'rb') as f:
+                f.seek(max(0, size - JOURNAL_TAIL_BYTES))
+                tail = f.read()
+        except OSError:
+            return None
+        
+        # The piece after the final newline is either empty or a torn write
+        for line in reversed(tail.split(b'\n')[:-1]):
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                continue
+            if isinstance(record, dict):
+                return record
+        return None
+    
+    def _sync_slot_files(self):
+        """fsync slot files written since the last sync."""
+        for path in self._unsynced_paths:
+            _fsync_path(path)
+        self._unsynced_paths.clear()
+    
+    def sync(self):
+        """Make every commit so far durable: slot files, the journal and the directory entries."""
+        self._sync_slot_files()
+        if self.journal_file.exists():
+            _fsync_path(self.journal_file)
+        _fsync_path(self.memento_dir)
+        self._unsynced_commits = 0
     
     def _detect_encryption_status(self):
         """Detect if existing files are encrypted by examining snapshot files."""
@@ -130,16 +711,55 @@ class FileManager:
         """Check if this memento is encrypted."""
         return self._is_encrypted
     
-    def _prepare_aes_key(self, passphrase: str):
-        """Prepare AES key for encryption/decryption."""
+    def _passphrase_key(self, passphrase: str, kdf: Optional[dict] = None) -> bytes:
+        """Derive (or fetch from the cache) the key-encryption key for a passphrase.
+        
+        Args:
+            kdf: KDF parameters to use instead of this memento's recorded ones
+        """
         if not self.encryption_manager:
             raise RuntimeError("Encryption not available")
         
-        # Use memento_id as salt source for consistency
-        salt = str(self.memento_id).encode().ljust(32, b'\0')[:32]
-        self._aes_key = self.encryption_manager.derive_aes_key(passphrase, salt)
+        kdf = kdf or self.kdf
+        if kdf:
+            salt = bytes.fromhex(kdf['salt'])
+        else:
+            # Mementos without recorded KDF parameters use memento_id as salt source
+            salt = str(self.memento_id).encode().ljust(32, b'\0')[:32]
+        return self.encryption_manager.get_aes_key(self.memento_id, passphrase, salt, kdf)
+    
+    def _prepare_aes_key(self, passphrase: str):
+        """Prepare AES key for encryption/decryption.
+        
+        With a wrapped data key the passphrase key only unwraps it (raising InvalidTag
+        if the passphrase is wrong); mementos encrypted before envelope keys use the
+        passphrase key for their content directly, checked against key_check once
+        it has been recorded.
+        """
+        passphrase_key = self._passphrase_key(passphrase)
+        if self.wrapped_key is not None:
+            self._aes_key = self.encryption_manager.unwrap_key(
+                self.wrapped_key, passphrase_key, self.memento_id
+            )
+        else:
+            if self.key_check is not None and not hmac.compare_digest(
+                    self.encryption_manager.key_check_value(passphrase_key), self.key_check):
+                raise ValueError("Invalid passphrase")
+            self._aes_key = passphrase_key
         self._current_passphrase = passphrase
     
+    def lock(self):
+        """Forget the key for this memento, including the process-wide cached copy."""
+        if self._aes_key and self.encryption_manager:
+            self.encryption_manager.release_cipher(self._aes_key)
+        self._aes_key = None
+        self._current_passphrase = None
+        self._last_text = None
+        
+        if HAS_ENCRYPTION:
+            from encryption import get_key_cache
+            get_key_cache().clear(self.memento_id)
+    
     def verify_passphrase(self, passphrase: str) -> bool:
         """Verify if the given passphrase is correct for this encrypted memento."""
         if not self._is_encrypted or not self.encryption_manager:
@@ -150,8 +770,11 @@ class FileManager:
         old_passphrase = self._current_passphrase
         
         try:
-            # Try to load and decrypt current snapshot
+            # Unwrapping the data key (or the key check value) authenticates the
+            # passphrase without touching any snapshot
             self._prepare_aes_key(passphrase)
+            if self.wrapped_key is not None or self.key_check is not None:
+                return True
             
             # Try to decrypt available snapshots to verify the key works
             # Start with current index, then try all others
@@ -165,26 +788,23 @@ class FileManager:
                     continue
                 
                 try:
-                    # Try to decrypt this snapshot
                     with open(snapshot_path, 'rb') as f:
                         encrypted_data = f.read()
-                    
-                    # This will raise an exception if the key is wrong
-                    self.encryption_manager.decrypt_data(encrypted_data, self._aes_key)
-                    
-                    # Successfully decrypted at least one file
+                except OSError:
+                    continue
+                
+                # Authenticating the first chunk is enough to prove the key
+                if self.encryption_manager.check_key(encrypted_data, self._aes_key):
                     verification_success = True
                     break
-                    
-                except Exception:
-                    # This snapshot can't be decrypted, try the next one
-                    continue
             
             if not verification_success:
                 # No snapshots exist or none could be decrypted
                 raise Exception("No valid snapshots found or passphrase incorrect")
             
-            # Verification successful
+            # Verification successful - record the key check value so later checks are instant
+            self.key_check = self.encryption_manager.key_check_value(self._aes_key)
+            self._save_control_file()
             return True
             
         except Exception as e:
@@ -194,15 +814,22 @@ class FileManager:
             return False
     
     def enable_encryption(self, passphrase: str):
-        """Enable encryption for this memento."""
+        """Enable encryption for this memento with a new random data key."""
         if self._is_encrypted:
             raise ValueError("Memento is already encrypted")
         
         if not self.encryption_manager:
             raise RuntimeError("Encryption not available")
         
-        # Prepare encryption key
-        self._prepare_aes_key(passphrase)
+        # Prepare encryption key: a fresh data key, wrapped by a passphrase key from
+        # the calibrated KDF for this machine
+        data_key = self.encryption_manager.generate_data_key()
+        self.kdf = self.encryption_manager.new_kdf_params()
+        self.wrapped_key = self.encryption_manager.wrap_key(
+            data_key, self._passphrase_key(passphrase), self.memento_id
+        )
+        self._aes_key = data_key
+        self._current_passphrase = passphrase
         
         # Load existing content
         current_content = self.load_current_snapshot()
@@ -215,6 +842,7 @@ class FileManager:
         
         # Mark as encrypted
         self._is_encrypted = True
+        self._reset_history()
         
         # Re-save current content (will be encrypted)
         self.write_snapshot(current_content)
@@ -240,40 +868,121 @@ class FileManager:
         self._is_encrypted = False
         self._aes_key = None
         self._current_passphrase = None
+        self.wrapped_key = None
+        self.key_check = None
+        self.kdf = None
+        self._reset_history()
         
         # Re-save current content (will be plaintext)
         self.write_snapshot(current_content)
     
-    def change_passphrase(self, old_passphrase: str, new_passphrase: str):
-        """Change the encryption passphrase."""
+    def change_passphrase(self, old_passphrase: str, new_passphrase: str,
+                          progress: Optional[Callable[[int, int], None]] = None):
+        """Change the encryption passphrase.
+        
+        Only the 32-byte data key is re-wrapped; the snapshots themselves are
+        untouched. The new passphrase key uses freshly calibrated KDF parameters and
+        a new salt. A memento from before envelope keys is moved to a new data key
+        once, by re-keying every slot (see _rekey_slots()).
+        
+        Args:
+            progress: Called as (slots_done, slots_total) from the calling thread
+                during the one-time re-key of an older memento
+        """
         if not self._is_encrypted:
             raise ValueError("Memento is not encrypted")
         
         if not self.verify_passphrase(old_passphrase):
             raise ValueError("Invalid current passphrase")
         
-        # Load all existing snapshots with old key
-        snapshots = {}
-        for i in range(self.max_buffers):
-            snapshot_path = self._get_snapshot_path(i)
-            if snapshot_path.exists():
-                try:
-                    content = self._load_snapshot_at_index(i)
-                    if content is not None:
-                        snapshots[i] = content
-                except Exception:
-                    continue
-        
-        # Prepare new key
-        self._prepare_aes_key(new_passphrase)
-        
-        # Re-encrypt all snapshots with new key
-        for index, content in snapshots.items():
-            self._write_snapshot_at_index(index, content)
+        new_kdf = self.encryption_manager.new_kdf_params()
+        new_passphrase_key = self._passphrase_key(new_passphrase, new_kdf)
+        if self.wrapped_key is None:
+            old_key = self._aes_key
+            data_key = self.encryption_manager.generate_data_key()
+            wrapped_key = self.encryption_manager.wrap_key(data_key, new_passphrase_key, self.memento_id)
+            self._rekey_slots(old_key, data_key, wrapped_key, new_kdf, progress)
+            self.encryption_manager.release_cipher(old_key)
+            self._aes_key = data_key
+            
+            # Digests are keyed by the old key; keep only the one we can recompute cheaply
+            self.digests = {}
+            if self._last_text is not None:
+                self.digests[self.current_index] = self._content_digest(self._last_text)
+        else:
+            self.wrapped_key = self.encryption_manager.wrap_key(
+                self._aes_key, new_passphrase_key, self.memento_id
+            )
+            self.kdf = new_kdf
+            self.encryption_manager.update_wrapped_key(self.memento_id, self.wrapped_key, self.kdf)
+        self._current_passphrase = new_passphrase
         
         # Update control file
         self._save_control_file()
     
+    def _rekey_slots(self, old_key: bytes, new_key: bytes, wrapped_key: bytes, kdf: dict,
+                     progress: Optional[Callable[[int, int], None]] = None):
+        """Re-key every slot from old_key to new_key on a worker pool, then commit wrapped_key
+        (wrapped under a passphrase key derived with kdf).
+        
+        Each worker reads, re-keys and stages one slot at a time, so memory stays
+        around one slot per worker. Staged slots are renamed into place only after
+        all of them are written; the commit marker holds the new wrapped key, so a
+        crash in between is finished when the memento is next opened for editing
+        (see recover_rekey()). Runs under the memento's re-key lock.
+        
+        Raises:
+            RuntimeError: If a slot cannot be re-keyed; nothing is changed
+        """
+        def rekey(path: pathlib.Path) -> pathlib.Path:
+            # Chunk by chunk, without decompressing, so the delta chain and each
+            # slot's compression stay intact
+            try:
+                with open(path, 'rb') as f:
+                    data = self.encryption_manager.reencrypt_data(f.read(), old_key, new_key)
+            except Exception as e:
+                # A slot left under the old key could never be opened after the change
+                raise RuntimeError(f"Cannot re-key snapshot {path.name}: {e}") from e
+            staged = path.with_name(path.name + REKEY_SUFFIX)
+            with open(staged, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            return staged
+        
+        with _rekey_lock(self.memento_dir):
+            paths = [self._get_snapshot_path(i) for i in range(self.max_buffers)]
+            paths = [path for path in paths if path.exists()]
+            staged = []
+            try:
+                with ThreadPoolExecutor(max_workers=REKEY_WORKERS, thread_name_prefix="Rekey") as executor:
+                    futures = [executor.submit(rekey, path) for path in paths]
+                    for done, future in enumerate(as_completed(futures), 1):
+                        staged.append(future.result())
+                        if progress:
+                            progress(done, len(paths))
+            except BaseException:
+                # Nothing has been replaced yet - the old key still opens every slot
+                for path in self.memento_dir.glob('*' + REKEY_SUFFIX):
+                    path.unlink()
+                self.encryption_manager.release_cipher(new_key)
+                raise
+        
+            # Commit point: from here on a crash finishes the change on next open
+            marker = self.memento_dir / REKEY_MARKER_FILE
+            with open(marker, 'w') as f:
+                json.dump({'wrapped_key': base64.b64encode(wrapped_key).decode('ascii'), 'kdf': kdf}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            _fsync_path(self.memento_dir)
+            for path in staged:
+                os.replace(path, path.with_name(path.name[:-len(REKEY_SUFFIX)]))
+            self.wrapped_key = wrapped_key
+            self.kdf = kdf
+            self.key_check = None
+            self._save_control_file()
+            marker.unlink()
+    
     def _adjust_buffer_size(self, text_size: int):
         """Adjust buffer size based on text size, protecting current position."""
         new_buffer_size = calculate_buffer_size(text_size)
@@ -290,50 +999,361 @@ class FileManager:
             # Growing buffer - just update the count
             self.max_buffers = new_buffer_size
         else:
-            # Shrinking buffer - remove excess files
+            # Shrinking buffer - rebase surviving deltas, then remove excess files
+            for i in range(new_buffer_size, self.max_buffers):
+                self._release_slot(i, keep_below=new_buffer_size)
             for i in range(new_buffer_size, self.max_buffers):
                 snapshot_path = self._get_snapshot_path(i)
                 if snapshot_path.exists():
                     snapshot_path.unlink()
+                self.slots.pop(i, None)
+                self.digests.pop(i, None)
             self.max_buffers = new_buffer_size
     
-    def write_snapshot(self, text: str):
-        """Write a new snapshot to the ring buffer."""
+    def _reset_history(self):
+        """Forget delta chain state after the slot files have been replaced."""
+        self.slots = {}
+        self.digests = {}
+        self.deltas_since_keyframe = 0
+        self._last_text = None
+    
+    def _release_slot(self, index: int, keep_below: Optional[int] = None):
+        """Rewrite any delta that depends on a slot as a keyframe before the slot goes away.
+        
+        The rebased slots and the new slot map are made durable through the journal
+        before returning, so the caller can then overwrite or delete the slot.
+        
+        Args:
+            index: Slot about to be overwritten or deleted
+            keep_below: If given, only dependents with a lower index are rebased
+        """
+        changed = False
+        for dependent, base in list(self.slots.items()):
+            if base != index or dependent == index:
+                continue
+            if keep_below is not None and dependent >= keep_below:
+                continue
+            
+            changed = True
+            text = self._load_snapshot_at_index(dependent)
+            if text is None:
+                # Chain is already broken - drop the dependent rather than keep garbage
+                self.slots.pop(dependent, None)
+                self.digests.pop(dependent, None)
+                continue
+            
+            self._write_slot_payload(dependent, text)
+            self.slots[dependent] = None
+        
+        if changed:
+            self._append_journal()
+            self.sync()
+    
+    def _content_digest(self, text: str) -> Optional[str]:
+        """Digest of a snapshot's full text.
+        
+        Encrypted mementos use an HMAC keyed from the AES key, so control.json
+        never holds a plain hash of the protected text.
+        """
+        data = text.encode('utf-8', errors='surrogatepass')
+        if not self._is_encrypted:
+            return hashlib.sha256(data).hexdigest()
+        if not self._aes_key:
+            return None
+        digest_key = hmac.new(self._aes_key, b'memento-content-digest', hashlib.sha256).digest()
+        return hmac.new(digest_key, data, hashlib.sha256).hexdigest()
+    
+    def _find_duplicate_slot(self, digest: str) -> Optional[int]:
+        """Find another retained slot holding exactly this content."""
+        for index, slot_digest in self.digests.items():
+            if (slot_digest == digest and index != self.current_index and
+                    self._get_snapshot_path(index).exists()):
+                return index
+        return None
+    
+    def _set_digest(self, index: int, digest: Optional[str]):
+        """Record (or forget) the content digest of a slot."""
+        if digest is None:
+            self.digests.pop(index, None)
+        else:
+            self.digests[index] = digest
+    
+    def _chain_depth(self, index: int) -> int:
+        """Number of deltas between a slot and its keyframe."""
+        depth = 0
+        base = self.slots.get(index)
+        while base is not None and depth < self.max_buffers:
+            depth += 1
+            base = self.slots.get(base)
+        return depth
+    
+    def write_snapshot(self, text: str, version: Optional[int] = None):
+        """Write a new snapshot to the ring buffer.
+        
+        Snapshots are stored as a full keyframe every KEYFRAME_INTERVAL writes,
+        with compact deltas against the previous version in between.
+        
+        Args:
+            text: Full document text
+            version: Optional caller version number recorded for later incremental saves
+        """
+        # Previous version to diff against (cached from the last load/write, else loaded on demand)
+        self._commit_snapshot(text, previous_text=self._last_text, version=version)
+    
+    def write_snapshot_edits(self, edits: List[Tuple[int, int, str]], base_version: int, version: int):
+        """Write a new snapshot from changed line regions instead of the full text.
+        
+        Args:
+            edits: (start_line, tail_lines, text) regions, applied in order; see line_range_offsets()
+            base_version: Version the edits were made against - must match the last written version
+            version: Version number of the resulting text
+            
+        Raises:
+            ValueError: If the edits do not apply to the last written text
+        """
+        if base_version != self.text_version:
+            raise ValueError(
+                f"Incremental snapshot is based on version {base_version}, "
+                f"but version {self.text_version} is stored"
+            )
+        
+        if self._last_text is None:
+            # Not cached (e.g. after a chunked load) - rebuild the stored version once
+            self._last_text = self._load_snapshot_at_index(self.current_index)
+            if self._last_text is None:
+                raise ValueError(f"Version {base_version} could not be loaded")
+        
+        text = self._last_text
+        hunk = None
+        for start_line, tail_lines, replacement in edits:
+            start, end = line_range_offsets(text, start_line, tail_lines)
+            text = apply_delta(text, start, end, replacement)
+            hunk = _compose_hunk(hunk, start, end, len(replacement))
+        
+        delta = None
+        if hunk is not None:
+            hunk_start, old_end, new_end = hunk
+            delta = (hunk_start, old_end, text[hunk_start:new_end])
+        
+        self._commit_snapshot(text, delta=delta, version=version)
+    
+    def _commit_snapshot(self, text: str, previous_text: Optional[str] = None,
+                         delta: Optional[Tuple[int, int, str]] = None, version: Optional[int] = None):
+        """Write text into the next ring slot as a keyframe or as a delta against the current slot.
+        
+        Args:
+            text: Full text of the new snapshot
+            previous_text: Text of the current slot, used to compute a delta if none is given
+                (loaded from disk when needed and not supplied)
+            delta: Precomputed (start, end, replacement) against the current slot
+            version: Caller version number to record
+        """
         make_dirs_if_missing(self.memento_dir)
+        previous_index = self.current_index
+        digest = self._content_digest(text)
+        
+        if (digest is not None and self.digests.get(previous_index) == digest and
+                self._get_snapshot_path(previous_index).exists()):
+            # Unchanged text - record the save without rewriting or advancing the ring
+            self._last_text = text
+            if version is not None:
+                self.text_version = version
+            self.last_modified = time.time()
+            self._append_journal()
+            return
+        
+        # Adjust buffer size based on the amortized on-disk size of one slot
+        # (character count is a cheap stand-in for the UTF-8 size)
+        self._adjust_buffer_size(len(text) // KEYFRAME_INTERVAL)
         
-        # Adjust buffer size based on text size
-        text_bytes = len(text.encode('utf-8'))
-        self._adjust_buffer_size(text_bytes)
+        # Anything that was diffed against the slot we are about to overwrite becomes a keyframe
+        # (committed before the ring moves on, so a crash never leaves a dependent without its base)
+        next_index = (self.current_index + 1) % self.max_buffers
+        self._release_slot(next_index)
         
         # Move to next position in ring buffer
-        self.current_index = (self.current_index + 1) % self.max_buffers
+        self.current_index = next_index
         
-        # Write the snapshot
-        self._write_snapshot_at_index(self.current_index, text)
+        can_delta = (previous_index != self.current_index and
+                     self._get_snapshot_path(previous_index).exists() and
+                     self.deltas_since_keyframe < KEYFRAME_INTERVAL - 1)
+        if can_delta and delta is None:
+            if previous_text is None:
+                previous_text = self._load_snapshot_at_index(previous_index)
+            if previous_text is not None:
+                delta = compute_delta(previous_text, text)
+        if delta is not None and len(delta[2]) > len(text) // 2:
+            # A delta this large is no cheaper than a keyframe
+            delta = None
         
-        # Update timestamps and save control file
+        # Text identical to an older retained slot is stored as an empty delta referencing it
+        duplicate = self._find_duplicate_slot(digest) if digest is not None else None
+        if duplicate is not None and self._chain_depth(duplicate) < KEYFRAME_INTERVAL - 1:
+            payload = DELTA_MAGIC + json.dumps({'base': duplicate, 'start': 0, 'end': 0, 'text': ''})
+            self._write_slot_payload(self.current_index, payload)
+            self.slots[self.current_index] = duplicate
+            self.deltas_since_keyframe = self._chain_depth(self.current_index)
+        elif can_delta and delta is not None:
+            start, end, replacement = delta
+            payload = DELTA_MAGIC + json.dumps(
+                {'base': previous_index, 'start': start, 'end': end, 'text': replacement}
+            )
+            self._write_slot_payload(self.current_index, payload)
+            self.slots[self.current_index] = previous_index
+            self.deltas_since_keyframe += 1
+        else:
+            self._write_slot_payload(self.current_index, text)
+            self.slots[self.current_index] = None
+            self.deltas_since_keyframe = 0
+        self._set_digest(self.current_index, digest)
+        self._last_text = text
+        if version is not None:
+            self.text_version = version
+        
+        # Update timestamps and commit through the journal
         self.last_modified = time.time()
-        self._save_control_file()
+        self._append_journal()
     
-    def _write_snapshot_at_index(self, index: int, text: str):
-        """Write snapshot at specific index, handling encryption."""
-        snapshot_path = self._get_snapshot_path(index)
+    def _update_index(self):
+        """Record listing metadata for this memento in the shared index.
         
-        if self._is_encrypted and self.encryption_manager and self._aes_key:
-            # Encrypt and save
-            encrypted_data = self.encryption_manager.encrypt_data(text, self._aes_key)
-            with open(snapshot_path, 'wb') as f:
-                f.write(encrypted_data)
+        Called at checkpoints; rows left stale by later journal commits are
+        rebuilt when mementos are listed (see MementoIndex.sync()).
+        """
+        if self._is_encrypted:
+            first_line = ENCRYPTED_PREVIEW
+        elif self._last_text is not None:
+            first_line = preview_line(self._last_text)
         else:
-            # Save as plaintext
-            with open(snapshot_path, 'w', encoding='utf-8') as f:
-                f.write(text)
+            return  # Text not at hand - the next listing rebuilds the row
+        try:
+            MementoIndex().update(
+                self.memento_id, first_line, self.last_modified,
+                self._is_encrypted, _control_mtime(self.memento_dir)
+            )
+        except sqlite3.Error as e:
+            # The index is only a cache - never fail a save because of it
+            logger.warning(f"Failed to update memento index: {e}")
+    
+    def _write_slot_payload(self, index: int, payload: str,
+                            compression: Optional[Tuple[int, int]] = None):
+        """Write a raw slot payload (keyframe text or delta), handling encryption.
+        
+        The slot is written to a temporary file and renamed into place, so a
+        crash never leaves a half-written slot behind.
+        
+        Args:
+            compression: (codec, level) for encrypted slots; by default a fast level is
+                used when saves arrive within HOT_SAVE_INTERVAL_SEC of each other
+        """
+        if self._is_encrypted and self.encryption_manager and self._aes_key:
+            if compression is None:
+                hot = time.time() - self.last_modified < HOT_SAVE_INTERVAL_SEC
+                compression = self.encryption_manager.choose_compression(len(payload), hot)
+            
+            # Encrypt and save (the codec and level are recorded in the stream header)
+            codec, level = compression
+            encrypted_data = self.encryption_manager.encrypt_data(payload, self._aes_key, codec, level)
+            self._replace_slot_file(index, encrypted_data)
+            return
+        
+        # Save as plaintext
+        snapshot_path = self._get_snapshot_path(index)
+        tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+        # newline='': delta offsets index the text exactly as given, so no \r\n translation
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(payload)
+        os.replace(tmp_path, snapshot_path)
+        self._unsynced_paths.add(snapshot_path)
+    
+    def _replace_slot_file(self, index: int, data: bytes):
+        """Atomically replace a slot file with already-encoded bytes."""
+        snapshot_path = self._get_snapshot_path(index)
+        tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, snapshot_path)
+        self._unsynced_paths.add(snapshot_path)
+    
+    def idle_maintenance(self):
+        """Background work for the snapshot writer's idle time (after the latest save is durable)."""
+        self.replicate_content()
+        self.recompress_cold_slots()
+    
+    def replicate_content(self) -> bool:
+        """Queue the latest text of an encrypted memento for MongoDB.
+        
+        Goes through EncryptionManager.save_encrypted_content(), which commits the
+        version locally and leaves the push to the replication worker. Run when the
+        snapshot writer is idle, so a burst of autosaves queues one version.
+        
+        Returns:
+            True if a version was queued
+        """
+        key = self._aes_key
+        if not (self._is_encrypted and key and self._last_text is not None and
+                self.encryption_manager and self.encryption_manager.is_replicating):
+            return False
+        digest = self.digests.get(self.current_index)
+        if digest is not None and digest == self._replicated_digest:
+            return False  # Unchanged since the last queued version
+        
+        self.encryption_manager.save_encrypted_content(
+            self.memento_id, self._last_text, key, self.wrapped_key, self.kdf
+        )
+        self._replicated_digest = digest
+        return True
+    
+    def recompress_cold_slots(self, max_slots: int = 1) -> int:
+        """Rewrite encrypted slots that have left the active window at archive quality.
+        
+        Slots written during rapid autosaves use a fast codec level. Once a slot is
+        older than the newest RECOMPRESS_ACTIVE_WINDOW snapshots it is rarely read,
+        so it is worth recompressing with ARCHIVE_COMPRESSION. Only the stream
+        header is read to decide; at most max_slots slots are rewritten per call,
+        so this can run whenever the writer is idle. Plaintext slots are stored
+        uncompressed and are left alone.
+        
+        Returns:
+            Number of slots rewritten
+        """
+        # Use one key throughout: a slot is only rewritten under the key it was read with,
+        # and never as plaintext, even if the memento is locked or re-keyed meanwhile
+        key = self._aes_key
+        if not (self._is_encrypted and self.encryption_manager and key):
+            return 0
+        
+        rewritten = 0
+        for offset in range(RECOMPRESS_ACTIVE_WINDOW, self.max_buffers):
+            if rewritten >= max_slots:
+                break
+            index = (self.current_index - offset) % self.max_buffers
+            try:
+                with open(self._get_snapshot_path(index), 'rb') as f:
+                    header = f.read(64)
+                    if self.encryption_manager.stream_compression(header) == ARCHIVE_COMPRESSION:
+                        continue
+                    payload = self.encryption_manager.decrypt_data(header + f.read(), key)
+            except Exception:
+                continue
+            
+            encrypted_data = self.encryption_manager.encrypt_data(payload, key, *ARCHIVE_COMPRESSION)
+            if not self._is_encrypted or self._aes_key is not key:
+                break
+            self._replace_slot_file(index, encrypted_data)
+            rewritten += 1
+        
+        if rewritten:
+            self._sync_slot_files()
+            _fsync_path(self.memento_dir)
+        return rewritten
     
     def load_current_snapshot(self) -> str:
         """Load the current (most recent) snapshot."""
         # Try to load current snapshot first
         content = self._load_snapshot_at_index(self.current_index)
         if content is not None:
+            self._last_text = content
             return content
         
         # If current snapshot failed, try to find the most recent valid snapshot
@@ -347,8 +1367,88 @@ class FileManager:
         # No valid snapshot found
         return ""
     
+    def iter_current_snapshot(self, chunk_size: int = LOAD_CHUNK_CHARS):
+        """Yield the current snapshot in chunks of at most chunk_size characters.
+        
+        Large plaintext keyframes are memory-mapped and decoded incrementally, so
+        the full text is never held in memory here. Delta and encrypted slots have
+        to be rebuilt in memory and are simply sliced. Unlike load_current_snapshot(),
+        the memory-mapped path does not cache the text; write_snapshot_edits()
+        rebuilds it on first use.
+        """
+        snapshot_path = self._get_snapshot_path(self.current_index)
+        mapped = None
+        if not self._is_encrypted and self.slots.get(self.current_index) is None:
+            try:
+                with open(snapshot_path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size > LAZY_LOAD_THRESHOLD_BYTES:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mapped = None
+        
+        if mapped is None or mapped[:len(DELTA_MAGIC)] == DELTA_MAGIC.encode():
+            if mapped is not None:
+                mapped.close()
+            text = self.load_current_snapshot()
+            for start in range(0, len(text), chunk_size):
+                yield text[start:start + chunk_size]
+            return
+        
+        # Same decoding as _read_slot_payload(): UTF-8, line endings kept as stored
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            # Roughly chunk_size characters per step (fewer for multi-byte text)
+            for offset in range(0, len(mapped), chunk_size):
+                chunk = decoder.decode(mapped[offset:offset + chunk_size])
+                if chunk:
+                    yield chunk
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+        finally:
+            mapped.close()
+    
     def _load_snapshot_at_index(self, index: int) -> Optional[str]:
-        """Load snapshot at specific index, handling encryption."""
+        """Rebuild the snapshot at a specific index by replaying deltas from its keyframe."""
+        deltas = []
+        cursor = index
+        
+        try:
+            while True:
+                payload = self._read_slot_payload(cursor)
+                if payload is None:
+                    return None
+                
+                # Older delta slots kept their base only in control.json
+                legacy = None
+                if not payload.startswith(DELTA_MAGIC) and self.slots.get(cursor) is not None:
+                    legacy = _parse_legacy_delta(payload)
+                
+                if payload.startswith(DELTA_MAGIC):
+                    delta = json.loads(payload[len(DELTA_MAGIC):])
+                elif legacy is not None:
+                    delta = dict(legacy, base=self.slots[cursor])
+                else:
+                    # A recorded base is not proof of a delta: a slot rebased to a keyframe
+                    # just before a crash can still have one in the last journal record
+                    text = payload
+                    break
+                
+                deltas.append(delta)
+                cursor = delta['base']
+                if len(deltas) >= self.max_buffers:
+                    # Cycle in the chain - slot files are inconsistent
+                    return None
+            
+            for delta in reversed(deltas):
+                text = apply_delta(text, delta['start'], delta['end'], delta['text'])
+        except (ValueError, KeyError, TypeError):
+            return None
+        
+        return text
+    
+    def _read_slot_payload(self, index: int) -> Optional[str]:
+        """Read a raw slot payload at a specific index, handling encryption."""
         snapshot_path = self._get_snapshot_path(index)
         
         if not snapshot_path.exists():
@@ -362,7 +1462,7 @@ class FileManager:
                 return self.encryption_manager.decrypt_data(encrypted_data, self._aes_key)
             else:
                 # Load as plaintext
-                with open(snapshot_path, 'r', encoding='utf-8') as f:
+                with open(snapshot_path, 'r', encoding='utf-8', newline='') as f:
                     return f.read()
         except (FileNotFoundError, UnicodeDecodeError, Exception):
             return None
@@ -370,6 +1470,8 @@ class FileManager:
     def load_snapshot(self, version_offset: int = 0) -> Optional[str]:
         """Load a snapshot at a specific version offset from current.
         
+        Delta slots are rebuilt by replaying diffs from the nearest keyframe.
+        
         Args:
             version_offset: 0 for current, -1 for previous, etc.
         """
@@ -379,15 +1481,9 @@ class FileManager:
     def get_first_line(self) -> str:
         """Get the first line of the current snapshot for preview."""
         if self._is_encrypted and not self._aes_key:
-            return "[Encrypted memento]"
+            return ENCRYPTED_PREVIEW
         
-        content = self.load_current_snapshot()
-        if not content:
-            return "[Empty memento]"
-        
-        lines = content.split('\n')
-        first_line = lines[0].strip()
-        return first_line if first_line else "[Untitled]"
+        return preview_line(self.load_current_snapshot())
     
     @staticmethod
     def create_new_memento() -> 'FileManager':
@@ -400,139 +1496,117 @@ class FileManager:
         return manager
     
     @staticmethod
-    def load_memento(memento_id: int) -> Optional['FileManager']:
-        """Load an existing memento by ID."""
+    def load_memento(memento_id: int, for_edit: bool = False) -> Optional['FileManager']:
+        """Load an existing memento by ID.
+        
+        Args:
+            for_edit: If True, the memento is being opened in the editor and an
+                interrupted passphrase change is finished or rolled back first
+        """
         memento_dir = get_memento_dir(memento_id)
         
         if not memento_dir.exists():
             return None
         
-        return FileManager(memento_id)
+        manager = FileManager(memento_id)
+        if for_edit:
+            manager.recover_rekey()
+        return manager
     
     @staticmethod
     def list_mementos(auto_migrate: bool = True) -> List[MementoInfo]:
         """List all existing mementos with metadata.
         
+        Costs one directory scan (through the listing index) and, with MongoDB
+        available, one aggregate query for the MongoDB side.
+        
         Args:
             auto_migrate: If True, automatically migrates local mementos to MongoDB when available
         """
         make_dirs_if_missing(MEMENTO_ROOT)
         mementos = []
         
-        # Auto-migrate local mementos to MongoDB if available
-        if auto_migrate and HAS_ENCRYPTION:
-            try:
-                from encryption import get_encryption_manager;
-                encryption_manager = get_encryption_manager( MEMENTO_ROOT );
-                
-                if encryption_manager.has_mongodb_support:
-                    # Check if there are any unmigrated local mementos
-                    has_local_unmigrated = False
-                    
-                    for item in MEMENTO_ROOT.iterdir():
-                        if item.is_dir() and item.name.isdigit():
-                            memento_id = int(item.name)
-                            
-                            # Check if exists in MongoDB
-                            collection = encryption_manager._get_mongo_collection();
-                            if collection is not None:
-                                existing = collection.find_one( {
-                                    'memento_id': memento_id,
-                                    'type': 'content'
-                                } );
-                            else:
-                                existing = None;
-                            
-                            if not existing:
-                                # Check if it's unencrypted (has .txt files)
-                                txt_files = list(item.glob('*.txt'))
-                                if txt_files:
-                                    has_local_unmigrated = True
-                                    break
+        # List local mementos from the persistent index
+        try:
+            mementos.extend(MementoIndex().refresh())
+        except sqlite3.Error as e:
+            logger.warning(f"Memento index unavailable, scanning directories: {e}")
+            for item in MEMENTO_ROOT.iterdir():
+                if item.is_dir() and item.name.isdigit():
+                    memento_id = int(item.name)
+                    manager = FileManager.load_memento(memento_id)
                     
-                    if has_local_unmigrated:
-                        import logging
-                        logger = logging.getLogger(__name__)
-                        logger.info("Found local mementos that can be migrated to MongoDB")
+                    if manager:
+                        first_line = manager.get_first_line()
+                        last_modified = datetime.fromtimestamp(manager.last_modified)
                         
-                        # Skip auto-migration prompts to prevent GUI hanging
-                        # User can manually trigger migration from the menu if needed
-                        logger.info("Local mementos found that could be migrated to MongoDB")
-                        logger.info("Auto-migration skipped to prevent GUI hanging - use menu option to migrate manually")
-                            
-            except Exception as e:
-                # Don't let migration errors break the listing
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error during auto-migration check: {e}")
-        
-        # List local mementos
-        for item in MEMENTO_ROOT.iterdir():
-            if item.is_dir() and item.name.isdigit():
-                memento_id = int(item.name)
-                manager = FileManager.load_memento(memento_id)
-                
-                if manager:
-                    first_line = manager.get_first_line()
-                    last_modified = datetime.fromtimestamp(manager.last_modified)
-                    
-                    mementos.append(MementoInfo(
-                        memento_id=memento_id,
-                        first_line=first_line,
-                        last_modified=last_modified
-                    ))
+                        mementos.append(MementoInfo(
+                            memento_id=memento_id,
+                            first_line=first_line,
+                            last_modified=last_modified,
+                            is_encrypted=manager.is_encrypted()
+                        ))
         
-        # Add MongoDB-only mementos if available
-        if HAS_ENCRYPTION:
-            try:
-                from encryption import get_encryption_manager;
-                encryption_manager = get_encryption_manager( MEMENTO_ROOT );
-                
-                if encryption_manager.has_mongodb_support:
-                    # Get all memento IDs from MongoDB
-                    mongodb_ids = set()
-                    local_ids = set(int(item.name) for item in MEMENTO_ROOT.iterdir() 
-                                  if item.is_dir() and item.name.isdigit())
-                    
-                    collection = encryption_manager._get_mongo_collection();
-                    if collection is not None:
-                        cursor = collection.find(
-                            { 'type': 'content' }, 
-                            { 'memento_id': 1, 'timestamp': 1 }
-                        );
-                    else:
-                        cursor = [];
-                    
-                    for doc in cursor:
-                        memento_id = doc['memento_id']
-                        mongodb_ids.add(memento_id)
-                        
-                        # If this memento exists only in MongoDB, create MementoInfo for it
-                        if memento_id not in local_ids:
-                            # Create a minimal manager to get first line
-                            temp_manager = FileManager(memento_id)
-                            first_line = temp_manager.get_first_line()  # Will show [Encrypted memento] without key
-                            
-                            # Use MongoDB timestamp
-                            timestamp = doc.get('timestamp', time.time())
-                            last_modified = datetime.fromtimestamp(timestamp)
-                            
-                            mementos.append(MementoInfo(
-                                memento_id=memento_id,
-                                first_line=first_line,
-                                last_modified=last_modified
-                            ))
-                            
-            except Exception as e:
-                # Don't let MongoDB errors break the listing
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"Error loading MongoDB mementos: {e}")
+        remote = FileManager._mongodb_timestamps()
+        if remote is not None:
+            # Auto-migrate local mementos to MongoDB if available
+            if auto_migrate and any(not m.is_encrypted and m.memento_id not in remote for m in mementos):
+                # Skip auto-migration prompts to prevent GUI hanging
+                # User can manually trigger migration from the menu if needed
+                logger.info("Local mementos found that could be migrated to MongoDB")
+                logger.info("Auto-migration skipped to prevent GUI hanging - use menu option to migrate manually")
+            
+            # Add MongoDB-only mementos
+            local_ids = set(m.memento_id for m in mementos)
+            mementos.extend(FileManager._mongodb_only(remote, local_ids))
         
         # Sort by last modified time, most recent first
         mementos.sort(key=lambda m: m.last_modified, reverse=True)
         return mementos
     
+    @staticmethod
+    def sync_mongodb_listing() -> bool:
+        """Record the current MongoDB-only mementos in the listing index (one aggregate query).
+        
+        Returns:
+            True if MongoDB was available and the index was updated
+        """
+        remote = FileManager._mongodb_timestamps()
+        if remote is None:
+            return False
+        MementoIndex().replace_remote(remote)
+        return True
+    
+    @staticmethod
+    def _mongodb_timestamps() -> Optional[Dict[int, float]]:
+        """Latest MongoDB content timestamp per memento_id, or None while MongoDB is unavailable."""
+        if not HAS_ENCRYPTION:
+            return None
+        try:
+            from encryption import get_encryption_manager;
+            encryption_manager = get_encryption_manager( MEMENTO_ROOT );
+            if encryption_manager is None or not encryption_manager.has_mongodb_support:
+                return None
+            return encryption_manager.latest_content_timestamps()
+        except Exception as e:
+            # Don't let MongoDB errors break the listing
+            logger.warning(f"Error loading MongoDB mementos: {e}")
+            return None
+    
+    @staticmethod
+    def _mongodb_only(remote: Dict[int, float], local_ids) -> List[MementoInfo]:
+        """MementoInfo for MongoDB mementos without a local directory (always encrypted)."""
+        return [
+            MementoInfo(
+                memento_id=memento_id,
+                first_line=ENCRYPTED_PREVIEW,
+                last_modified=datetime.fromtimestamp(timestamp),
+                is_encrypted=True
+            )
+            for memento_id, timestamp in remote.items()
+            if memento_id not in local_ids
+        ]
+    
     @staticmethod
     def import_text_file(file_path: str, passphrase: str = None) -> Optional['FileManager']:
         """Import a text file as a new memento.
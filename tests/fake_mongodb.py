@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+In-memory stand-in for the MongoDB mementos collection, shared by the MongoDB tests.
+
+Implements the subset of the pymongo Collection API the storage code uses: equality
+and $in filters, sorted/skipped cursors, unordered bulk inserts with per-document
+errors, head upserts (plain $set or the $cond pipeline) and index management.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import copy;
+import itertools;
+from types import SimpleNamespace;
+
+try:
+    from bson.objectid import ObjectId;
+    from pymongo.errors import BulkWriteError, DuplicateKeyError;
+    HAS_PYMONGO = True;
+except ImportError:
+    HAS_PYMONGO = False;
+
+DUPLICATE_KEY_ERROR = 11000;
+WRITE_FAILED_ERROR = 2;
+
+
+class FakeCursor:
+    """Result of FakeCollection.find(): supports sort(), skip() and iteration."""
+
+    def __init__( self, documents ):
+        self._documents = documents;
+
+    def sort( self, key, direction=1 ):
+        self._documents = _sorted( self._documents, [ ( key, direction ) ] );
+        return self;
+
+    def skip( self, count ):
+        self._documents = self._documents[ count: ];
+        return self;
+
+    def __iter__( self ):
+        return iter( self._documents );
+
+
+class FakeCollection:
+    """Holds documents in a list and records the order of every write.
+
+    Attributes:
+        documents: Stored documents, in insertion order
+        writes: ( operation, document type ) per written document, in order
+        head_updates: Operations passed to bulk_write()
+        fail_memento_ids: Documents of these mementos are rejected by insert_many()
+    """
+
+    def __init__( self ):
+        self.documents = [];
+        self.writes = [];
+        self.head_updates = [];
+        self.fail_memento_ids = set();
+        self.indexes = { '_id_': [ ( '_id', 1 ) ] };
+        self._ids = itertools.count( 1 );
+
+    # ----- writes -----
+
+    def _insert( self, document ):
+        """Store one document (assigning _id in place like pymongo) or raise on a duplicate _id."""
+        if '_id' not in document:
+            document[ '_id' ] = ObjectId() if HAS_PYMONGO else next( self._ids );
+        if any( stored[ '_id' ] == document[ '_id' ] for stored in self.documents ):
+            raise DuplicateKeyError( "duplicate key", DUPLICATE_KEY_ERROR );
+        self.documents.append( copy.copy( document ) );
+        self.writes.append( ( 'insert', document.get( 'type' ) ) );
+
+    def insert_one( self, document ):
+        self._insert( document );
+        return SimpleNamespace( inserted_id=document[ '_id' ] );
+
+    def insert_many( self, documents, ordered=True ):
+        errors = [];
+        for index, document in enumerate( documents ):
+            if document.get( 'memento_id' ) in self.fail_memento_ids:
+                errors.append( { 'index': index, 'code': WRITE_FAILED_ERROR, 'errmsg': "write failed" } );
+            else:
+                try:
+                    self._insert( document );
+                except DuplicateKeyError:
+                    errors.append( { 'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': "duplicate key" } );
+            if errors and ordered:
+                break;
+        if errors:
+            raise BulkWriteError( { 'writeErrors': errors, 'nInserted': len( documents ) - len( errors ) } );
+        return SimpleNamespace( inserted_ids=[ document[ '_id' ] for document in documents ] );
+
+    def update_one( self, query, update, upsert=False ):
+        document = self.find_one( query );
+        if document is None:
+            if not upsert:
+                return SimpleNamespace( matched_count=0 );
+            document = { key: value for key, value in query.items() if not isinstance( value, dict ) };
+            self._insert( document );
+            document = self.documents[ -1 ];
+        if isinstance( update, list ):
+            for stage in update:
+                values = { key: _evaluate( expression, document ) for key, expression in stage[ '$set' ].items() };
+                document.update( values );
+        else:
+            document.update( update.get( '$set', {} ) );
+        self.writes.append( ( 'update', document.get( 'type' ) ) );
+        return SimpleNamespace( matched_count=1 );
+
+    def bulk_write( self, operations, ordered=True ):
+        self.head_updates.extend( operations );
+        for operation in operations:
+            self.update_one( operation._filter, operation._doc, upsert=operation._upsert );
+
+    def delete_many( self, query ):
+        kept = [ document for document in self.documents if not _matches( document, query ) ];
+        deleted = len( self.documents ) - len( kept );
+        self.documents = kept;
+        return SimpleNamespace( deleted_count=deleted );
+
+    # ----- reads -----
+
+    def find( self, query=None, projection=None ):
+        return FakeCursor( [ document for document in self.documents if _matches( document, query or {} ) ] );
+
+    def find_one( self, query=None, projection=None, sort=None ):
+        matches = [ document for document in self.documents if _matches( document, query or {} ) ];
+        if sort:
+            matches = _sorted( matches, sort );
+        return matches[ 0 ] if matches else None;
+
+    def distinct( self, field, query=None ):
+        values = [];
+        for document in self.find( query ):
+            if field in document and document[ field ] not in values:
+                values.append( document[ field ] );
+        return values;
+
+    def aggregate( self, pipeline ):
+        """Run $match, $sort and $group stages ($group with $first accumulators only)."""
+        documents = list( self.documents );
+        for stage in pipeline:
+            if '$match' in stage:
+                documents = [ document for document in documents if _matches( document, stage[ '$match' ] ) ];
+            elif '$sort' in stage:
+                documents = _sorted( documents, list( stage[ '$sort' ].items() ) );
+            elif '$group' in stage:
+                group = stage[ '$group' ];
+                groups = {};
+                for document in documents:
+                    key = _evaluate( group[ '_id' ], document );
+                    if key not in groups:
+                        groups[ key ] = { '_id': key };
+                        for field, accumulator in group.items():
+                            if field != '_id':
+                                groups[ key ][ field ] = _evaluate( accumulator[ '$first' ], document );
+                documents = list( groups.values() );
+        return iter( documents );
+
+    # ----- indexes -----
+
+    def create_index( self, keys, name=None ):
+        self.indexes.setdefault( name, list( keys ) );
+        return name;
+
+    def index_information( self ):
+        return { name: { 'key': list( keys ) } for name, keys in self.indexes.items() };
+
+    def drop_index( self, name ):
+        del self.indexes[ name ];
+
+
+def _matches( document, query ):
+    """Equality and $in filters on top-level fields."""
+    for field, condition in query.items():
+        value = document.get( field );
+        if isinstance( condition, dict ) and '$in' in condition:
+            if value not in condition[ '$in' ]:
+                return False;
+        elif value != condition:
+            return False;
+    return True;
+
+
+def _sorted( documents, keys ):
+    """Sort by ( field, direction ) pairs, most significant first."""
+    for field, direction in reversed( keys ):
+        documents = sorted( documents, key=lambda document: document.get( field ), reverse=direction < 0 );
+    return documents;
+
+
+def _evaluate( expression, document ):
+    """Evaluate the aggregation expressions the head update uses: $field, $cond, $gt and $ifNull."""
+    if isinstance( expression, str ) and expression.startswith( '$' ):
+        return document.get( expression[ 1: ] );
+    if isinstance( expression, dict ) and len( expression ) == 1:
+        operator, arguments = next( iter( expression.items() ) );
+        if operator == '$cond':
+            condition, then, otherwise = arguments;
+            return _evaluate( then if _evaluate( condition, document ) else otherwise, document );
+        if operator == '$gt':
+            return _evaluate( arguments[ 0 ], document ) > _evaluate( arguments[ 1 ], document );
+        if operator == '$ifNull':
+            value = _evaluate( arguments[ 0 ], document );
+            return _evaluate( arguments[ 1 ], document ) if value is None else value;
+    return expression;
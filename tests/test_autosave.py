@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the background snapshot writer in autosave.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import sys;
+import time;
+import threading;
+import unittest;
+from pathlib import Path;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+from autosave import SnapshotWriter;
+
+
+class TestSnapshotWriter( unittest.TestCase ):
+    """Write-behind queue behaviour."""
+
+    def test_pending_saves_collapse_to_latest( self ):
+        """Saves submitted while a write is in progress collapse into the newest text."""
+        release = threading.Event();
+        written = [];
+
+        def slow_write( text, version ):
+            release.wait( 2.0 );
+            written.append( text );
+
+        writer = SnapshotWriter( slow_write );
+        writer.start();
+        writer.submit( "first" );
+        time.sleep( 0.05 );  # Let the writer pick up "first"
+        for i in range( 5 ):
+            writer.submit( f"pending {i}" );
+        release.set();
+
+        self.assertTrue( writer.flush( timeout=2.0 ) );
+        writer.stop();
+        self.assertEqual( written, [ "first", "pending 4" ] );
+
+    def test_state_callbacks_and_failures( self ):
+        """Listeners see queued, writing and durable states, and failures are reported."""
+        states = [];
+
+        def failing_write( text, version ):
+            if text == "bad":
+                raise IOError( "disk full" );
+
+        writer = SnapshotWriter( failing_write, lambda state, error: states.append( state ) );
+        writer.start();
+        writer.submit( "good" );
+        writer.flush();
+        writer.submit( "bad" );
+        writer.stop();
+
+        self.assertEqual( states, [
+            SnapshotWriter.QUEUED, SnapshotWriter.WRITING, SnapshotWriter.DURABLE,
+            SnapshotWriter.QUEUED, SnapshotWriter.WRITING, SnapshotWriter.FAILED,
+        ] );
+
+    def test_flush_waits_for_idle_maintenance( self ):
+        """flush() does not return between the durable report and the idle pass that follows it."""
+        events = [];
+
+        def on_state( state, error ):
+            if state == SnapshotWriter.DURABLE:
+                time.sleep( 0.05 );  # Widen the window between the write and the idle pass
+
+        def idle():
+            events.append( "idle started" );
+            time.sleep( 0.05 );
+            events.append( "idle done" );
+
+        writer = SnapshotWriter( lambda text, version: None, on_state, idle_func=idle );
+        writer.start();
+        writer.submit( "text" );
+        time.sleep( 0.01 );  # Let the writer finish the write itself
+        self.assertTrue( writer.flush( timeout=2.0 ) );
+        events.append( "flushed" );
+        writer.stop();
+
+        self.assertEqual( events, [ "idle started", "idle done", "flushed" ] );
+
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming chunked AEAD format in encryption.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import io;
+import os;
+import sys;
+import unittest;
+from pathlib import Path;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+from encryption import (
+    EncryptionManager, AEAD_HEADER, AEAD_HEADER_V1, AEAD_MAGIC, AEAD_FRAME_LENGTH,
+    ARCHIVE_COMPRESSION, CODEC_BROTLI, HAS_CRYPTO, HAS_BROTLI,
+);
+
+
+@unittest.skipUnless( HAS_CRYPTO and HAS_BROTLI, "Encryption libraries not available" )
+class TestStreamingFormat( unittest.TestCase ):
+    """Chunked AEAD encryption, random access and tamper detection."""
+
+    def setUp( self ):
+        """Create a manager, a key and a text spanning several chunks."""
+        self.manager = EncryptionManager( Path( '/tmp' ) );
+        self.key = os.urandom( 32 );
+        self.text = "".join( f"line {i} ✓ {os.urandom( 4 ).hex()}\n" for i in range( 500 ) );
+
+    def _frames( self, data ):
+        """Split chunked-format data into header and sealed chunks."""
+        stream = io.BytesIO( data );
+        return stream.read( AEAD_HEADER.size ), list( self.manager._read_frames( stream ) );
+
+    def test_round_trip_and_random_access( self ):
+        """Streams decrypt whole, chunk by chunk, and any single chunk can be read directly."""
+        data = b"".join( self.manager.encrypt_stream( self.text, self.key, chunk_chars=1000 ) );
+        header, chunks = self._frames( data );
+
+        self.assertGreater( len( chunks ), 5 );
+        self.assertTrue( self.manager.is_encrypted_data( data ) );
+        self.assertEqual( self.manager.decrypt_data( data, self.key ), self.text );
+        self.assertEqual( self.manager.decrypt_chunk( data, self.key, 3 ), self.text[ 3000:4000 ] );
+        self.assertEqual( self.manager.decrypt_chunk( data, self.key, len( chunks ) - 1 ),
+                          self.text[ ( len( chunks ) - 1 ) * 1000: ] );
+        self.assertEqual( self.manager.decrypt_data( self.manager.encrypt_data( "", self.key ), self.key ), "" );
+
+    def test_reordered_or_truncated_chunks_fail( self ):
+        """Chunks are bound to their position, their stream and the end of the stream."""
+        data = b"".join( self.manager.encrypt_stream( self.text, self.key, chunk_chars=1000 ) );
+        header, chunks = self._frames( data );
+
+        with self.assertRaises( Exception ):
+            list( self.manager.open_chunks( header, chunks[ :-1 ], self.key ) );
+        with self.assertRaises( Exception ):
+            list( self.manager.open_chunks( header, [ chunks[ 1 ], chunks[ 0 ] ] + chunks[ 2: ], self.key ) );
+
+        other_header, other_chunks = self._frames(
+            b"".join( self.manager.encrypt_stream( self.text, self.key, chunk_chars=1000 ) ) );
+        with self.assertRaises( Exception ):
+            list( self.manager.open_chunks( header, [ other_chunks[ 0 ] ] + chunks[ 1: ], self.key ) );
+
+    def test_compression_is_recorded_per_stream( self ):
+        """Each stream records its codec and level; version 1 headers without a level still decrypt."""
+        hot = self.manager.choose_compression( len( self.text ), hot=True );
+        for codec, level in ( hot, ARCHIVE_COMPRESSION ):
+            data = self.manager.encrypt_data( self.text, self.key, codec, level );
+            self.assertEqual( self.manager.stream_compression( data ), ( codec, level ) );
+            self.assertEqual( self.manager.decrypt_data( data, self.key ), self.text );
+
+        header = AEAD_HEADER_V1.pack( AEAD_MAGIC, 1, CODEC_BROTLI, 1000, os.urandom( 16 ) );
+        frames = [ AEAD_FRAME_LENGTH.pack( len( blob ) ) + blob
+                   for blob in self.manager.seal_chunks( self.text, self.key, header ) ];
+        data = header + b"".join( frames );
+        self.assertIsNone( self.manager.stream_compression( data ) );
+        self.assertEqual( self.manager.decrypt_data( data, self.key ), self.text );
+        self.assertEqual( self.manager.decrypt_chunk( data, self.key, 2 ), self.text[ 2000:3000 ] );
+
+    def test_reencrypt_keeps_chunks_and_compression( self ):
+        """Re-keying reseals every chunk under a new stream without touching the compressed text."""
+        new_key = os.urandom( 32 );
+        data = self.manager.encrypt_data( self.text, self.key, *ARCHIVE_COMPRESSION );
+        rekeyed = self.manager.reencrypt_data( data, self.key, new_key );
+
+        self.assertEqual( self.manager.decrypt_data( rekeyed, new_key ), self.text );
+        self.assertEqual( self.manager.stream_compression( rekeyed ), ARCHIVE_COMPRESSION );
+        self.assertNotEqual( rekeyed[ :AEAD_HEADER.size ], data[ :AEAD_HEADER.size ] );
+        self.assertTrue( self.manager.check_key( rekeyed, new_key ) );
+        self.assertFalse( self.manager.check_key( rekeyed, self.key ) );
+        with self.assertRaises( Exception ):
+            self.manager.reencrypt_data( data, new_key, self.key );
+
+    def test_legacy_single_message_still_decrypts( self ):
+        """Data written before the chunked format (nonce + whole-text ciphertext) still loads."""
+        import brotli;
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM;
+
+        nonce = os.urandom( 12 );
+        legacy = nonce + AESGCM( self.key ).encrypt( nonce, brotli.compress( self.text.encode( 'utf-8' ) ), None );
+        self.assertEqual( self.manager.decrypt_data( legacy, self.key ), self.text );
+
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tests for key derivation caching and key management in encryption.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import os;
+import sys;
+import json;
+import tempfile;
+import time;
+import threading;
+import unittest;
+from pathlib import Path;
+from unittest.mock import patch;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+import encryption;
+from encryption import (
+    DerivedKeyCache, EncryptionManager, HAS_CRYPTO, KDF_PBKDF2, KDF_SCRYPT, KDF_MIN_PARAMS,
+    KDF_CALIBRATION_FILE,
+);
+
+
+class TestDerivedKeyCache( unittest.TestCase ):
+    """Process-wide derived key cache behaviour."""
+
+    def setUp( self ):
+        """Create a fresh cache for each test."""
+        self.cache = DerivedKeyCache( ttl_seconds=60 );
+        self.salt = b'7'.ljust( 32, b'\0' );
+
+    def test_lookup_is_keyed_by_memento_salt_and_passphrase( self ):
+        """Only the exact (memento, salt, passphrase) combination hits."""
+        self.cache.put( 7, self.salt, "secret", b'k' * 32 );
+
+        self.assertEqual( self.cache.get( 7, self.salt, "secret" ), b'k' * 32 );
+        self.assertIsNone( self.cache.get( 7, self.salt, "other" ) );
+        self.assertIsNone( self.cache.get( 8, self.salt, "secret" ) );
+        self.assertIsNone( self.cache.get( 7, b'x' * 32, "secret" ) );
+
+    def test_expiry_and_clear_zero_key_material( self ):
+        """Expired and cleared entries are overwritten with zeros."""
+        self.cache.put( 7, self.salt, "secret", b'k' * 32 );
+        self.cache.put( 9, self.salt, "secret", b'j' * 32 );
+        entries = { key[ 0 ]: value[ 0 ] for key, value in self.cache._entries.items() };
+
+        self.cache.clear( 7 );
+        self.assertEqual( bytes( entries[ 7 ] ), bytes( 32 ) );
+        self.assertIsNone( self.cache.get( 7, self.salt, "secret" ) );
+
+        with patch( 'encryption.time.time', return_value=10 ** 12 ):
+            self.assertIsNone( self.cache.get( 9, self.salt, "secret" ) );
+        self.assertEqual( bytes( entries[ 9 ] ), bytes( 32 ) );
+
+    def test_idle_entries_are_swept_after_ttl( self ):
+        """An entry nobody looks up again is zeroed by the next put() and by the expiry timer."""
+        self.cache.put( 7, self.salt, "secret", b'k' * 32 );
+        idle = self.cache._entries[ next( iter( self.cache._entries ) ) ][ 0 ];
+        with patch( 'encryption.time.time', return_value=10 ** 12 ):
+            self.cache.put( 9, self.salt, "secret", b'j' * 32 );
+        self.assertEqual( bytes( idle ), bytes( 32 ) );
+        self.assertEqual( [ key[ 0 ] for key in self.cache._entries ], [ 9 ] );
+        self.cache.clear();
+
+        cache = DerivedKeyCache( ttl_seconds=0.05 );
+        cache.put( 7, self.salt, "secret", b'k' * 32 );
+        idle = next( iter( cache._entries.values() ) )[ 0 ];
+        deadline = time.time() + 5;
+        while cache._entries and time.time() < deadline:
+            time.sleep( 0.05 );
+        self.assertFalse( cache._entries );
+        self.assertEqual( bytes( idle ), bytes( 32 ) );
+        self.assertIsNone( cache._timer );
+
+    def test_get_aes_key_derives_once( self ):
+        """EncryptionManager.get_aes_key only runs the KDF on a cache miss."""
+        manager = EncryptionManager( Path( '/tmp' ) );
+        with patch( 'encryption._key_cache', self.cache ), \
+             patch.object( EncryptionManager, 'derive_aes_key', return_value=b'd' * 32 ) as derive:
+            first = manager.get_aes_key( 7, "secret", self.salt );
+            second = manager.get_aes_key( 7, "secret", self.salt );
+
+        self.assertEqual( first, second );
+        self.assertEqual( derive.call_count, 1 );
+
+    def test_kdf_parameters_are_part_of_the_cache_key( self ):
+        """A key derived with other KDF parameters is never returned."""
+        params = { 'name': KDF_PBKDF2, 'iterations': 200000 };
+        self.cache.put( 7, self.salt, "secret", b'k' * 32, params );
+
+        self.assertEqual( self.cache.get( 7, self.salt, "secret", dict( params ) ), b'k' * 32 );
+        self.assertIsNone( self.cache.get( 7, self.salt, "secret" ) );
+        self.assertIsNone( self.cache.get( 7, self.salt, "secret", dict( params, iterations=300000 ) ) );
+
+
+@unittest.skipUnless( HAS_CRYPTO, "Cryptography library not available" )
+class TestKdfCalibration( unittest.TestCase ):
+    """Per-machine KDF calibration."""
+
+    def setUp( self ):
+        """Create a manager."""
+        self.manager = EncryptionManager( Path( '/tmp' ) );
+
+    def test_linear_cost_scales_to_target( self ):
+        """PBKDF2 iterations scale with the measured time and never drop below the floor."""
+        with patch.object( EncryptionManager, 'time_kdf', return_value=0.01 ):
+            params = self.manager.calibrate_kdf( KDF_PBKDF2, target_seconds=0.05 );
+            floor = self.manager.calibrate_kdf( KDF_PBKDF2, target_seconds=0.001 );
+
+        self.assertEqual( params[ 'iterations' ], KDF_MIN_PARAMS[ KDF_PBKDF2 ][ 'iterations' ] * 5 );
+        self.assertEqual( floor, KDF_MIN_PARAMS[ KDF_PBKDF2 ] );
+
+    def test_scrypt_cost_doubles_up_to_target( self ):
+        """scrypt n stays a power of two and stops before overshooting the target."""
+        base = KDF_MIN_PARAMS[ KDF_SCRYPT ][ 'n' ];
+        with patch.object( EncryptionManager, 'time_kdf', side_effect=lambda params: 0.01 * params[ 'n' ] / base ):
+            params = self.manager.calibrate_kdf( KDF_SCRYPT, target_seconds=0.05 );
+        self.assertEqual( params[ 'n' ], base * 4 );
+
+    def test_unknown_configured_kdf_falls_back( self ):
+        """A MEMENTO_KDF that is misspelt or not installed is replaced by an available KDF."""
+        with patch.dict( os.environ, { 'MEMENTO_KDF': 'argon3' } ), self.assertLogs( 'encryption', 'WARNING' ):
+            name = encryption._configured_kdf();
+        self.assertIn( name, encryption.available_kdfs() );
+        with patch.dict( os.environ, { 'MEMENTO_KDF': KDF_PBKDF2 } ):
+            self.assertEqual( encryption._configured_kdf(), KDF_PBKDF2 );
+
+    def test_concurrent_callers_calibrate_once( self ):
+        """Threads asking for the defaults at once share one calibration and one complete file."""
+        calls = [];
+
+        def calibrate( name, target_seconds ):
+            calls.append( name );
+            threading.Event().wait( 0.05 );
+            return dict( KDF_MIN_PARAMS[ KDF_PBKDF2 ], name=name );
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = EncryptionManager( Path( tmp ) );
+            with patch.object( EncryptionManager, 'calibrate_kdf', side_effect=calibrate ):
+                threads = [ threading.Thread( target=manager.default_kdf_params ) for _ in range( 4 ) ];
+                for thread in threads:
+                    thread.start();
+                for thread in threads:
+                    thread.join();
+            with open( Path( tmp ) / KDF_CALIBRATION_FILE ) as f:
+                saved = json.load( f );
+            leftovers = [ name for name in os.listdir( tmp ) if name.endswith( '.tmp' ) ];
+
+        self.assertEqual( len( calls ), 1 );
+        self.assertEqual( len( saved ), 1 );
+        self.assertEqual( leftovers, [] );
+
+    def test_every_available_kdf_derives_deterministically( self ):
+        """Each KDF at its floor parameters derives the same 32-byte key for the same inputs."""
+        salt = b's' * 16;
+        for name in self.manager.available_kdfs():
+            params = KDF_MIN_PARAMS[ name ];
+            key = self.manager.derive_aes_key( "secret", salt, params );
+            self.assertEqual( len( key ), 32 );
+            self.assertEqual( key, self.manager.derive_aes_key( "secret", salt, params ) );
+            self.assertNotEqual( key, self.manager.derive_aes_key( "other", salt, params ) );
+
+
+if __name__ == '__main__':
+    unittest.main();
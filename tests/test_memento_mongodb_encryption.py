@@ -229,19 +229,11 @@ class TestMementoMongoDBEncryption( unittest.TestCase ):
             correct_content = test_manager.load_current_snapshot();
             self.assertEqual( correct_content, self.short_text, "Content should match after correct decryption" );
             
-            # Try with wrong passphrase - should get different/empty content
-            test_manager._prepare_aes_key( self.wrong_passphrase );
-            wrong_content = test_manager.load_current_snapshot();
-            
-            # Wrong passphrase should either fail verification or produce different content
-            wrong_result = test_manager.verify_passphrase( self.wrong_passphrase );
-            if wrong_result:  # If verification passed (current behavior)
-                # Then content should be different (empty or corrupted)
-                self.assertNotEqual( wrong_content, self.short_text, "Wrong passphrase should not decrypt to correct content" );
-                print( f"Wrong passphrase produced content: '{wrong_content}' (expected: different from original)" );
-            else:
-                # This would be the ideal behavior
-                self.assertFalse( wrong_result, "Wrong passphrase should fail verification" );
+            # Try with wrong passphrase - the wrapped data key cannot be unwrapped
+            with self.assertRaises( Exception ):
+                test_manager._prepare_aes_key( self.wrong_passphrase );
+            self.assertFalse( test_manager.verify_passphrase( self.wrong_passphrase ), "Wrong passphrase should fail verification" );
+            self.assertEqual( test_manager.load_current_snapshot(), self.short_text, "A failed unwrap must keep the current key" );
         else:
             self.skipTest( "Memento encryption setup failed" );
 
@@ -265,6 +257,20 @@ class TestMementoMongoDBEncryption( unittest.TestCase ):
         # Clean up
         self.encryption_manager.mongo_collection.delete_one( { '_id': result.inserted_id } );
 
+    def test_chunked_content_round_trip( self ):
+        """Large content is stored chunk by chunk and loads back intact."""
+        if not self.encryption_manager.has_encryption_support:
+            self.skipTest( "Encryption libraries not available" );
+        
+        aes_key = os.urandom( 32 );
+        text = "".join( f"line {i} ✓ {os.urandom( 8 ).hex()}\n" for i in range( 2000 ) );
+        
+        with patch( 'encryption.CHUNKED_CONTENT_THRESHOLD_CHARS', 1000 ), \
+             patch( 'encryption.AEAD_CHUNK_CHARS', 1500 ), \
+             patch.object( EncryptionManager, '_get_mongo_collection', return_value=None ):
+            self.encryption_manager.save_encrypted_content( 301, text, aes_key );
+            self.assertEqual( self.encryption_manager.load_encrypted_content( 301, aes_key ), text );
+
     def test_nonexistent_memento_retrieval( self ):
         """Test retrieval of nonexistent memento returns None/empty."""
         nonexistent_id = 999999;
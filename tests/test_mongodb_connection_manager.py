@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared MongoDB connection manager in mongodb_connection_manager.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import os;
+import sys;
+import json;
+import tempfile;
+import threading;
+import unittest;
+from pathlib import Path;
+from types import SimpleNamespace;
+from unittest.mock import patch;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+from mongodb_connection_manager import MongoDBConnectionManager, HAS_PYMONGO, load_client_options;
+from mongodb_metrics import MongoDBMetrics;
+from fake_mongodb import FakeCollection;
+
+
+class TestClientOptions( unittest.TestCase ):
+    """Client settings from defaults, config file and environment."""
+
+    def test_environment_overrides_config_file_overrides_defaults( self ):
+        """Each layer wins over the one before; invalid values are ignored."""
+        with tempfile.TemporaryDirectory() as tmp:
+            config_file = Path( tmp ) / "mongodb.json";
+            config_file.write_text( json.dumps( {
+                'maxPoolSize': 50, 'socketTimeoutMS': 'soon', 'readPreference': 'secondaryPreferred',
+            } ) );
+            environment = { 'MEMENTO_MONGO_MAX_POOL_SIZE': '5', 'MEMENTO_MONGO_COMPRESSORS': 'snappy' };
+            with patch.dict( os.environ, environment ):
+                options = load_client_options( config_file );
+
+        self.assertEqual( options[ 'maxPoolSize' ], 5 );
+        self.assertEqual( options[ 'socketTimeoutMS' ], 60000 );
+        self.assertEqual( options[ 'readPreference' ], 'secondaryPreferred' );
+        self.assertEqual( options[ 'compressors' ], 'snappy' );
+        self.assertEqual( options[ 'minPoolSize' ], 0 );
+
+    def test_default_compressors_are_installed_ones( self ):
+        """Without configuration the client offers zlib (always available) last."""
+        with patch.dict( os.environ, {}, clear=True ):
+            options = load_client_options( Path( '/nonexistent/mongodb.json' ) );
+        self.assertTrue( options[ 'compressors' ].endswith( 'zlib' ) );
+
+
+class TestMetrics( unittest.TestCase ):
+    """Aggregation of monitoring events."""
+
+    def test_snapshot_aggregates_latencies_and_reconnects( self ):
+        """Command latencies are kept per command; reconnects exclude the first connect."""
+        metrics = MongoDBMetrics();
+        metrics.command_finished( 'find', 2000 );
+        metrics.command_finished( 'find', 4000 );
+        metrics.command_finished( 'insert', 1000, failed=True );
+        metrics.checkout_started();
+        metrics.checkout_finished();
+        for available in ( True, False, True ):
+            metrics.availability_changed( available );
+
+        data = metrics.snapshot();
+        self.assertEqual( data[ 'commands' ][ 'find' ], { 'count': 2, 'failures': 0, 'avg_ms': 3.0, 'max_ms': 4.0 } );
+        self.assertEqual( data[ 'commands' ][ 'insert' ][ 'failures' ], 1 );
+        self.assertEqual( data[ 'pool' ][ 'checkouts' ][ 'count' ], 1 );
+        self.assertEqual( ( data[ 'connects' ], data[ 'reconnects' ], data[ 'disconnects' ] ), ( 2, 1, 1 ) );
+        self.assertIn( "3 operations (1 failed", metrics.summary() );
+
+
+class TestConnectionState( unittest.TestCase ):
+    """Connection state comes from topology events, not from callers."""
+
+    def setUp( self ):
+        """Start from a disconnected state with one listener."""
+        self.states = [];
+        MongoDBConnectionManager._connected_event.clear();
+        MongoDBConnectionManager.add_state_listener( self.states.append );
+
+    def tearDown( self ):
+        """Remove the listener and reset the state."""
+        MongoDBConnectionManager.remove_state_listener( self.states.append );
+        MongoDBConnectionManager._connected_event.clear();
+
+    def test_listeners_see_transitions_of_the_current_client_only( self ):
+        """Listeners are told about changes once, and events of replaced clients are ignored."""
+        generation = MongoDBConnectionManager._generation;
+        MongoDBConnectionManager._set_available( True, generation );
+        MongoDBConnectionManager._set_available( True, generation );
+        MongoDBConnectionManager._set_available( False, generation - 1 );
+        self.assertTrue( MongoDBConnectionManager.wait_for_connection( 0 ) );
+
+        MongoDBConnectionManager._set_available( False, generation );
+        self.assertFalse( MongoDBConnectionManager.wait_for_connection( 0 ) );
+        self.assertEqual( self.states, [ True, False ] );
+
+    @unittest.skipUnless( HAS_PYMONGO, "pymongo not available" )
+    def test_getters_do_not_wait_while_unavailable( self ):
+        """With a client whose servers are down, getters return None without taking the lock."""
+        with patch.object( MongoDBConnectionManager, '_instance', object() ), \
+             patch.object( MongoDBConnectionManager, '_client', object() ), \
+             patch.object( MongoDBConnectionManager, '_db', { 'mementos': 'collection' } ), \
+             patch.object( MongoDBConnectionManager, '_connection_lock' ) as lock:
+            self.assertIsNone( MongoDBConnectionManager.get_collection() );
+            MongoDBConnectionManager._set_available( True );
+            self.assertEqual( MongoDBConnectionManager.get_collection(), 'collection' );
+        lock.__enter__.assert_not_called();
+
+
+class TestIndexes( unittest.TestCase ):
+    """_ensure_indexes() leaves the mementos collection with exactly the indexes queries use."""
+
+    def ensure( self, collection ) -> bool:
+        with patch.object( MongoDBConnectionManager, '_db', SimpleNamespace( mementos=collection ) ):
+            return MongoDBConnectionManager._ensure_indexes();
+
+    def test_new_deployment_gets_the_index_set( self ):
+        """A fresh collection ends with _id plus MEMENTO_INDEXES."""
+        collection = FakeCollection();
+        self.assertTrue( self.ensure( collection ) );
+        expected = dict( MongoDBConnectionManager.MEMENTO_INDEXES, _id_=[ ( '_id', 1 ) ] );
+        self.assertEqual( collection.indexes, expected );
+
+    def test_existing_deployment_drops_retired_indexes( self ):
+        """memento_type_timestamp from earlier versions is dropped; running again changes nothing."""
+        collection = FakeCollection();
+        collection.create_index( [ ( 'memento_id', 1 ), ( 'type', 1 ), ( 'timestamp', -1 ) ], name='memento_type_timestamp' );
+        collection.create_index( [ ( 'type', 1 ), ( 'memento_id', 1 ), ( 'timestamp', -1 ) ], name='type_memento_timestamp' );
+
+        self.assertTrue( self.ensure( collection ) );
+        self.assertEqual( set( collection.indexes ), { '_id_', 'type_memento_timestamp', 'content_chunks' } );
+        self.assertNotIn( 'memento_type_timestamp', collection.indexes );
+        self.assertTrue( self.ensure( collection ) );
+        self.assertEqual( set( collection.indexes ), { '_id_', 'type_memento_timestamp', 'content_chunks' } );
+
+    def test_index_with_unexpected_keys_fails_verification( self ):
+        """An index of the right name but different keys is reported, not silently accepted."""
+        collection = FakeCollection();
+        collection.create_index( [ ( 'content_id', 1 ) ], name='content_chunks' );
+        self.assertFalse( self.ensure( collection ) );
+
+
+@unittest.skipUnless( HAS_PYMONGO, "pymongo not available" )
+class TestBackgroundInit( unittest.TestCase ):
+    """init_async() never makes callers wait for the connection."""
+
+    def tearDown( self ):
+        """Forget the background attempt."""
+        MongoDBConnectionManager._ready_event = None;
+
+    def test_callers_fall_back_while_connecting( self ):
+        """While the attempt runs, lookups return at once; on_ready sees the result afterwards."""
+        release = threading.Event();
+        results = [];
+
+        def slow_init( uri, database_name ):
+            release.wait( 2.0 );
+            return True;
+
+        with patch.object( MongoDBConnectionManager, 'init', side_effect=slow_init ), \
+             patch.object( MongoDBConnectionManager, '_instance', object() ):
+            self.assertTrue( MongoDBConnectionManager.init_async( "mongodb://unreachable", on_ready=results.append ) );
+            self.assertTrue( MongoDBConnectionManager.is_initializing() );
+            self.assertIsNone( MongoDBConnectionManager.get_collection() );
+            self.assertFalse( MongoDBConnectionManager.is_connected() );
+            self.assertFalse( MongoDBConnectionManager.wait_until_ready( 0.01 ) );
+
+            release.set();
+            self.assertTrue( MongoDBConnectionManager.wait_until_ready( 2.0 ) );
+            self.assertFalse( MongoDBConnectionManager.is_initializing() );
+
+        for _ in range( 100 ):
+            if results:
+                break;
+            threading.Event().wait( 0.01 );
+        self.assertEqual( results, [ True ] );
+
+
+if __name__ == '__main__':
+    unittest.main();
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tests for MongoDB content in encryption.py: head lookups, retention pruning, the
+background retention job and local-to-MongoDB migration, against the in-memory
+collection in fake_mongodb.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import os;
+import sys;
+import shutil;
+import tempfile;
+import threading;
+import unittest;
+from pathlib import Path;
+from unittest.mock import patch, PropertyMock;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+from storage import FileManager;
+from encryption import EncryptionManager, HAS_CRYPTO, HAS_PYMONGO;
+from fake_mongodb import FakeCollection;
+
+
+@unittest.skipUnless( HAS_CRYPTO, "cryptography not available" )
+class TestContentHistory( unittest.TestCase ):
+    """Content documents, heads and retention."""
+
+    def setUp( self ):
+        """Point an EncryptionManager at an in-memory collection."""
+        self.root = Path( tempfile.mkdtemp( prefix='memento_content_' ) );
+        self.collection = FakeCollection();
+        self.manager = EncryptionManager( self.root );
+        self.key = os.urandom( 32 );
+        patcher = patch.object( EncryptionManager, '_get_mongo_collection', lambda manager, name="mementos": self.collection );
+        patcher.start();
+        self.addCleanup( patcher.stop );
+
+    def tearDown( self ):
+        """Stop the retention job and remove the temporary root."""
+        self.manager.stop_retention_job();
+        shutil.rmtree( self.root );
+
+    def add_versions( self, memento_id: int, count: int ) -> list:
+        """Insert count content documents with increasing timestamps; returns their ids, oldest first."""
+        documents = [ {
+            'memento_id': memento_id,
+            'type': 'content',
+            'timestamp': 1000.0 + version,
+            'data': self.manager.encrypt_data( f"memento {memento_id} version {version}", self.key ),
+        } for version in range( count ) ];
+        self.collection.insert_many( documents );
+        return [ document[ '_id' ] for document in documents ];
+
+    def set_head( self, memento_id: int, content_id ):
+        self.collection.update_one(
+            { 'memento_id': memento_id, 'type': 'head' }, { '$set': { 'content_id': content_id } }, upsert=True
+        );
+
+    def content_ids( self, memento_id: int ) -> list:
+        return [ doc[ '_id' ] for doc in self.collection.find( { 'memento_id': memento_id, 'type': 'content' } ) ];
+
+    def test_prune_keeps_newest_versions_of_each_memento( self ):
+        """Only versions beyond the newest `keep` are deleted, per memento."""
+        seven = self.add_versions( 7, 5 );
+        eight = self.add_versions( 8, 2 );
+        self.set_head( 7, seven[ -1 ] );
+
+        self.assertEqual( self.manager.prune_content_history( keep=3 ), 2 );
+        self.assertEqual( self.content_ids( 7 ), seven[ 2: ] );
+        self.assertEqual( self.content_ids( 8 ), eight );
+        self.assertEqual( self.manager.prune_content_history( keep=3, memento_id=7 ), 0 );
+
+    def test_prune_never_deletes_the_head_version( self ):
+        """A head pointing at an old version (e.g. a late push) keeps that version."""
+        versions = self.add_versions( 7, 4 );
+        self.set_head( 7, versions[ 0 ] );
+
+        self.assertEqual( self.manager.prune_content_history( keep=1 ), 2 );
+        self.assertEqual( self.content_ids( 7 ), [ versions[ 0 ], versions[ -1 ] ] );
+        self.assertEqual( self.manager.load_encrypted_content( 7, self.key ), "memento 7 version 0" );
+
+    def test_zero_retention_disables_pruning_and_the_job( self ):
+        """MEMENTO_CONTENT_RETENTION=0 keeps every version and starts no thread."""
+        versions = self.add_versions( 7, 4 );
+        with patch( 'encryption.CONTENT_RETENTION_COUNT', 0 ):
+            self.assertEqual( self.manager.prune_content_history(), 0 );
+            self.manager.start_retention_job( interval_seconds=0.01 );
+            self.assertIsNone( self.manager._retention_thread );
+        self.assertEqual( self.content_ids( 7 ), versions );
+
+    def test_retention_job_prunes_in_the_background( self ):
+        """The job runs prune_content_history() every interval until stopped."""
+        versions = self.add_versions( 7, 4 );
+        pruned = threading.Event();
+        prune = self.manager.prune_content_history;
+
+        def prune_and_signal( *args, **kwargs ):
+            deleted = prune( *args, **kwargs );
+            pruned.set();
+            return deleted;
+
+        with patch( 'encryption.CONTENT_RETENTION_COUNT', 2 ), \
+             patch.object( EncryptionManager, 'has_mongodb_support', new_callable=PropertyMock, return_value=True ), \
+             patch.object( self.manager, 'prune_content_history', side_effect=prune_and_signal ):
+            self.manager.start_retention_job( interval_seconds=0.01 );
+            self.assertTrue( pruned.wait( 5 ) );
+            self.manager.stop_retention_job();
+        self.assertEqual( self.content_ids( 7 ), versions[ 2: ] );
+
+    def test_load_reads_the_head_version( self ):
+        """With a head, its version is loaded even when a newer document exists."""
+        versions = self.add_versions( 7, 3 );
+        self.set_head( 7, versions[ 1 ] );
+        self.assertEqual( self.manager.load_encrypted_content( 7, self.key ), "memento 7 version 1" );
+
+    def test_load_without_head_falls_back_to_newest_version( self ):
+        """Mementos saved before heads existed (or with a dangling head) load their newest document."""
+        self.add_versions( 7, 3 );
+        self.assertEqual( self.manager.load_encrypted_content( 7, self.key ), "memento 7 version 2" );
+
+        self.set_head( 7, "missing" );
+        self.assertEqual( self.manager.load_encrypted_content( 7, self.key ), "memento 7 version 2" );
+        self.assertIsNone( self.manager.load_encrypted_content( 8, self.key ) );
+
+
+@unittest.skipUnless( HAS_CRYPTO and HAS_PYMONGO, "cryptography or pymongo not available" )
+class TestMigration( unittest.TestCase ):
+    """Batched migration of local mementos into the collection."""
+
+    def setUp( self ):
+        """Create local plaintext mementos under a temporary MEMENTO_ROOT."""
+        self.root = Path( tempfile.mkdtemp( prefix='memento_migrate_' ) );
+        self.collection = FakeCollection();
+        patchers = [
+            patch( 'constants.MEMENTO_ROOT', self.root ),
+            patch( 'storage.MEMENTO_ROOT', self.root ),
+            patch( 'encryption.KDF_TARGET_SECONDS', 0 ),
+            patch.object( EncryptionManager, '_get_mongo_collection', lambda manager, name="mementos": self.collection ),
+            patch.object( EncryptionManager, 'has_mongodb_support', new_callable=PropertyMock, return_value=True ),
+        ];
+        for patcher in patchers:
+            patcher.start();
+            self.addCleanup( patcher.stop );
+        self.manager = EncryptionManager( self.root );
+        for memento_id in range( 1, 6 ):
+            FileManager( memento_id ).write_snapshot( f"memento {memento_id}" );
+
+    def tearDown( self ):
+        """Remove the temporary root."""
+        shutil.rmtree( self.root, ignore_errors=True );
+
+    def migrate( self ) -> int:
+        return self.manager.migrate_local_mementos_to_mongodb( passphrase="secret" );
+
+    def contents( self ) -> dict:
+        return { doc[ 'memento_id' ]: doc for doc in self.collection.find( { 'type': 'content' } ) };
+
+    def load( self, memento_id: int ) -> str:
+        """Decrypt the migrated content document of a memento with its own data key."""
+        file_manager = FileManager( memento_id );
+        self.assertTrue( file_manager.verify_passphrase( "secret" ) );
+        doc = self.contents()[ memento_id ];
+        if doc.get( 'chunked' ):
+            return self.manager._load_chunked_content( self.collection, doc, file_manager._aes_key );
+        return self.manager.decrypt_data( bytes( doc[ 'data' ] ), file_manager._aes_key );
+
+    def test_batches_split_at_batch_size( self ):
+        """Each batch is one insert_many, and every migrated memento gets a head."""
+        with patch( 'encryption.MIGRATION_BATCH_SIZE', 2 ), \
+             patch.object( self.collection, 'insert_many', wraps=self.collection.insert_many ) as insert_many:
+            self.assertEqual( self.migrate(), 5 );
+        self.assertEqual( [ len( call.args[ 0 ] ) for call in insert_many.call_args_list ], [ 2, 2, 1 ] );
+        for memento_id in range( 1, 6 ):
+            head = self.collection.find_one( { 'memento_id': memento_id, 'type': 'head' } );
+            self.assertEqual( head[ 'content_id' ], self.contents()[ memento_id ][ '_id' ] );
+            self.assertEqual( self.load( memento_id ), f"memento {memento_id}" );
+
+    def test_rejected_documents_are_not_counted_or_backed_up( self ):
+        """A partial BulkWriteError keeps the rest of the batch; rejected mementos get no head or backup."""
+        self.collection.fail_memento_ids = { 2, 4 };
+        self.assertEqual( self.migrate(), 3 );
+        self.assertEqual( sorted( self.contents() ), [ 1, 3, 5 ] );
+        heads = { doc[ 'memento_id' ] for doc in self.collection.find( { 'type': 'head' } ) };
+        self.assertEqual( heads, { 1, 3, 5 } );
+        backups = sorted( path.name.split( '_' )[ 1 ] for path in ( self.root / 'backups' ).iterdir() );
+        self.assertEqual( backups, [ '1', '3', '5' ] );
+
+    def test_mementos_already_in_mongodb_are_skipped( self ):
+        """Mementos with a content document are neither re-encrypted nor written again."""
+        self.collection.insert_one( { 'memento_id': 3, 'type': 'content', 'timestamp': 1.0, 'data': b'' } );
+        self.assertEqual( self.migrate(), 4 );
+        self.assertEqual( len( list( self.collection.find( { 'memento_id': 3, 'type': 'content' } ) ) ), 1 );
+        self.assertFalse( FileManager( 3 ).is_encrypted() );
+        self.assertEqual( self.migrate(), 0 );
+
+    def test_large_mementos_are_migrated_chunked( self ):
+        """Mementos past the chunking threshold are written as chunks, not skipped."""
+        text = "".join( f"line {i} ✓ {os.urandom( 8 ).hex()}\n" for i in range( 500 ) );
+        FileManager( 6 ).write_snapshot( text );
+        with patch( 'encryption.CHUNKED_CONTENT_THRESHOLD_CHARS', 1000 ), \
+             patch( 'encryption.AEAD_CHUNK_CHARS', 1500 ):
+            self.assertEqual( self.migrate(), 6 );
+
+        doc = self.contents()[ 6 ];
+        self.assertTrue( doc[ 'chunked' ] );
+        self.assertNotIn( 'data', doc );
+        chunks = list( self.collection.find( { 'type': 'content_chunk', 'content_id': doc[ '_id' ] } ) );
+        self.assertEqual( len( chunks ), doc[ 'chunk_count' ] );
+        self.assertGreater( len( chunks ), 1 );
+        self.assertEqual( self.load( 6 ), text );
+        self.assertFalse( self.contents()[ 1 ].get( 'chunked' ) );
+
+    def test_chunks_of_rejected_large_mementos_are_removed( self ):
+        """A chunked document the batch rejects leaves no chunk documents behind."""
+        FileManager( 6 ).write_snapshot( "x" * 5000 );
+        self.collection.fail_memento_ids = { 6 };
+        with patch( 'encryption.CHUNKED_CONTENT_THRESHOLD_CHARS', 1000 ), \
+             patch( 'encryption.AEAD_CHUNK_CHARS', 1500 ):
+            self.assertEqual( self.migrate(), 5 );
+        self.assertEqual( list( self.collection.find( { 'type': 'content_chunk' } ) ), [] );
+
+
+if __name__ == '__main__':
+    unittest.main();
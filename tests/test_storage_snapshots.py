@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Tests for the local ring buffer snapshot format in storage.py.
+
+Style note: Following user preferences for spaces in brackets and semicolons.
+"""
+
+import sys;
+import json;
+import base64;
+import shutil;
+import tempfile;
+import threading;
+import unittest;
+from pathlib import Path;
+from unittest.mock import patch, PropertyMock;
+
+# Add parent directory to path to import modules
+sys.path.insert( 0, str( Path( __file__ ).parent.parent ) );
+
+import storage;
+from storage import FileManager, MementoIndex, compute_delta, apply_delta;
+from constants import KEYFRAME_INTERVAL, JOURNAL_CHECKPOINT_INTERVAL, RECOMPRESS_ACTIVE_WINDOW, REKEY_MARKER_FILE;
+from encryption import ARCHIVE_COMPRESSION, HAS_CRYPTO, HAS_BROTLI;
+
+
+class TempMementoRootTestCase( unittest.TestCase ):
+    """Base class that points MEMENTO_ROOT at a fresh temporary directory."""
+
+    def setUp( self ):
+        """Point MEMENTO_ROOT at a fresh temporary directory."""
+        self.memento_root = Path( tempfile.mkdtemp( prefix='memento_test_' ) );
+        self.patchers = [
+            patch( 'constants.MEMENTO_ROOT', self.memento_root ),
+            patch( 'storage.MEMENTO_ROOT', self.memento_root ),
+            # Calibrate to the cheapest allowed KDF parameters, so tests stay fast
+            patch( 'encryption.KDF_TARGET_SECONDS', 0 ),
+        ];
+        for patcher in self.patchers:
+            patcher.start();
+
+    def tearDown( self ):
+        """Remove the temporary directory."""
+        for patcher in self.patchers:
+            patcher.stop();
+        shutil.rmtree( self.memento_root, ignore_errors=True );
+
+
+class TestDeltaSnapshots( TempMementoRootTestCase ):
+    """Keyframe + delta ring buffer behaviour."""
+
+    def test_compute_delta_round_trip( self ):
+        """Deltas reproduce the new text for edits at the start, middle and end."""
+        base = "line one\nline two\nline three\n" * 500;
+        edits = [
+            "X" + base,
+            base[ :4000 ] + "inserted" + base[ 4000: ],
+            base[ :100 ] + base[ 200: ],
+            base + "tail",
+            base,
+            "",
+        ];
+        for new in edits:
+            start, end, text = compute_delta( base, new );
+            self.assertEqual( apply_delta( base, start, end, text ), new );
+
+        # Identical text produces an empty delta
+        start, end, text = compute_delta( base, base );
+        self.assertEqual( ( end - start, text ), ( 0, "" ) );
+
+    def test_history_replays_through_keyframes( self ):
+        """Every version in the ring can be rebuilt, across keyframe boundaries."""
+        manager = FileManager( 1 );
+        versions = [];
+        text = "Header\n" + "body text\n" * 200;
+        for i in range( KEYFRAME_INTERVAL * 2 + 3 ):
+            text = text + f"edit {i}\n";
+            versions.append( text );
+            manager.write_snapshot( text );
+
+        self.assertIn( None, manager.slots.values() );
+        self.assertTrue( any( base is not None for base in manager.slots.values() ) );
+
+        # A fresh manager rebuilds every retained version from disk
+        reloaded = FileManager( 1 );
+        self.assertEqual( reloaded.load_current_snapshot(), versions[ -1 ] );
+        for offset in range( min( reloaded.max_buffers, len( versions ) ) ):
+            self.assertEqual( reloaded.load_snapshot( -offset ), versions[ -1 - offset ] );
+
+    def test_ring_wrap_rebases_dependents( self ):
+        """Overwriting the oldest slot never breaks the remaining delta chains."""
+        manager = FileManager( 2 );
+        manager.max_buffers = 3;
+        versions = [];
+        for i in range( 12 ):
+            text = "x" * 100 + f" version {i}";
+            versions.append( text );
+            manager.write_snapshot( text );
+            manager.max_buffers = 3;
+
+        for offset in range( 3 ):
+            self.assertEqual( manager.load_snapshot( -offset ), versions[ -1 - offset ] );
+
+    def test_incremental_edits_match_full_text( self ):
+        """Line-region edits produce the same snapshot as writing the full text."""
+        manager = FileManager( 3 );
+        manager.write_snapshot( "alpha\nbeta\ngamma\ndelta", version=1 );
+
+        # Replace line 2, then insert a line after the (new) line 1, in one batch
+        edits = [ ( 2, 2, "BETA" ), ( 1, 3, "alpha\ninserted" ) ];
+        manager.write_snapshot_edits( edits, base_version=1, version=2 );
+
+        expected = "alpha\ninserted\nBETA\ngamma\ndelta";
+        self.assertEqual( manager.text_version, 2 );
+        self.assertEqual( FileManager( 3 ).load_current_snapshot(), expected );
+        self.assertEqual( FileManager( 3 ).load_snapshot( -1 ), "alpha\nbeta\ngamma\ndelta" );
+
+        # Edits against a stale version are rejected rather than applied blindly
+        with self.assertRaises( ValueError ):
+            manager.write_snapshot_edits( [ ( 1, 0, "x" ) ], base_version=1, version=3 );
+
+    def test_identical_saves_are_deduplicated( self ):
+        """Unchanged saves keep the ring in place; repeats of older text become references."""
+        manager = FileManager( 7 );
+        manager.write_snapshot( "draft A" );
+        first_index = manager.current_index;
+        manager.write_snapshot( "draft B" );
+        index = manager.current_index;
+
+        # Same text again (from a fresh manager, as auto-capture does) - nothing advances
+        FileManager( 7 ).write_snapshot( "draft B" );
+        reloaded = FileManager( 7 );
+        self.assertEqual( reloaded.current_index, index );
+
+        # Going back to an older version references its slot instead of storing it again
+        reloaded.write_snapshot( "draft A" );
+        self.assertEqual( reloaded.slots[ reloaded.current_index ], first_index );
+        self.assertEqual( FileManager( 7 ).load_current_snapshot(), "draft A" );
+        self.assertEqual( FileManager( 7 ).load_snapshot( -1 ), "draft B" );
+
+    def test_chunked_load_matches_full_load( self ):
+        """Memory-mapped chunks decode multi-byte text across boundaries, and edits still apply."""
+        text = "naïve café 😀\nsecond line\n" * 200;
+        FileManager( 8 ).write_snapshot( text, version=1 );
+
+        manager = FileManager( 8 );
+        with patch( 'storage.LAZY_LOAD_THRESHOLD_BYTES', 16 ):
+            chunks = list( manager.iter_current_snapshot( chunk_size=7 ) );
+        self.assertGreater( len( chunks ), 1 );
+        self.assertEqual( "".join( chunks ), text );
+
+        # The mapped path does not cache the text; incremental saves rebuild it on demand
+        manager.text_version = 1;
+        manager.write_snapshot_edits( [ ( 1, 400, "first" ) ], base_version=1, version=2 );
+        self.assertEqual( FileManager( 8 ).load_current_snapshot(), "first\n" + text.split( "\n", 1 )[ 1 ] );
+
+    def test_crlf_text_survives_delta_chain( self ):
+        """CRLF and lone CR line endings are stored verbatim, so replayed delta offsets stay exact."""
+        original = "line1\r\nline2\r\nline3\rline4 end\n";
+        FileManager( 8 ).write_snapshot( original, version=1 );
+
+        manager = FileManager( 8 );
+        manager.text_version = 1;
+        manager.write_snapshot_edits( [ ( 2, 2, "LINE2\r" ) ], base_version=1, version=2 );
+        edited = manager.load_current_snapshot();
+        FileManager( 8 ).write_snapshot( edited + "tail\r\n", version=3 );
+        expected = edited + "tail\r\n";
+
+        reloaded = FileManager( 8 );
+        self.assertEqual( reloaded.load_current_snapshot(), expected );
+        self.assertEqual( reloaded.load_snapshot( -1 ), edited );
+        self.assertEqual( reloaded.load_snapshot( -2 ), original );
+        with patch( 'storage.LAZY_LOAD_THRESHOLD_BYTES', 1 ):
+            self.assertEqual( "".join( FileManager( 8 ).iter_current_snapshot( chunk_size=5 ) ), expected );
+
+
+class TestCommitJournal( TempMementoRootTestCase ):
+    """Write-ahead journal and checkpoint behaviour."""
+
+    def test_recovery_rolls_forward_and_ignores_torn_tail( self ):
+        """The newest complete journal record wins over control.json; a torn last line is skipped."""
+        manager = FileManager( 4 );
+        for i in range( 5 ):
+            manager.write_snapshot( f"note\nversion {i}" );
+
+        self.assertTrue( manager.journal_file.exists() );
+        with open( manager.journal_file, 'a' ) as f:
+            f.write( '{"seq": 999, "current_index"' );  # Crash mid-append
+
+        reloaded = FileManager( 4 );
+        self.assertEqual( reloaded.journal_seq, manager.journal_seq );
+        self.assertEqual( reloaded.load_current_snapshot(), "note\nversion 4" );
+        self.assertEqual( reloaded.load_snapshot( -2 ), "note\nversion 2" );
+
+    def test_checkpoint_folds_journal_into_control_file( self ):
+        """After enough commits the journal is checkpointed atomically and removed."""
+        manager = FileManager( 6 );
+        for i in range( JOURNAL_CHECKPOINT_INTERVAL + 1 ):
+            manager.write_snapshot( f"text {i}" );
+
+        # Only commits since the last checkpoint are left in the journal
+        with open( manager.journal_file ) as f:
+            records = len( f.readlines() );
+        self.assertGreater( manager._checkpoint_seq, 1 );
+        self.assertEqual( records, manager.journal_seq - manager._checkpoint_seq );
+        self.assertLess( records, JOURNAL_CHECKPOINT_INTERVAL );
+        self.assertFalse( list( manager.memento_dir.glob( '*.tmp' ) ) );
+        self.assertEqual( FileManager( 6 ).load_current_snapshot(), f"text {JOURNAL_CHECKPOINT_INTERVAL}" );
+
+    def test_crash_between_rebase_and_commit_keeps_chain_readable( self ):
+        """Slots rebased to keyframes load after a crash, whether or not the slot map was committed."""
+        base = "".join( f"line {i}\n" for i in range( 200 ) );
+        versions = [ base + f"edit {i}" for i in range( 3 ) ];
+
+        def make_chain( memento_id ):
+            manager = FileManager( memento_id );
+            manager.max_buffers = 3;  # One keyframe and two deltas, the next slot being the keyframe
+            for text in versions:
+                manager.write_snapshot( text );
+            return manager;
+
+        manager = make_chain( 18 );
+        keyframe = ( manager.current_index + 1 ) % 3;
+        dependent = ( keyframe + 1 ) % 3;
+        self.assertEqual( manager.slots, { keyframe: None, dependent: keyframe, manager.current_index: dependent } );
+
+        # Rebased on disk while the last commit still records a base for it
+        manager._write_slot_payload( dependent, versions[ 1 ] );
+        reloaded = FileManager( 18 );
+        self.assertEqual( reloaded.load_current_snapshot(), versions[ 2 ] );
+        self.assertEqual( reloaded.load_snapshot( -1 ), versions[ 1 ] );
+
+        # Crash while writing the new snapshot over the keyframe, after its dependent was rebased
+        manager = make_chain( 19 );
+        original = FileManager._write_slot_payload;
+
+        def crash_on_keyframe( self, index, payload, compression=None ):
+            if index == keyframe:
+                raise OSError( "crash" );
+            return original( self, index, payload, compression );
+
+        with patch.object( FileManager, '_write_slot_payload', crash_on_keyframe ):
+            with self.assertRaises( OSError ):
+                manager.write_snapshot( base + "edit 3" );
+        reloaded = FileManager( 19 );
+        self.assertIsNone( reloaded.slots[ dependent ] );
+        self.assertEqual( reloaded.load_current_snapshot(), versions[ 2 ] );
+        self.assertEqual( reloaded.load_snapshot( -1 ), versions[ 1 ] );
+
+
+@unittest.skipUnless( HAS_CRYPTO and HAS_BROTLI, "Encryption libraries not available" )
+class TestEncryptedSlots( TempMementoRootTestCase ):
+    """Adaptive compression and re-keying of encrypted ring slots."""
+
+    def test_cold_slots_are_recompressed_at_archive_quality( self ):
+        """Rapid saves use a fast level; slots past the active window are rewritten and still load."""
+        manager = FileManager( 9 );
+        manager.write_snapshot( "seed" );
+        manager.enable_encryption( "secret" );
+        versions = [];
+        for i in range( 6 ):
+            versions.append( f"heading\n{'body ' * 50}\nversion {i}" );
+            manager.write_snapshot( versions[ -1 ] );
+
+        def compression( offset ):
+            index = ( manager.current_index - offset ) % manager.max_buffers;
+            with open( manager._get_snapshot_path( index ), 'rb' ) as f:
+                return manager.encryption_manager.stream_compression( f.read() );
+
+        hot = manager.encryption_manager.choose_compression( 0, hot=True );
+        self.assertEqual( compression( 0 ), hot );
+        self.assertEqual( manager.recompress_cold_slots( max_slots=1 ), 1 );
+        # The encrypted re-save of "seed" is a cold slot too
+        self.assertEqual( manager.recompress_cold_slots( max_slots=100 ), len( versions ) - RECOMPRESS_ACTIVE_WINDOW );
+        self.assertEqual( manager.recompress_cold_slots(), 0 );
+
+        for offset in range( len( versions ) ):
+            expected = hot if offset < RECOMPRESS_ACTIVE_WINDOW else ARCHIVE_COMPRESSION;
+            self.assertEqual( compression( offset ), expected );
+            self.assertEqual( manager.load_snapshot( -offset ), versions[ -1 - offset ] );
+
+    def test_idle_maintenance_queues_each_new_text_once( self ):
+        """With replication running, the idle pass queues changed text (and the wrapped key) once."""
+        manager = FileManager( 16 );
+        manager.enable_encryption( "secret" );
+        encryption_manager = manager.encryption_manager;
+
+        with patch.object( type( encryption_manager ), 'is_replicating', new_callable=PropertyMock, return_value=True ), \
+             patch.object( encryption_manager, 'save_encrypted_content' ) as save:
+            manager.write_snapshot( "draft" );
+            manager.idle_maintenance();
+            manager.idle_maintenance();
+            manager.write_snapshot( "draft" );
+            manager.idle_maintenance();
+            manager.write_snapshot( "final" );
+            manager.idle_maintenance();
+
+        self.assertEqual( [ call.args[ 1 ] for call in save.call_args_list ], [ "draft", "final" ] );
+        self.assertEqual( save.call_args.args[ 3: ], ( manager.wrapped_key, manager.kdf ) );
+
+    def test_change_passphrase_rewraps_data_key( self ):
+        """Changing the passphrase only re-wraps the data key; the slot files are untouched."""
+        manager = FileManager( 10 );
+        manager.enable_encryption( "old secret" );
+        versions = [ f"entry\nversion {i}" for i in range( 5 ) ];
+        for text in versions:
+            manager.write_snapshot( text );
+        slot_files = { path.name: path.read_bytes() for path in manager.memento_dir.glob( '*.enc' ) };
+
+        manager.change_passphrase( "old secret", "new secret" );
+        self.assertEqual( { path.name: path.read_bytes() for path in manager.memento_dir.glob( '*.enc' ) }, slot_files );
+
+        reloaded = FileManager( 10 );
+        self.assertFalse( reloaded.verify_passphrase( "old secret" ) );
+        self.assertTrue( reloaded.verify_passphrase( "new secret" ) );
+        for offset in range( len( versions ) ):
+            self.assertEqual( reloaded.load_snapshot( -offset ), versions[ -1 - offset ] );
+
+    def test_older_memento_moves_to_data_key( self ):
+        """A memento keyed directly by its passphrase is re-keyed once on its first passphrase change."""
+        manager = FileManager( 12 );
+        manager._is_encrypted = True;
+        manager._aes_key = manager._passphrase_key( "old secret" );
+        versions = [ f"entry\nversion {i}" for i in range( 4 ) ];
+        for text in versions:
+            manager.write_snapshot( text );
+        self.assertIsNone( FileManager( 12 ).wrapped_key );
+
+        progress = [];
+        manager.change_passphrase( "old secret", "new secret", lambda done, total: progress.append( ( done, total ) ) );
+        self.assertEqual( progress[ -1 ], ( len( versions ), len( versions ) ) );
+        self.assertFalse( list( manager.memento_dir.glob( '*.rekey' ) ) );
+
+        reloaded = FileManager( 12 );
+        self.assertIsNotNone( reloaded.wrapped_key );
+        self.assertTrue( reloaded.verify_passphrase( "new secret" ) );
+        for offset in range( len( versions ) ):
+            self.assertEqual( reloaded.load_snapshot( -offset ), versions[ -1 - offset ] );
+
+    def test_rekey_aborts_on_unreadable_slot( self ):
+        """A slot that cannot be re-keyed stops the change and leaves every slot under the old key."""
+        manager = FileManager( 15 );
+        manager._is_encrypted = True;
+        manager._aes_key = manager._passphrase_key( "old secret" );
+        for i in range( 3 ):
+            manager.write_snapshot( f"entry\nversion {i}" );
+        oldest = manager._get_snapshot_path( ( manager.current_index - 2 ) % manager.max_buffers );
+        oldest.write_bytes( b'not a snapshot' );
+        slot_files = { path.name: path.read_bytes() for path in manager.memento_dir.glob( '*.enc' ) };
+
+        with self.assertRaises( RuntimeError ):
+            manager.change_passphrase( "old secret", "new secret" );
+        self.assertFalse( list( manager.memento_dir.glob( '*.rekey' ) ) );
+
+        reloaded = FileManager( 15 );
+        self.assertIsNone( reloaded.wrapped_key );
+        self.assertTrue( reloaded.verify_passphrase( "old secret" ) );
+        self.assertEqual( { path.name: path.read_bytes() for path in manager.memento_dir.glob( '*.enc' ) }, slot_files );
+
+    def test_passphrase_checks_do_not_read_snapshots( self ):
+        """Wrapped keys and recorded key check values verify passphrases with every slot gone."""
+        wrapped = FileManager( 13 );
+        wrapped.enable_encryption( "secret" );
+        wrapped.write_snapshot( "text" );
+
+        older = FileManager( 14 );
+        older._is_encrypted = True;
+        older._aes_key = older._passphrase_key( "secret" );
+        older.write_snapshot( "text" );
+        self.assertTrue( FileManager( 14 ).verify_passphrase( "secret" ) );  # Records the key check value
+
+        for memento_id, manager in ( ( 13, wrapped ), ( 14, older ) ):
+            slot_files = list( manager.memento_dir.glob( '*.enc' ) );
+            self.assertTrue( slot_files );
+            for path in slot_files:
+                path.unlink();
+            manager = FileManager( memento_id );
+            self.assertFalse( manager.verify_passphrase( "wrong" ) );
+            self.assertTrue( manager.verify_passphrase( "secret" ) );
+
+    def test_interrupted_rekey_rolls_back_or_forward( self ):
+        """Opening for editing discards staged slots without the commit marker and commits them with it."""
+        manager = FileManager( 11 );
+        manager.enable_encryption( "old secret" );
+        manager.write_snapshot( "before" );
+        encryption_manager = manager.encryption_manager;
+        path = manager._get_snapshot_path( manager.current_index );
+        staged = path.with_name( path.name + '.rekey' );
+        new_key = encryption_manager.generate_data_key();
+        kdf = encryption_manager.new_kdf_params();
+        wrapped_key = encryption_manager.wrap_key( new_key, manager._passphrase_key( "new secret", kdf ), 11 );
+
+        # Crash while staging: the old passphrase still works
+        staged.write_bytes( encryption_manager.reencrypt_data( path.read_bytes(), manager._aes_key, new_key ) );
+        self.assertTrue( FileManager.load_memento( 11, for_edit=True ).verify_passphrase( "old secret" ) );
+        self.assertFalse( staged.exists() );
+
+        # Crash after the commit marker: the change is finished on load
+        staged.write_bytes( encryption_manager.reencrypt_data( path.read_bytes(), manager._aes_key, new_key ) );
+        with open( manager.memento_dir / REKEY_MARKER_FILE, 'w' ) as f:
+            json.dump( { 'wrapped_key': base64.b64encode( wrapped_key ).decode( 'ascii' ), 'kdf': kdf }, f );
+        FileManager( 11 );
+        self.assertTrue( staged.exists() );
+        reloaded = FileManager.load_memento( 11, for_edit=True );
+        self.assertTrue( reloaded.verify_passphrase( "new secret" ) );
+        self.assertEqual( reloaded.load_current_snapshot(), "before" );
+        self.assertFalse( ( manager.memento_dir / REKEY_MARKER_FILE ).exists() );
+
+    def test_managers_leave_an_inflight_rekey_alone( self ):
+        """Plain managers never touch staged files; recovery waits for the re-key lock."""
+        manager = FileManager( 12 );
+        manager.enable_encryption( "old secret" );
+        manager.write_snapshot( "before" );
+        path = manager._get_snapshot_path( manager.current_index );
+        staged = path.with_name( path.name + '.rekey' );
+        staged.write_bytes( path.read_bytes() );
+
+        # A listing, migration or auto-capture manager is constructed mid re-key
+        FileManager( 12 );
+        self.assertTrue( staged.exists() );
+
+        # Opening for editing blocks until the re-key releases its lock
+        recovered = threading.Event();
+        with storage._rekey_lock( manager.memento_dir ):
+            opener = threading.Thread( target=lambda: ( FileManager.load_memento( 12, for_edit=True ), recovered.set() ) );
+            opener.start();
+            self.assertFalse( recovered.wait( 0.2 ) );
+            self.assertTrue( staged.exists() );
+        opener.join( 5 );
+        self.assertTrue( recovered.is_set() );
+        self.assertFalse( staged.exists() );
+
+
+class TestMementoIndex( TempMementoRootTestCase ):
+    """Persistent listing index behaviour."""
+
+    def test_checkpoint_updates_index( self ):
+        """The first commit checkpoints and records the first line; journal commits leave the index alone."""
+        manager = FileManager( 5 );
+        manager.write_snapshot( "Shopping list\nmilk\neggs" );
+
+        rows = MementoIndex().load();
+        self.assertEqual( rows[ 5 ][ 1 ], "Shopping list" );
+        self.assertEqual( rows[ 5 ][ 3 ], 0 );
+
+        with patch.object( MementoIndex, 'update' ) as update:
+            manager.write_snapshot( "Groceries\nmilk" );
+        update.assert_not_called();
+        self.assertEqual( [ m.first_line for m in FileManager.list_mementos( auto_migrate=False ) ], [ "Groceries" ] );
+
+    def test_listing_refreshes_stale_and_missing_rows( self ):
+        """Listing picks up mementos changed outside the index and drops deleted ones."""
+        FileManager( 1 ).write_snapshot( "First" );
+        FileManager( 2 ).write_snapshot( "Second" );
+
+        # Simulate a memento written by an older version that never touched the index
+        MementoIndex().remove( [ 2 ] );
+        shutil.rmtree( self.memento_root / "1" );
+
+        mementos = FileManager.list_mementos( auto_migrate=False );
+        self.assertEqual( [ ( m.memento_id, m.first_line ) for m in mementos ], [ ( 2, "Second" ) ] );
+        self.assertEqual( set( MementoIndex().load() ), { 2 } );
+
+    def test_listing_merges_mongodb_mementos_from_one_query( self ):
+        """MongoDB-only mementos come from the per-memento timestamps without touching their directories."""
+        FileManager( 1 ).write_snapshot( "Local" );
+        remote = { 1: 1.0, 7: 4102444800.0, 8: 2.0 };  # 7 is newest, 1 also exists locally
+
+        with patch.object( FileManager, '_mongodb_timestamps', return_value=remote ) as query:
+            mementos = FileManager.list_mementos();
+
+        self.assertEqual( query.call_count, 1 );
+        self.assertEqual( [ m.memento_id for m in mementos ], [ 7, 1, 8 ] );
+        self.assertTrue( all( m.is_encrypted for m in mementos if m.memento_id != 1 ) );
+        self.assertFalse( ( self.memento_root / "7" ).exists() );
+
+    def test_pages_are_sorted_and_filtered_in_sqlite( self ):
+        """page() and count() order, filter and page local rows plus (optionally) MongoDB-only ones."""
+        index = MementoIndex();
+        for memento_id in range( 1, 8 ):
+            index.update( memento_id, f"note {memento_id}" if memento_id % 2 else "100% done", memento_id * 10.0, False, 0 );
+        index.replace_remote( { 3: 999.0, 20: 500.0 } );  # 3 also exists locally
+
+        ids = lambda infos: [ m.memento_id for m in infos ];
+        self.assertEqual( ids( index.page( 0, 3 ) ), [ 7, 6, 5 ] );
+        self.assertEqual( ids( index.page( 3, 3 ) ), [ 4, 3, 2 ] );
+        self.assertEqual( ids( index.page( 0, 3, sort='id', descending=False ) ), [ 1, 2, 3 ] );
+        self.assertEqual( ids( index.page( 0, 10, include_remote=True ) )[ 0 ], 20 );
+        self.assertEqual( index.count( include_remote=True ), 8 );
+
+        # "%" is matched literally; ids match as text
+        self.assertEqual( ids( index.page( 0, 10, search="0%" ) ), [ 6, 4, 2 ] );
+        self.assertEqual( index.count( search="7" ), 1 );
+
+
+if __name__ == '__main__':
+    unittest.main();